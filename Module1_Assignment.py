@@ -1,4 +1,17 @@
+import asyncio
+import csv
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from requests.adapters import HTTPAdapter
+
+GEOCODING_URL = "https://geocoding-api.open-meteo.com/v1/search"
+FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
 
 def get_coordinates(city):
     geo_url = f"https://geocoding-api.open-meteo.com/v1/search?name={city}&count=1"
@@ -43,6 +56,422 @@ def get_weather_by_city(city_name):
     if lat is not None and lon is not None:
         get_weather(lat, lon)
 
+# ---- Pooled, cached client ----
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire ttl seconds after being stored.
+    """
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires, value = entry
+                if expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def normalize_city(city):
+    """
+    Cache key for a city name: trimmed, single-spaced and case-folded.
+    """
+    return " ".join(city.split()).casefold()
+
+
+class GeocodeStore:
+    """
+    Persistent city -> location store in a local SQLite file.
+    Rows are keyed by the normalized city name, so lookups are a primary-key
+    probe. Known cities resolve with no network access, even after a restart.
+    """
+    def __init__(self, path="geocode_cache.sqlite3"):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS locations ("
+            " key TEXT PRIMARY KEY, name TEXT, country TEXT,"
+            " latitude REAL, longitude REAL, updated REAL)"
+        )
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+    def get(self, city):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT name, country, latitude, longitude FROM locations WHERE key = ?",
+                (normalize_city(city),),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return dict(zip(("name", "country", "latitude", "longitude"), row))
+
+    def put(self, city, location):
+        self.put_many([(city, location)])
+
+    def put_many(self, items):
+        """
+        Stores (city, location) pairs in one transaction. Returns the number stored.
+        """
+        now = time.time()
+        rows = [(normalize_city(city), loc.get("name"), loc.get("country"),
+                 loc.get("latitude"), loc.get("longitude"), now) for city, loc in items]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO locations VALUES (?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def warm_from_file(self, path):
+        """
+        Bulk-loads locations from a CSV (with a header) or JSONL file.
+        Each record needs city, latitude and longitude; name and country are
+        optional. Returns the number of cities stored.
+        """
+        with open(path, newline="") as file:
+            if path.endswith((".jsonl", ".ndjson")):
+                records = (json.loads(line) for line in file if line.strip())
+            else:
+                records = csv.DictReader(file)
+            items = [(r["city"], {"name": r.get("name") or r["city"], "country": r.get("country"),
+                                  "latitude": float(r["latitude"]), "longitude": float(r["longitude"])})
+                     for r in records]
+        return self.put_many(items)
+
+    def stats(self):
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM locations").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "size": size}
+
+    def __len__(self):
+        return self.stats()["size"]
+
+
+class WeatherClient:
+    """
+    Weather lookups over one pooled requests.Session.
+    Geocoding results are cached for geo_ttl seconds and current weather for
+    weather_ttl seconds. Results are returned as dicts instead of printed.
+    The base URLs can be pointed at a local stub server for testing.
+    An optional GeocodeStore is checked after the memory cache and before
+    the network, and is updated with every new geocoding result.
+    """
+    def __init__(self, geocoding_url=GEOCODING_URL, forecast_url=FORECAST_URL,
+                 geo_ttl=24 * 3600, weather_ttl=300, cache_size=1024,
+                 pool_size=32, timeout=10, store=None):
+        self.geocoding_url = geocoding_url
+        self.forecast_url = forecast_url
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.store = store
+        self.geo_cache = TTLCache(cache_size, geo_ttl)
+        self.weather_cache = TTLCache(cache_size, weather_ttl)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get_location(self, city):
+        """
+        Returns {'name', 'country', 'latitude', 'longitude'} for a city, or None
+        when nothing matches. Raises requests.HTTPError on an API error.
+        """
+        key = normalize_city(city)
+        location = self.geo_cache.get(key)
+        if location is not None:
+            return location
+        if self.store is not None:
+            location = self.store.get(key)
+            if location is not None:
+                self.geo_cache.set(key, location)
+                return location
+
+        response = self.session.get(self.geocoding_url, params={"name": city.strip(), "count": 1},
+                                    timeout=self.timeout)
+        response.raise_for_status()
+        results = response.json().get("results")
+        if not results:
+            return None
+        result = results[0]
+        location = {
+            "name": result.get("name"),
+            "country": result.get("country"),
+            "latitude": result.get("latitude"),
+            "longitude": result.get("longitude"),
+        }
+        self.geo_cache.set(key, location)
+        if self.store is not None:
+            self.store.put(key, location)
+        return location
+
+    def get_coordinates(self, city):
+        """
+        Cached counterpart of get_coordinates: returns (latitude, longitude) or (None, None).
+        """
+        location = self.get_location(city)
+        if location is None:
+            return None, None
+        return location["latitude"], location["longitude"]
+
+    def get_weather(self, latitude, longitude):
+        """
+        Returns {'temperature', 'windspeed', 'weathercode'} for a coordinate pair.
+        """
+        key = (round(latitude, 4), round(longitude, 4))
+        current = self.weather_cache.get(key)
+        if current is not None:
+            return current
+
+        response = self.session.get(
+            self.forecast_url,
+            params={"latitude": latitude, "longitude": longitude, "current_weather": "true"},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        data = response.json().get("current_weather", {})
+        current = {
+            "temperature": data.get("temperature"),
+            "windspeed": data.get("windspeed"),
+            "weathercode": data.get("weathercode"),
+        }
+        self.weather_cache.set(key, current)
+        return current
+
+    def get_weather_by_city(self, city):
+        """
+        Geocodes a city and returns its location merged with the current weather,
+        or None when the city is not found.
+        """
+        location = self.get_location(city)
+        if location is None:
+            return None
+        return {**location, **self.get_weather(location["latitude"], location["longitude"])}
+
+    def cache_stats(self):
+        """
+        Hit/miss counters for the geocoding and weather caches and the persistent store.
+        """
+        stats = {
+            "geo_cache": {"hits": self.geo_cache.hits, "misses": self.geo_cache.misses},
+            "weather_cache": {"hits": self.weather_cache.hits, "misses": self.weather_cache.misses},
+        }
+        if self.store is not None:
+            stats["store"] = self.store.stats()
+        return stats
+
+    def get_weather_by_cities(self, cities, max_workers=None):
+        """
+        Looks up many cities concurrently over the shared session.
+        Returns a dict of city -> result in input order. A city that is not
+        found maps to None; one whose lookup failed (a request error or a
+        malformed response) maps to {'error': message}, as in AsyncWeatherClient.
+        """
+        cities = list(dict.fromkeys(cities))
+        workers = max_workers or min(self.pool_size, len(cities)) or 1
+
+        def lookup(city):
+            try:
+                return self.get_weather_by_city(city)
+            except Exception as e:
+                return {"error": str(e) or type(e).__name__}
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return dict(zip(cities, executor.map(lookup, cities)))
+
+
+# ---- asyncio client ----
+class AsyncWeatherClient:
+    """
+    asyncio counterpart of WeatherClient, built on aiohttp (imported on first use).
+    At most `concurrency` HTTP requests are in flight at once, and concurrent
+    lookups for the same city or coordinates share a single request.
+    An optional GeocodeStore is used the same way as in WeatherClient.
+    Use as: async with AsyncWeatherClient() as client: ...
+    """
+    def __init__(self, geocoding_url=GEOCODING_URL, forecast_url=FORECAST_URL,
+                 concurrency=50, geo_ttl=24 * 3600, weather_ttl=300,
+                 cache_size=1024, timeout=10, store=None):
+        self.geocoding_url = geocoding_url
+        self.forecast_url = forecast_url
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.store = store
+        self.geo_cache = TTLCache(cache_size, geo_ttl)
+        self.weather_cache = TTLCache(cache_size, weather_ttl)
+        self.requests_sent = 0
+        self.session = None
+        self._semaphore = None
+        self._inflight = {}
+
+    cache_stats = WeatherClient.cache_stats
+
+    async def __aenter__(self):
+        import aiohttp
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self.session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            connector=aiohttp.TCPConnector(limit=self.concurrency),
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+
+    async def _get_json(self, url, params):
+        async with self._semaphore:
+            self.requests_sent += 1
+            async with self.session.get(url, params=params) as response:
+                response.raise_for_status()
+                return await response.json(content_type=None)
+
+    async def _coalesce(self, key, make_coro):
+        """
+        Awaits the in-flight task for key, starting one from make_coro if none exists.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(make_coro())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def get_location(self, city):
+        """
+        Returns {'name', 'country', 'latitude', 'longitude'} for a city, or None.
+        """
+        key = normalize_city(city)
+        location = self.geo_cache.get(key)
+        if location is not None:
+            return location
+        if self.store is not None:
+            location = self.store.get(key)
+            if location is not None:
+                self.geo_cache.set(key, location)
+                return location
+        return await self._coalesce(("geo", key), lambda: self._fetch_location(city, key))
+
+    async def _fetch_location(self, city, key):
+        data = await self._get_json(self.geocoding_url, {"name": city.strip(), "count": 1})
+        results = data.get("results")
+        if not results:
+            return None
+        result = results[0]
+        location = {
+            "name": result.get("name"),
+            "country": result.get("country"),
+            "latitude": result.get("latitude"),
+            "longitude": result.get("longitude"),
+        }
+        self.geo_cache.set(key, location)
+        if self.store is not None:
+            self.store.put(key, location)
+        return location
+
+    async def get_weather(self, latitude, longitude):
+        """
+        Returns {'temperature', 'windspeed', 'weathercode'} for a coordinate pair.
+        """
+        key = (round(latitude, 4), round(longitude, 4))
+        current = self.weather_cache.get(key)
+        if current is not None:
+            return current
+        return await self._coalesce(("weather", key), lambda: self._fetch_weather(key))
+
+    async def _fetch_weather(self, key):
+        latitude, longitude = key
+        data = await self._get_json(
+            self.forecast_url,
+            {"latitude": latitude, "longitude": longitude, "current_weather": "true"},
+        )
+        data = data.get("current_weather", {})
+        current = {
+            "temperature": data.get("temperature"),
+            "windspeed": data.get("windspeed"),
+            "weathercode": data.get("weathercode"),
+        }
+        self.weather_cache.set(key, current)
+        return current
+
+    async def get_weather_by_city(self, city):
+        """
+        Geocodes a city and returns its location merged with the current weather,
+        or None when the city is not found.
+        """
+        location = await self.get_location(city)
+        if location is None:
+            return None
+        return {**location, **await self.get_weather(location["latitude"], location["longitude"])}
+
+    async def get_weather_by_cities(self, cities):
+        """
+        Looks up many cities concurrently. Returns a dict of city -> result in
+        input order; failed lookups map to {'error': message}, as in WeatherClient.
+        """
+        cities = list(dict.fromkeys(cities))
+
+        async def lookup(city):
+            try:
+                return await self.get_weather_by_city(city)
+            except Exception as e:
+                return {"error": str(e) or type(e).__name__}
+
+        results = await asyncio.gather(*(lookup(city) for city in cities))
+        return dict(zip(cities, results))
+
+
+def get_weather_by_cities_async(cities, **client_options):
+    """
+    Synchronous wrapper: runs AsyncWeatherClient.get_weather_by_cities in a new event loop.
+    """
+    async def run():
+        async with AsyncWeatherClient(**client_options) as client:
+            return await client.get_weather_by_cities(cities)
+    return asyncio.run(run())
+
+
 # ---- Main Execution ----
 if __name__ == "__main__":
     city_input = input("Enter a city name (e.g., Dhaka, New York, Delhi): ")
@@ -0,0 +1,140 @@
+# Weather Client Benchmarks
+# Runs the weather lookups against a local fake Open-Meteo server and compares
+# sequential, thread-pool and asyncio throughput, plus cold starts with the
+# persistent geocode store.
+# Run with: python Module1_benchmark.py [cities] [latency_ms]
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import Module1_Assignment as weather
+
+
+class FakeOpenMeteoHandler(BaseHTTPRequestHandler):
+    """
+    Answers /v1/search and /v1/forecast with canned JSON after a fixed delay.
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    latency = 0.02
+    requests_served = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        time.sleep(self.latency)
+        type(self).requests_served += 1
+        if url.path == "/v1/search":
+            name = query["name"][0]
+            # Derive stable fake coordinates from the city name
+            seed = sum(map(ord, name))
+            body = {"results": [{"name": name.title(), "country": "Testland",
+                                 "latitude": seed % 180 - 90 + 0.5, "longitude": seed % 360 - 180 + 0.5}]}
+        else:
+            body = {"current_weather": {"temperature": float(query["latitude"][0]),
+                                        "windspeed": 10.0, "weathercode": 3}}
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class FakeOpenMeteoServer(ThreadingHTTPServer):
+    """
+    Threaded server with a deep accept backlog, so concurrent clients are not
+    throttled by SYN retries (the default backlog is 5).
+    """
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def start_fake_server(latency=0.02):
+    """
+    Starts the fake server on a free local port and returns (server, base_url).
+    """
+    FakeOpenMeteoHandler.latency = latency
+    server = FakeOpenMeteoServer(("127.0.0.1", 0), FakeOpenMeteoHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def timed(label, func, count):
+    """
+    Runs func once, prints its throughput and returns the result.
+    """
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<24} {elapsed:8.3f}s  {count / elapsed:10,.1f} cities/s")
+    return result
+
+
+def benchmark_pipelines(count=500, latency=0.02, concurrency=50):
+    """
+    Sequential vs. thread pool vs. asyncio for `count` distinct cities.
+    Each mode gets a fresh client, so nothing is served from cache.
+    """
+    server, base = start_fake_server(latency)
+    urls = {"geocoding_url": base + "/v1/search", "forecast_url": base + "/v1/forecast"}
+    cities = [f"City {i}" for i in range(count)]
+    print(f"\nWeather pipeline ({count:,} cities, {latency * 1000:.0f} ms server latency)")
+    try:
+        with weather.WeatherClient(**urls) as client:
+            sequential = timed("sequential", lambda: {c: client.get_weather_by_city(c) for c in cities}, count)
+        with weather.WeatherClient(pool_size=concurrency, **urls) as client:
+            threaded = timed("thread pool", lambda: client.get_weather_by_cities(cities), count)
+        concurrent = timed("asyncio", lambda: weather.get_weather_by_cities_async(
+            cities, concurrency=concurrency, **urls), count)
+        assert sequential == threaded == concurrent, "Pipelines returned different results."
+
+        # Duplicate cities in one batch are coalesced into a single request each
+        before = FakeOpenMeteoHandler.requests_served
+        weather.get_weather_by_cities_async(cities[:10] * 2 + [c.upper() for c in cities[:10]], **urls)
+        print(f"30 lookups of 10 cities sent {FakeOpenMeteoHandler.requests_served - before} requests")
+    finally:
+        server.shutdown()
+
+
+def benchmark_store(count=500, latency=0.02):
+    """
+    Cold-start lookups with and without a pre-warmed GeocodeStore.
+    """
+    server, base = start_fake_server(latency)
+    urls = {"geocoding_url": base + "/v1/search", "forecast_url": base + "/v1/forecast"}
+    cities = [f"Town {i}" for i in range(count)]
+    print(f"\nPersistent geocode store ({count:,} cities)")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "geocode_cache.sqlite3")
+        try:
+            store = weather.GeocodeStore(path)
+            with weather.WeatherClient(store=store, **urls) as client:
+                timed("geocode, empty store", lambda: [client.get_location(c) for c in cities], count)
+            store.close()
+
+            # A new store on the same file stands in for a process restart
+            store = weather.GeocodeStore(path)
+            before = FakeOpenMeteoHandler.requests_served
+            with weather.WeatherClient(store=store, **urls) as client:
+                timed("geocode, warm store", lambda: [client.get_location(c) for c in cities], count)
+                print(f"network requests: {FakeOpenMeteoHandler.requests_served - before}, "
+                      f"store: {client.cache_stats()['store']}")
+            store.close()
+        finally:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 20
+    benchmark_pipelines(n, latency_ms / 1000)
+    benchmark_store(n, latency_ms / 1000)
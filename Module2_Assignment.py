@@ -1,7 +1,92 @@
+import argparse
+import csv
+import functools
+import heapq
+import importlib
+import itertools
+import json
 import logging
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from shared_logging import setup_logging
 
 # Set up basic logging configuration
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+setup_logging(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def no_op(data):
+    """
+    Stage callable for stages that were given only a name.
+    """
+    return None
+
+
+def resolve_callable(spec):
+    """
+    Returns the function named by 'module:function' (or 'module.function').
+    Callables are returned as they are. Raises ValueError if it cannot be found.
+    """
+    if callable(spec):
+        return spec
+    if not isinstance(spec, str):
+        raise ValueError(f"Stage callable must be a 'module:function' string, not {spec!r}.")
+    module_name, sep, attr = spec.partition(':')
+    if not sep:
+        module_name, _, attr = spec.rpartition('.')
+    try:
+        func = getattr(importlib.import_module(module_name), attr)
+    except (ImportError, AttributeError, ValueError) as e:
+        raise ValueError(f"Cannot load stage callable {spec!r}: {e}") from None
+    if not callable(func):
+        raise ValueError(f"Stage callable {spec!r} is not callable.")
+    return func
+
+
+class Stage:
+    """
+    One pipeline stage: a name, the callable that does its work and the names
+    of the stages that must finish before it. The callable gets the instance's
+    data dict, holding the instance input under 'input' and the result of every
+    stage that ran before it, and its return value is stored there under the
+    stage's name.
+    """
+    def __init__(self, name, func=no_op, depends_on=()):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, {getattr(self.func, '__name__', self.func)!r}, {self.depends_on!r})"
+
+
+def _run_batch(plan, inputs):
+    """
+    Runs each input through the plan, a list of (stage name, callable) in
+    dependency order. An instance stops at its first failing stage, with the
+    error under 'error'. Returns the data dicts and the batch's per-stage
+    [runs, seconds, failures].
+    """
+    timings = {name: [0, 0.0, 0] for name, _ in plan}
+    results = []
+    clock = time.perf_counter
+    for value in inputs:
+        data = {'input': value}
+        for name, func in plan:
+            stats = timings[name]
+            start = clock()
+            try:
+                data[name] = func(data)
+            except Exception as e:
+                stats[1] += clock() - start
+                stats[2] += 1
+                data['error'] = f"{name}: {e}"
+                break
+            stats[1] += clock() - start
+            stats[0] += 1
+        results.append(data)
+    return results, timings
 
 
 class MandalModel:
@@ -9,9 +94,158 @@ class MandalModel:
         """
         Initialize an empty list to store the stages of the Waterfall model.
         """
-        self.stages = []
+        self.stages = []  # stage names, in the order they were added
+        self.definitions = {}  # stage name -> Stage
+        self.timings = {}  # stage name -> [runs, seconds, failures] over every execute()
+        self.instances_run = 0
+        self.instances_failed = 0
+        self.wall_time = 0.0
+        self._order = None
         logging.info("Initialized MandalModel with an empty stages list.")
 
+    def add_stage(self, name, func=None, depends_on=None):
+        """
+        Adds a stage. func is a callable or a 'module:function' string (default:
+        no_op). depends_on lists the stages it needs; None means the stage
+        before it, as in a waterfall. Raises ValueError for an empty or
+        duplicate name, depends_on that is not a list of names, or an unknown
+        callable.
+        """
+        if name is not None and not isinstance(name, str):
+            raise ValueError(f"Stage name must be a string, not {name!r}.")
+        name = name.strip() if name else ''
+        if not name:
+            raise ValueError("Stage name cannot be empty.")
+        if name in self.definitions:
+            raise ValueError(f"Stage '{name}' already exists.")
+        if depends_on is None:
+            depends_on = self.stages[-1:]
+        elif isinstance(depends_on, str):
+            depends_on = [depends_on]
+        elif not isinstance(depends_on, (list, tuple)) or not all(isinstance(dep, str) for dep in depends_on):
+            raise ValueError(f"Stage '{name}': depends_on must be a list of stage names, not {depends_on!r}.")
+        self.definitions[name] = Stage(name, resolve_callable(func) if func is not None else no_op, depends_on)
+        self.stages.append(name)
+        self._order = None
+        return self.definitions[name]
+
+    def load_stages(self, path):
+        """
+        Bulk-loads stage definitions from a CSV (with a header) or JSONL file,
+        or a JSON list. Each record has a name and optionally a callable and
+        depends_on: in CSV a ';'-separated list, where '-' means none and an
+        empty cell the stage before. All or none of the stages are added:
+        malformed records, duplicate names, unknown callables or dependencies,
+        and cycles raise ValueError, and any other error is re-raised after
+        the model is restored. Returns the number of stages loaded.
+        """
+        with open(path, newline='', encoding='utf-8') as file:
+            if path.endswith(('.jsonl', '.ndjson')):
+                records = [json.loads(line) for line in file if line.strip()]
+            elif path.endswith('.json'):
+                records = json.load(file)
+            else:
+                records = []
+                for row in csv.DictReader(file):
+                    depends_on = (row.get('depends_on') or '').strip()
+                    if depends_on == '-':
+                        row['depends_on'] = []
+                    elif depends_on:
+                        row['depends_on'] = [dep.strip() for dep in depends_on.split(';') if dep.strip()]
+                    else:
+                        row['depends_on'] = None
+                    records.append(row)
+
+        saved = (list(self.stages), dict(self.definitions))
+        try:
+            if not isinstance(records, list):
+                raise ValueError(f"{path} must hold a list of stage records.")
+            for number, record in enumerate(records, 1):
+                if not isinstance(record, dict):
+                    raise ValueError(f"Stage record {number} in {path} is not an object: {record!r}")
+                self.add_stage(record.get('name'), record.get('callable') or None, record.get('depends_on'))
+            self.order()
+        except Exception:
+            self.stages, self.definitions = saved
+            self._order = None
+            raise
+        logging.info(f"Loaded {len(records)} stages from {path}.")
+        return len(records)
+
+    def order(self):
+        """
+        Returns the stage names in an order that respects every dependency,
+        keeping the order they were added where the dependencies allow.
+        Raises ValueError for an unknown dependency or a cycle.
+        """
+        if self._order is not None:
+            return self._order
+        position = {name: index for index, name in enumerate(self.stages)}
+        waiting = {}  # stage -> number of dependencies not yet placed
+        dependents = {name: [] for name in self.stages}
+        for name in self.stages:
+            for dependency in self.definitions[name].depends_on:
+                if dependency not in position:
+                    raise ValueError(f"Stage '{name}' depends on unknown stage '{dependency}'.")
+                dependents[dependency].append(name)
+            waiting[name] = len(self.definitions[name].depends_on)
+        ready = [position[name] for name in self.stages if not waiting[name]]
+        heapq.heapify(ready)
+        order = []
+        while ready:
+            name = self.stages[heapq.heappop(ready)]
+            order.append(name)
+            for dependent in dependents[name]:
+                waiting[dependent] -= 1
+                if not waiting[dependent]:
+                    heapq.heappush(ready, position[dependent])
+        if len(order) < len(self.stages):
+            cycle = [name for name in self.stages if waiting[name]]
+            raise ValueError(f"Stage dependencies form a cycle: {', '.join(cycle)}.")
+        self._order = order
+        return order
+
+    def execute(self, inputs, workers=1, processes=False, batch_size=1000):
+        """
+        Runs one pipeline instance per input through every stage, in
+        dependency order, and returns their data dicts in input order (see
+        Stage; a failed instance has 'error'). Instances are independent, so
+        with workers > 1 batches of batch_size run on a pool: threads suit
+        stages that wait on I/O, processes (processes=True) CPU-bound stages,
+        which then must be module-level functions. Per-stage timings are added
+        to self.timings.
+        """
+        plan = [(name, self.definitions[name].func) for name in self.order()]
+        inputs = iter(inputs)
+        batches = iter(lambda: list(itertools.islice(inputs, batch_size)), [])
+        run = functools.partial(_run_batch, plan)
+        start = time.perf_counter()
+        if workers <= 1:
+            outputs = list(map(run, batches))
+        else:
+            pool_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+            with pool_class(max_workers=workers) as pool:
+                outputs = list(pool.map(run, batches))
+        elapsed = time.perf_counter() - start
+
+        results = []
+        for batch_results, batch_timings in outputs:
+            results.extend(batch_results)
+            for name, (runs, seconds, failures) in batch_timings.items():
+                stats = self.timings.setdefault(name, [0, 0.0, 0])
+                stats[0] += runs
+                stats[1] += seconds
+                stats[2] += failures
+        failed = sum('error' in data for data in results)
+        self.instances_run += len(results)
+        self.instances_failed += failed
+        self.wall_time += elapsed
+        logging.info(f"Ran {len(results)} pipeline instances through {len(plan)} stages in {elapsed:.3f}s "
+                     f"({failed} failed, {workers} {'processes' if processes else 'workers'}).")
+        if failed:
+            logging.warning(f"{failed} pipeline instances failed.")
+        return results
+
     def prompt_user(self):
         """
         Prompts the user to input each stage name and adds it to the stages list.
@@ -27,16 +261,20 @@ class MandalModel:
                 logging.info("User has finished entering stages.")
                 break
 
-            if stage:  # Only add non-empty input
-                self.stages.append(stage)
-                logging.info(f"Stage '{stage}' added to the stages list.")
-            else:
+            if not stage:  # Only add non-empty input
                 logging.warning("Empty input detected and ignored.")
+            elif stage in self.definitions:
+                print(f"Stage '{stage}' already exists.")
+                logging.warning(f"Duplicate stage '{stage}' ignored.")
+            else:
+                self.add_stage(stage)
+                logging.info(f"Stage '{stage}' added to the stages list.")
 
     def display_model(self):
         """
-        Displays the collected stages in an organized list.
-        Logs the display action.
+        Displays the collected stages in an organized list, with their
+        dependencies where they are not simply the stage before, and per-stage
+        timings once instances have run. Logs the display action.
         """
         if not self.stages:
             logging.warning("No stages available to display.")
@@ -44,14 +282,52 @@ class MandalModel:
             return
 
         print("\nYour Mandal Waterfall Model Stages:")
+        previous = []
         for idx, stage in enumerate(self.stages, 1):
-            print(f"{idx}. {stage}")
+            depends_on = list(self.definitions[stage].depends_on)
+            after = f"  (after: {', '.join(depends_on) or 'nothing'})" if depends_on != previous else ""
+            print(f"{idx}. {stage}{after}")
+            previous = [stage]
+
+        if self.instances_run:
+            total = sum(seconds for _, seconds, _ in self.timings.values()) or 1.0
+            print(f"\nStage timings ({self.instances_run:,} instances, {self.instances_failed:,} failed, "
+                  f"{self.wall_time:.3f}s wall, {self.instances_run / (self.wall_time or 1.0):,.0f} instances/s):")
+            print(f"{'stage':<24} {'runs':>10} {'total s':>10} {'mean ms':>9} {'share':>7} {'failed':>7}")
+            for stage in self.order():
+                runs, seconds, failures = self.timings.get(stage, (0, 0.0, 0))
+                mean = seconds / (runs + failures) * 1000 if runs + failures else 0.0
+                print(f"{stage:<24} {runs:>10,} {seconds:>10.3f} {mean:>9.3f} {seconds / total:>7.1%} {failures:>7,}")
 
         logging.info(f"Displayed {len(self.stages)} stages.")
 
 
+def main(argv):
+    """
+    Command-line entry point: loads stages from a file and runs instances through them.
+    """
+    parser = argparse.ArgumentParser(description="Run pipeline instances through a Mandal Waterfall Model.")
+    parser.add_argument('stages', help="CSV, JSONL or JSON file of stage definitions.")
+    parser.add_argument('--instances', type=int, default=1000, help="Pipeline instances to run (default: 1000).")
+    parser.add_argument('--workers', type=int, default=1, help="Pool size for independent instances (default: 1).")
+    parser.add_argument('--processes', action='store_true', help="Use a process pool instead of threads.")
+    args = parser.parse_args(argv)
+
+    model = MandalModel()
+    try:
+        model.load_stages(args.stages)
+    except (OSError, ValueError) as e:
+        print(f"Cannot load stages: {e}", file=sys.stderr)
+        return 1
+    model.execute(range(args.instances), args.workers, args.processes)
+    model.display_model()
+    return 0
+
+
 # Entry point for running the script
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(main(sys.argv[1:]))
     model = MandalModel()  # Create an instance of the model
     model.prompt_user()  # Prompt user to enter stages
     model.display_model()  # Display the stages entered
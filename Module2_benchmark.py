@@ -0,0 +1,122 @@
+# Pipeline Executor Benchmarks
+# Loads a waterfall of stages from a CSV file and runs many pipeline
+# instances through it sequentially, on a thread pool and on a process pool,
+# once with CPU-bound stages and once with stages that wait as if on I/O.
+# Checks that every mode gives the same results, then shows the per-stage
+# timings from display_model.
+# Run with: python Module2_benchmark.py [instances] [workers]
+import csv
+import hashlib
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import Module2_Assignment as mandal
+
+STAGES = [
+    # name, callable, depends_on
+    ("Requirements", "requirements", "-"),
+    ("Design", "design", ""),
+    ("Implementation", "implementation", ""),
+    ("Verification", "verification", "Design;Implementation"),
+    ("Maintenance", "maintenance", ""),
+]
+IO_WAIT = 0.0005  # seconds each I/O-bound stage waits
+
+
+def requirements(data):
+    return [f"req-{data['input']}-{i}" for i in range(8)]
+
+
+def design(data):
+    return {req: len(req) for req in data["Requirements"]}
+
+
+def implementation(data):
+    digest = repr(sorted(data["Design"].items())).encode()
+    for _ in range(200):
+        digest = hashlib.sha256(digest).digest()
+    return digest.hex()[:16]
+
+
+def verification(data):
+    return len(data["Design"]) == 8 and len(data["Implementation"]) == 16
+
+
+def maintenance(data):
+    if data["input"] % 1000 == 999:
+        raise ValueError("no maintainer assigned")
+    return "ok" if data["Verification"] else "fix"
+
+
+# The same stages waiting as if on a network or disk first
+def io_requirements(data):
+    time.sleep(IO_WAIT)
+    return requirements(data)
+
+
+def io_design(data):
+    time.sleep(IO_WAIT)
+    return design(data)
+
+
+def io_implementation(data):
+    time.sleep(IO_WAIT)
+    return implementation(data)
+
+
+def io_verification(data):
+    time.sleep(IO_WAIT)
+    return verification(data)
+
+
+def io_maintenance(data):
+    time.sleep(IO_WAIT)
+    return maintenance(data)
+
+
+def write_stages(path, prefix=""):
+    """
+    Writes STAGES as a CSV stage file, with callables from this module.
+    The module is named explicitly so workers import it even when it runs as __main__.
+    """
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["name", "callable", "depends_on"])
+        for name, func, depends_on in STAGES:
+            writer.writerow([name, f"Module2_benchmark:{prefix}{func}", depends_on])
+
+
+def benchmark_executor(label, prefix, count, workers):
+    """
+    Runs `count` instances sequentially, on threads and on processes, and
+    checks that all three agree.
+    """
+    print(f"\n{label} stages ({count:,} instances, {workers} workers)")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "stages.csv")
+        write_stages(path, prefix)
+        baseline = None
+        for mode, pool_workers, processes in (("sequential", 1, False), ("thread pool", workers, False),
+                                              ("process pool", workers, True)):
+            model = mandal.MandalModel()
+            model.load_stages(path)
+            start = time.perf_counter()
+            results = model.execute(range(count), pool_workers, processes, batch_size=max(1, count // (workers * 4)))
+            elapsed = time.perf_counter() - start
+            assert baseline is None or results == baseline, f"{mode} results differ."
+            baseline = results
+            failed = sum("error" in data for data in results)
+            print(f"{mode:<14} {elapsed:8.3f}s  {count / elapsed:10,.0f} instances/s  ({failed:,} failed)")
+    return model
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    w = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 4
+    logging.disable(logging.CRITICAL)
+    benchmark_executor("CPU-bound", "", n, w)
+    model = benchmark_executor("I/O-bound", "io_", n // 10, w * 4)
+    model.display_model()
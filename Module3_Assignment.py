@@ -1,14 +1,949 @@
+import argparse
+import functools
+import itertools
+import json
 import logging
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from shared_logging import setup_logging
 
 # Setup logging
-logging.basicConfig(
+setup_logging(
     filename='shopping_list_app.log',
     level=logging.INFO,
     format='%(asctime)s:%(levelname)s:%(message)s'
 )
 
-shopping_list = []
-TAX_RATE = 0.07  # fixed tax rate (7%)
+TAX_RATE = Decimal('0.07')  # default tax rate (7%)
+DEFAULT_CATEGORY = 'general'
+DEFAULT_CART = 'default'
+STORE_DIR = 'shopping_lists'
+CENT = Decimal('0.01')
+RATE_SCALE = 1_000_000  # tax rates are applied as integer parts per million
+
+def normalize_name(name):
+    return " ".join(name.split()).casefold()
+
+@functools.lru_cache(maxsize=65536)
+def to_money(value):
+    """
+    Converts a price (str, int, float or Decimal) to a Decimal rounded to the cent.
+    Floats go through str(), so 0.1 becomes exactly 0.10. Raises ValueError.
+    """
+    try:
+        money = Decimal(value if isinstance(value, (str, int, Decimal)) else str(value))
+    except (InvalidOperation, TypeError):
+        raise ValueError(f"Invalid price: {value!r}") from None
+    if not money.is_finite():
+        raise ValueError(f"Invalid price: {value!r}")
+    return money.quantize(CENT, rounding=ROUND_HALF_UP)
+
+@functools.lru_cache(maxsize=65536)
+def to_cents(value):
+    return int(to_money(value) * 100)
+
+def check_quantity(quantity):
+    """
+    Raises ValueError unless quantity is a positive int. bool is refused even
+    though it is an int subclass, as are floats such as JSON's 1.5.
+    """
+    if type(quantity) is not int or quantity <= 0:
+        raise ValueError(f"Quantity must be a positive whole number: {quantity!r}")
+
+@functools.lru_cache(maxsize=65536)
+def cents_to_money(cents):
+    return Decimal(cents).scaleb(-2)
+
+def tax_cents(amount_cents, rate_ppm):
+    """
+    Tax on amount_cents at rate_ppm parts per million, rounded half up to the cent.
+    """
+    return (amount_cents * rate_ppm + RATE_SCALE // 2) // RATE_SCALE
+
+class TaxEngine:
+    """
+    Tax rates by jurisdiction and category. rate() tries, in order,
+    (jurisdiction, category), (jurisdiction, any category),
+    (any jurisdiction, category) and then the default rate. Resolved rates are
+    cached per (jurisdiction, category) pair; set_rate() clears the cache.
+    """
+    def __init__(self, default_rate=TAX_RATE, rates=None):
+        self.default_rate = Decimal(str(default_rate))
+        self.rates = {}  # (jurisdiction or None, category or None) -> Decimal rate
+        self._cache = {}  # (jurisdiction, category) -> rate in parts per million
+        for (jurisdiction, category), rate in (rates or {}).items():
+            self.set_rate(rate, jurisdiction=jurisdiction, category=category)
+
+    def set_rate(self, rate, jurisdiction=None, category=None):
+        rate = Decimal(str(rate))
+        if rate < 0:
+            raise ValueError("Tax rate cannot be negative.")
+        self.rates[jurisdiction, category] = rate
+        self._cache.clear()
+
+    def rate(self, category=DEFAULT_CATEGORY, jurisdiction=None):
+        return Decimal(self.rate_ppm(category, jurisdiction)) / RATE_SCALE
+
+    def rate_ppm(self, category=DEFAULT_CATEGORY, jurisdiction=None):
+        """
+        The resolved rate as an integer number of parts per million.
+        """
+        key = (jurisdiction, category)
+        ppm = self._cache.get(key)
+        if ppm is None:
+            rates = self.rates
+            for candidate in (key, (jurisdiction, None), (None, category)):
+                if candidate in rates:
+                    rate = rates[candidate]
+                    break
+            else:
+                rate = self.default_rate
+            ppm = self._cache[key] = int((rate * RATE_SCALE).to_integral_value(rounding=ROUND_HALF_UP))
+        return ppm
+
+default_tax_engine = TaxEngine()
+
+def _line_parts(line):
+    # A cart line is an item dict or a (name, quantity, price[, category]) sequence
+    if isinstance(line, dict):
+        return line['name'], line['quantity'], line['price'], line.get('category', DEFAULT_CATEGORY)
+    if len(line) == 3:
+        return line[0], line[1], line[2], DEFAULT_CATEGORY
+    return line
+
+def price_cart(lines, tax_engine=default_tax_engine, jurisdiction=None, cart_id=None):
+    """
+    Prices one cart in integer cents and returns a receipt dict:
+    {'cart', 'lines': [{'name', 'quantity', 'price', 'category', 'line_total'}],
+     'subtotal', 'tax', 'tax_by_category', 'total'}, with money as Decimal.
+    Tax is worked out once per category on that category's subtotal.
+    Raises ValueError for a quantity that is not a positive int.
+    """
+    receipt_lines = []
+    by_category = {}
+    for line in lines:
+        if type(line) is tuple and len(line) == 4:
+            name, quantity, price, category = line
+        else:
+            name, quantity, price, category = _line_parts(line)
+        check_quantity(quantity)
+        line_cents = to_cents(price) * quantity
+        by_category[category] = by_category.get(category, 0) + line_cents
+        receipt_lines.append({'name': name, 'quantity': quantity, 'price': to_money(price),
+                              'category': category, 'line_total': cents_to_money(line_cents)})
+    subtotal = sum(by_category.values())
+    taxes = {category: tax_cents(amount, tax_engine.rate_ppm(category, jurisdiction))
+             for category, amount in by_category.items()}
+    tax = sum(taxes.values())
+    return {
+        'cart': cart_id,
+        'lines': receipt_lines,
+        'subtotal': cents_to_money(subtotal),
+        'tax': cents_to_money(tax),
+        'tax_by_category': {category: cents_to_money(amount) for category, amount in taxes.items()},
+        'total': cents_to_money(subtotal + tax),
+    }
+
+def checkout_batch(carts, tax_engine=default_tax_engine, jurisdiction=None):
+    """
+    Prices many carts and yields one receipt per cart, without printing.
+    carts is an iterable of carts (lists of lines, see price_cart) or of
+    (cart_id, lines) pairs when given as a dict's items().
+    """
+    if isinstance(carts, dict):
+        carts = carts.items()
+    else:
+        carts = enumerate(carts)
+    for cart_id, lines in carts:
+        yield price_cart(lines, tax_engine, jurisdiction, cart_id)
+
+class ShoppingList:
+    """
+    Shopping list store. Items are dicts ({'id', 'name', 'quantity', 'price',
+    'category'}) with prices as Decimal, kept in insertion order in a dict keyed
+    by id, with a second index by name, so lookups, edits and deletes are O(1).
+    Adding an item whose name (ignoring case and spacing), price and category
+    match an existing one adds to its quantity. The subtotal and per-category
+    subtotals (in cents) are updated on every change, so subtotal, tax and
+    total cost O(number of categories) however long the list is.
+    Every change to an item goes through _set(), which reports it to the
+    CartJournal when one is attached (see CartJournal for undo/redo).
+    """
+    def __init__(self, tax_engine=None, jurisdiction=None):
+        self.tax_engine = tax_engine if tax_engine is not None else default_tax_engine
+        self.jurisdiction = jurisdiction
+        self.items = {}  # id -> item, in id (= insertion) order
+        self._by_name = {}  # normalized name -> {id: None}, in id order
+        self._by_key = {}  # (normalized name, price, category) -> id, for merging
+        self._next_id = 1
+        self._ordered = True  # False after an undo puts an item back mid-list
+        self.subtotal_cents = 0
+        self.category_cents = {}  # category -> subtotal in cents
+        self.journal = None
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        if not self._ordered:
+            self._reorder()
+        return iter(self.items.values())
+
+    def __bool__(self):
+        return bool(self.items)
+
+    @property
+    def subtotal(self):
+        return cents_to_money(self.subtotal_cents)
+
+    @property
+    def tax_cents(self):
+        engine, jurisdiction = self.tax_engine, self.jurisdiction
+        return sum(tax_cents(amount, engine.rate_ppm(category, jurisdiction))
+                   for category, amount in self.category_cents.items())
+
+    @property
+    def tax(self):
+        return cents_to_money(self.tax_cents)
+
+    @property
+    def total(self):
+        return cents_to_money(self.subtotal_cents + self.tax_cents)
+
+    def receipt(self):
+        return price_cart(iter(self), self.tax_engine, self.jurisdiction)
+
+    def get(self, item_id):
+        """
+        Returns the item with this id. Raises KeyError if there is none.
+        """
+        return self.items[item_id]
+
+    def find(self, name):
+        """
+        Returns the items with this name (ignoring case and spacing), oldest first.
+        """
+        if not self._ordered:
+            self._reorder()
+        return [self.items[item_id] for item_id in self._by_name.get(normalize_name(name), ())]
+
+    def ids(self):
+        return [item['id'] for item in self]
+
+    def _reorder(self):
+        # Items restored by undo were appended; put everything back in id order
+        self.items = dict(sorted(self.items.items()))
+        self._by_name = {key: dict.fromkeys(sorted(ids)) for key, ids in self._by_name.items()}
+        self._ordered = True
+
+    def _validate(self, name, quantity, price):
+        if not isinstance(name, str):
+            raise ValueError(f"Item name must be text: {name!r}")
+        if not name.strip():
+            raise ValueError("Item name cannot be empty.")
+        check_quantity(quantity)
+        if price < 0:
+            raise ValueError("Price cannot be negative.")
+
+    def _index(self, item):
+        key = normalize_name(item['name'])
+        self._by_name.setdefault(key, {})[item['id']] = None
+        self._by_key[key, item['price'], item['category']] = item['id']
+
+    def _unindex(self, item):
+        key = normalize_name(item['name'])
+        ids = self._by_name[key]
+        del ids[item['id']]
+        if not ids:
+            del self._by_name[key]
+        del self._by_key[key, item['price'], item['category']]
+
+    def _count(self, price, quantity, category, sign=1):
+        cents = int(price * 100) * quantity * sign
+        self.subtotal_cents += cents
+        remaining = self.category_cents.get(category, 0) + cents
+        if remaining or sign > 0:
+            self.category_cents[category] = remaining
+        else:
+            del self.category_cents[category]
+
+    def _set(self, item_id, fields):
+        """
+        Sets an item's (name, quantity, price, category), adding the item if
+        there is none with this id, or removes the item when fields is None.
+        Returns the item.
+        """
+        item = self.items.get(item_id)
+        before = None
+        if item is not None:
+            before = (item['name'], item['quantity'], item['price'], item['category'])
+            self._count(item['price'], item['quantity'], item['category'], -1)
+        if fields is None:
+            del self.items[item_id]
+            self._unindex(item)
+        else:
+            name, quantity, price, category = fields
+            if item is None:
+                if self.items and item_id < next(reversed(self.items)):
+                    self._ordered = False
+                item = self.items[item_id] = {'id': item_id, 'name': name, 'quantity': quantity,
+                                              'price': price, 'category': category}
+                self._next_id = max(self._next_id, item_id + 1)
+                self._index(item)
+            elif name == before[0] and price == before[2] and category == before[3]:
+                item['quantity'] = quantity
+            else:
+                self._unindex(item)
+                item.update(name=name, quantity=quantity, price=price, category=category)
+                self._index(item)
+            self._count(price, quantity, category)
+        if self.journal is not None:
+            self.journal.record(item_id, before, fields)
+        return item
+
+    def _commit(self, op):
+        # Ends one change; the journal keeps its item changes as one undo step
+        if self.journal is not None:
+            self.journal.commit(op)
+
+    def add(self, name, quantity, price, category=DEFAULT_CATEGORY):
+        """
+        Adds an item, or adds quantity to a matching item. Returns the item.
+        """
+        price = to_money(price)
+        category = category or DEFAULT_CATEGORY
+        self._validate(name, quantity, price)
+        name = name.strip()
+        existing = self._by_key.get((normalize_name(name), price, category))
+        if existing is not None:
+            item = self.items[existing]
+            item = self._set(existing, (item['name'], item['quantity'] + quantity, price, category))
+        else:
+            item = self._set(self._next_id, (name, quantity, price, category))
+        self._commit('add')
+        return item
+
+    def edit(self, item_id, name=None, quantity=None, price=None, category=None):
+        """
+        Changes an item's name, quantity, price and/or category (None keeps the
+        current value). If the result matches another item, the two are merged.
+        Returns the item.
+        """
+        item = self.items[item_id]
+        if name is not None and not isinstance(name, str):
+            raise ValueError(f"Item name must be text: {name!r}")
+        name = item['name'] if name is None or not name.strip() else name.strip()
+        quantity = item['quantity'] if quantity is None else quantity
+        price = item['price'] if price is None else to_money(price)
+        category = category or item['category']
+        self._validate(name, quantity, price)
+
+        merged = self._by_key.get((normalize_name(name), price, category))
+        if merged is not None and merged != item_id:
+            self._set(item_id, None)
+            other = self.items[merged]
+            item = self._set(merged, (other['name'], other['quantity'] + quantity, price, category))
+        else:
+            # Same id and position in the list
+            item = self._set(item_id, (name, quantity, price, category))
+        self._commit('edit')
+        return item
+
+    def delete(self, item_id):
+        """
+        Removes an item and returns it. Raises KeyError if there is none.
+        """
+        item = self.items[item_id]
+        self._set(item_id, None)
+        self._commit('delete')
+        return item
+
+    def clear(self):
+        if self.journal is not None:
+            # Item by item, so the clear can be undone
+            for item_id in list(self.items):
+                self._set(item_id, None)
+            self._commit('clear')
+            return
+        self.items.clear()
+        self._by_name.clear()
+        self._by_key.clear()
+        self.subtotal_cents = 0
+        self.category_cents.clear()
+
+    def undo(self):
+        """
+        Undoes the last change. Returns the name of the operation undone, or
+        None if there is nothing to undo. Raises ValueError without a journal.
+        """
+        if self.journal is None:
+            raise ValueError("This list has no undo history.")
+        return self.journal.undo()
+
+    def redo(self):
+        """
+        Redoes the last undone change, like undo().
+        """
+        if self.journal is None:
+            raise ValueError("This list has no undo history.")
+        return self.journal.redo()
+
+    def patch(self, changes):
+        """
+        Applies changes in the form CartJournal.changes_since() gives them: a
+        list of steps, each a list of [item_id, fields] (see encode_fields).
+        """
+        for step in changes:
+            for item_id, after in step:
+                self._set(item_id, decode_fields(after))
+            self._commit('patch')
+
+    def to_dict(self):
+        """
+        JSON-ready state: items in order as [id, name, quantity, price, category].
+        """
+        return {
+            'next_id': self._next_id,
+            'jurisdiction': self.jurisdiction,
+            'items': [[item['id'], item['name'], item['quantity'], str(item['price']), item['category']]
+                      for item in self],
+        }
+
+    def load(self, data):
+        """
+        Replaces the list's contents with to_dict() output. Not journaled.
+        """
+        self.items = {}
+        self._by_name = {}
+        self._by_key = {}
+        self._ordered = True
+        self.subtotal_cents = 0
+        self.category_cents = {}
+        for item_id, name, quantity, price, category in data['items']:
+            check_quantity(quantity)
+            item = {'id': item_id, 'name': name, 'quantity': quantity, 'price': to_money(price), 'category': category}
+            self.items[item_id] = item
+            self._index(item)
+            self._count(item['price'], quantity, category)
+        self._next_id = data['next_id']
+        self.jurisdiction = data.get('jurisdiction')
+
+    @classmethod
+    def from_dict(cls, data, tax_engine=None):
+        shopping = cls(tax_engine)
+        shopping.load(data)
+        return shopping
+
+def encode_fields(fields):
+    # Item fields as JSON: [name, quantity, price as a string, category], or None
+    if fields is None:
+        return None
+    name, quantity, price, category = fields
+    return [name, quantity, str(price), category]
+
+def decode_fields(fields):
+    if fields is None:
+        return None
+    name, quantity, price, category = fields
+    check_quantity(quantity)
+    return (name, quantity, to_money(price), category)
+
+class CartJournal:
+    """
+    Undo/redo history and change log for one ShoppingList, which it attaches
+    itself to. Each change is kept as a step: a tuple of (item_id, before,
+    after) diffs for the items it touched, with item fields as (name,
+    quantity, price, category) tuples and None for "no such item". Undo
+    applies a step's befores and redo its afters, so each costs O(items the
+    step touched) however long the list is; only a clear touches every item.
+    history_limit caps how many steps can be undone.
+
+    The same steps form a change log for keeping another copy of the cart in
+    sync: the copy passes its version to changes_since() and hands the result
+    to its own journal's apply_changes(), so only what changed is sent. Once
+    the log has snapshot_every steps (and no fewer than the list has items) it
+    is folded into a snapshot of the list; a copy that is further behind (or
+    new, with version None) gets the snapshot and the steps after it instead.
+    """
+    def __init__(self, shopping, snapshot_every=1000, history_limit=None):
+        self.shopping = shopping
+        self.snapshot_every = snapshot_every
+        self.history = deque(maxlen=history_limit)  # (op, step) that can be undone, oldest first
+        self.future = []  # undone (op, step), most recently undone last
+        self.last_step = None  # the most recent step applied, for logging
+        self._pending = []
+        self._replaying = False
+        shopping.journal = self
+        self.reset()
+
+    @property
+    def version(self):
+        # Number of steps applied since the journal started
+        return self.snapshot_version + len(self.changes)
+
+    def reset(self):
+        """
+        Forgets the history and restarts the change log, at version 0, from
+        the list as it is now. Copies synced before must start over from None.
+        """
+        self.history.clear()
+        self.future.clear()
+        self.snapshot = self.shopping.to_dict()
+        self.snapshot_version = 0
+        self.changes = []  # steps since the snapshot
+
+    def record(self, item_id, before, after):
+        self._pending.append((item_id, before, after))
+
+    def commit(self, op):
+        if not self._pending:
+            return  # nothing changed, e.g. clearing an empty list
+        step = self.last_step = tuple(self._pending)
+        self._pending.clear()
+        if not self._replaying:
+            self.history.append((op, step))
+            self.future.clear()
+        self.changes.append(step)
+        # Waiting for at least len(items) steps keeps snapshots O(1) per step
+        if len(self.changes) >= self.snapshot_every and len(self.changes) >= len(self.shopping.items):
+            self.snapshot_version = self.version
+            self.snapshot = self.shopping.to_dict()
+            self.changes = []
+
+    def _replay(self, op, step, backwards):
+        self._replaying = True
+        try:
+            if backwards:
+                for item_id, before, _ in reversed(step):
+                    self.shopping._set(item_id, before)
+            else:
+                for item_id, _, after in step:
+                    self.shopping._set(item_id, after)
+            self.commit(op)
+        finally:
+            self._replaying = False
+
+    def undo(self):
+        """
+        Undoes the last step. Returns its operation name, or None if there is
+        nothing to undo.
+        """
+        if not self.history:
+            return None
+        op, step = self.history.pop()
+        self._replay('undo', step, backwards=True)
+        self.future.append((op, step))
+        return op
+
+    def redo(self):
+        """
+        Redoes the last undone step. Returns its operation name, or None if
+        there is nothing to redo.
+        """
+        if not self.future:
+            return None
+        op, step = self.future.pop()
+        self._replay('redo', step, backwards=False)
+        self.history.append((op, step))
+        return op
+
+    @staticmethod
+    def encode(steps):
+        # Only the afters are needed to move a copy forward
+        return [[[item_id, encode_fields(after)] for item_id, _, after in step] for step in steps]
+
+    def changes_since(self, version):
+        """
+        Returns, JSON-ready, what a copy at `version` needs to catch up:
+        {'from': version, 'to': current version, 'changes': steps}, or when the
+        copy is older than the snapshot, the snapshot as well and 'from' set to
+        the snapshot's version. Raises ValueError if version is ahead of this
+        journal.
+        """
+        if version is not None and version > self.version:
+            raise ValueError(f"Version {version} is ahead of this journal ({self.version}).")
+        if version is not None and version >= self.snapshot_version:
+            sync = {'from': version, 'changes': self.encode(self.changes[version - self.snapshot_version:])}
+        else:
+            sync = {'from': self.snapshot_version, 'snapshot': self.snapshot, 'changes': self.encode(self.changes)}
+        sync['to'] = self.version
+        return sync
+
+    def apply_changes(self, sync):
+        """
+        Brings this copy up to date with changes_since() output from another
+        copy, which leaves it at the same version. The undo history is
+        dropped, as it no longer matches the list. Raises ValueError if the
+        changes do not start at this copy's version.
+        """
+        if 'snapshot' in sync:
+            self.shopping.load(sync['snapshot'])
+            self.snapshot = sync['snapshot']
+            self.snapshot_version = sync['from']
+            self.changes = []
+        elif sync['from'] != self.version:
+            raise ValueError(f"Changes start at version {sync['from']}, this copy is at {self.version}.")
+        self._replaying = True
+        try:
+            self.shopping.patch(sync['changes'])
+        finally:
+            self._replaying = False
+        self.history.clear()
+        self.future.clear()
+
+# Cart operations that change a cart (and are written to the log), and their arguments
+CART_MUTATIONS = {
+    'add': ('name', 'quantity', 'price', 'category'),
+    'edit': ('item_id', 'name', 'quantity', 'price', 'category'),
+    'delete': ('item_id',),
+    'clear': (),
+    'undo': (),
+    'redo': (),
+}
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+class CartStore:
+    """
+    Many named shopping lists with durable storage: an append-only JSONL log of
+    cart changes ([seq, cart, op, args]) plus snapshots, in the style of the
+    PHTRS EventStore. Log lines are buffered and written with one write + fsync
+    once batch_size are pending or flush_interval seconds have passed (checked
+    on each change), and on flush()/close(). Without a directory nothing is
+    written.
+    With journal=True every cart gets a CartJournal, so 'undo' and 'redo' work;
+    they are logged as the item changes they made ('patch'), so replay does
+    not depend on history from before a restart, which is not kept.
+    Changes to one cart are serialized by that cart's lock, so different carts
+    can be served from different threads. snapshot() does not stop the world:
+    it switches to a fresh log, then copies each cart under its own lock along
+    with the seq of its last change, and replay skips changes a cart's
+    snapshot already has.
+    """
+    LOG_NAME = 'carts.jsonl'
+    SNAPSHOT_NAME = 'carts_snapshot.json'
+
+    def __init__(self, directory=None, tax_engine=None, batch_size=1000, flush_interval=0.05,
+                 snapshot_every=100_000, journal=False):
+        self.directory = directory
+        self.tax_engine = tax_engine if tax_engine is not None else default_tax_engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.snapshot_every = snapshot_every
+        self.journal = journal
+        self.carts = {}  # cart id -> ShoppingList
+        self.cart_seq = {}  # cart id -> seq of its last logged change
+        self.seq = 0
+        self.changes_since_snapshot = 0
+        self._locks = {}  # cart id -> lock
+        self._guard = threading.Lock()  # cart creation, seq and the log buffer
+        self._snapshot_lock = threading.Lock()
+        self._buffer = []
+        self._file = None
+        self._last_flush = time.monotonic()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self.log_path = os.path.join(directory, self.LOG_NAME)
+            self.old_log_path = self.log_path + '.old'
+            self.snapshot_path = os.path.join(directory, self.SNAPSHOT_NAME)
+            self.recover()
+
+    def cart(self, cart_id, jurisdiction=None):
+        """
+        Returns the cart with this id, creating an empty one if needed.
+        """
+        shopping = self.carts.get(cart_id)
+        if shopping is None:
+            with self._guard:
+                shopping = self.carts.get(cart_id)
+                if shopping is None:
+                    self._locks[cart_id] = threading.Lock()
+                    shopping = self.carts[cart_id] = ShoppingList(self.tax_engine, jurisdiction)
+                    if self.journal:
+                        CartJournal(shopping)
+        return shopping
+
+    def execute(self, cart_id, op, **args):
+        """
+        Runs one cart operation under the cart's lock and returns its result.
+        Changes (CART_MUTATIONS) are logged after they succeed; 'checkout'
+        returns a receipt and 'view' the items. Raises ValueError/KeyError as
+        the ShoppingList does.
+        """
+        shopping = self.cart(cart_id)
+        if op == 'checkout':
+            with self._locks[cart_id]:  # receipt() may reorder the items
+                return shopping.receipt()
+        if op == 'view':
+            with self._locks[cart_id]:
+                return list(shopping)
+        if op not in CART_MUTATIONS:
+            raise ValueError(f"Unknown operation: {op!r}")
+        with self._locks[cart_id]:
+            result = getattr(shopping, op)(**args)
+            if self.directory is not None:
+                if op in ('undo', 'redo'):
+                    if result is not None:
+                        self._append(cart_id, 'patch', {'changes': CartJournal.encode([shopping.journal.last_step])})
+                else:
+                    self._append(cart_id, op, args)
+        if self.snapshot_every and self.changes_since_snapshot >= self.snapshot_every:
+            self.snapshot()
+        return result
+
+    def _append(self, cart_id, op, args):
+        # Called with the cart's lock held, so a cart's changes are logged in order
+        with self._guard:
+            self.seq += 1
+            self.cart_seq[cart_id] = self.seq
+            self._buffer.append(json.dumps([self.seq, cart_id, op, args], separators=(',', ':'),
+                                           default=_json_default))
+            self.changes_since_snapshot += 1
+            if len(self._buffer) >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+                self._write()
+
+    def _write(self):
+        # Called with _guard held
+        if self._buffer:
+            if self._file is None:
+                self._file = open(self.log_path, 'a', encoding='utf-8')
+            self._file.write('\n'.join(self._buffer) + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._buffer.clear()
+        self._last_flush = time.monotonic()
+
+    def flush(self):
+        """
+        Writes all buffered changes in one write and fsyncs the log.
+        """
+        if self.directory is not None:
+            with self._guard:
+                self._write()
+
+    def close(self):
+        self.flush()
+        with self._guard:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def snapshot(self):
+        """
+        Atomically writes every cart, then deletes the log it replaces.
+        """
+        if self.directory is None or not self._snapshot_lock.acquire(blocking=False):
+            return  # in memory only, or another thread is already snapshotting
+        try:
+            with self._guard:
+                # New changes go to a fresh log from here on
+                self._write()
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                if os.path.exists(self.log_path):
+                    os.replace(self.log_path, self.old_log_path)
+                self.changes_since_snapshot = 0
+                carts = list(self.carts.items())
+            state = {}
+            for cart_id, shopping in carts:
+                with self._locks[cart_id]:
+                    state[cart_id] = shopping.to_dict()
+                    state[cart_id]['seq'] = self.cart_seq.get(cart_id, 0)
+            temp_path = self.snapshot_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump({'seq': self.seq, 'carts': state}, file, separators=(',', ':'))
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, self.snapshot_path)
+            if os.path.exists(self.old_log_path):
+                os.remove(self.old_log_path)
+        finally:
+            self._snapshot_lock.release()
+        logging.info(f"Cart snapshot written ({len(state)} carts).")
+
+    def recover(self):
+        """
+        Loads the snapshot and replays the logs after it. A torn final line
+        (from a crash mid-write) is cut off the log.
+        """
+        seq = 0
+        replayed = 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, encoding='utf-8') as file:
+                state = json.load(file)
+            for cart_id, data in state['carts'].items():
+                shopping = self.carts[cart_id] = ShoppingList.from_dict(data, self.tax_engine)
+                if self.journal:
+                    CartJournal(shopping)
+                self._locks[cart_id] = threading.Lock()
+                self.cart_seq[cart_id] = data['seq']
+            seq = state['seq']
+        # A .old log is left only if a snapshot was interrupted
+        for path in (self.old_log_path, self.log_path):
+            if not os.path.exists(path):
+                continue
+            good_size = 0
+            with open(path, 'rb') as file:
+                for raw in file:
+                    try:
+                        change_seq, cart_id, op, args = json.loads(raw)
+                    except ValueError:
+                        break
+                    if not raw.endswith(b'\n'):
+                        break
+                    good_size += len(raw)
+                    seq = max(seq, change_seq)
+                    if change_seq > self.cart_seq.get(cart_id, 0):
+                        getattr(self.cart(cart_id), op)(**args)
+                        self.cart_seq[cart_id] = change_seq
+                        replayed += 1
+            if good_size < os.path.getsize(path):
+                with open(path, 'r+b') as file:
+                    file.truncate(good_size)
+        for shopping in self.carts.values():
+            if shopping.journal is not None:
+                shopping.journal.reset()  # replayed changes are not undoable
+        self.seq = seq
+        self.changes_since_snapshot = replayed
+        logging.info(f"Recovered {len(self.carts)} carts ({replayed} changes replayed).")
+
+def run_command(store, command):
+    """
+    Runs one headless command and returns a JSON-ready reply.
+    A command is a dict: {"cmd": "add" | "edit" | "delete" | "clear" | "undo"
+    | "redo" | "checkout" | "view", "cart": a string or integer cart id (default "default"), plus the operation's
+    arguments, e.g. "name", "quantity", "price", "category", "item_id"}.
+    An optional "ref" is echoed back so callers can match replies. A string in
+    place of a command is an input error and is returned as the reply's error.
+    """
+    if isinstance(command, str):
+        return {'cart': None, 'cmd': None, 'ok': False, 'error': command}
+    op = command.get('cmd')
+    reply = {'cart': command.get('cart', DEFAULT_CART), 'cmd': op}
+    if 'ref' in command:
+        reply['ref'] = command['ref']
+    if _cart_key(command) is None:
+        reply['ok'] = False
+        reply['error'] = f"Invalid cart id: {reply['cart']!r}"
+        return reply
+    try:
+        names = CART_MUTATIONS.get(op, ())
+        args = {name: command[name] for name in names if name in command}
+        reply['result'] = store.execute(reply['cart'], op, **args)
+        reply['ok'] = True
+    except (ValueError, KeyError, TypeError) as e:
+        reply['ok'] = False
+        reply['error'] = str(e)
+    return reply
+
+def _cart_key(command):
+    # The cart id of a command, or None if it has none usable (not a str or int)
+    if not isinstance(command, dict):
+        return None
+    cart_id = command.get('cart', DEFAULT_CART)
+    if type(cart_id) is str or type(cart_id) is int:
+        return cart_id
+    return None
+
+def run_commands(store, commands, workers=1, chunk_size=10_000):
+    """
+    Runs a stream of commands and yields the replies in input order. With
+    workers > 1 each chunk of commands is split by cart and the carts run on a
+    thread pool; commands for one cart still run in order.
+    """
+    if workers <= 1:
+        for command in commands:
+            yield run_command(store, command)
+        return
+    commands = iter(commands)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            chunk = list(itertools.islice(commands, chunk_size))
+            if not chunk:
+                break
+            by_cart = defaultdict(list)
+            for index, command in enumerate(chunk):
+                by_cart[_cart_key(command)].append(index)  # None: rejected by run_command
+            replies = [None] * len(chunk)
+
+            def run_cart(indexes):
+                for index in indexes:
+                    replies[index] = run_command(store, chunk[index])
+
+            for future in [pool.submit(run_cart, indexes) for indexes in by_cart.values()]:
+                future.result()
+            yield from replies
+
+def _read_commands(infile):
+    for line_number, line in enumerate(infile, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            command = json.loads(line)
+            if not isinstance(command, dict):
+                raise ValueError("a command must be a JSON object")
+        except ValueError as e:
+            command = f"Invalid command on line {line_number}: {e}"
+        yield command
+
+def headless_main(argv):
+    """
+    Command-line entry point for headless mode: JSONL commands in, JSONL replies out.
+    """
+    parser = argparse.ArgumentParser(description="Run shopping list commands from a JSONL stream.")
+    parser.add_argument('input', nargs='?', default='-', help="JSONL command file, or '-' for stdin (default).")
+    parser.add_argument('-o', '--output', default='-', help="JSONL reply file (default: stdout).")
+    parser.add_argument('--store', default=STORE_DIR,
+                        help=f"Directory for the cart log and snapshots (default: {STORE_DIR}); '' for in-memory only.")
+    parser.add_argument('--workers', type=int, default=1, help="Threads serving different carts (default: 1).")
+    parser.add_argument('--undo', action='store_true', help="Keep undo history so 'undo'/'redo' commands work.")
+    args = parser.parse_args(argv)
+
+    infile = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    outfile = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    store = CartStore(args.store or None, journal=args.undo)
+    count = failed = 0
+    try:
+        for reply in run_commands(store, _read_commands(infile), args.workers):
+            count += 1
+            failed += not reply['ok']
+            outfile.write(json.dumps(reply, separators=(',', ':'), default=_json_default) + '\n')
+    finally:
+        store.close()
+        if infile is not sys.stdin:
+            infile.close()
+        if outfile is not sys.stdout:
+            outfile.close()
+    print(f"Ran {count} commands, {failed} failed.", file=sys.stderr)
+    return 0
+
+shopping_list = ShoppingList()
+cart_store = None  # CartStore behind shopping_list once main() has opened it
+
+def change(op, **args):
+    """
+    Applies a change to the interactive list, through the cart store when there is one.
+    """
+    if cart_store is not None:
+        return cart_store.execute(DEFAULT_CART, op, **args)
+    return getattr(shopping_list, op)(**args)
 
 def home_screen():
     while True:
@@ -40,17 +975,21 @@ def add_item_screen():
     name = input("Enter item name: ").strip()
     try:
         quantity = int(input("Enter quantity: ").strip())
-        price = float(input("Enter price per item: $").strip())
+        price = to_money(input("Enter price per item: $").strip())
     except ValueError:
         print("Invalid input. Quantity must be an integer and price a number.")
         return
+    category = input(f"Enter category (leave blank for {DEFAULT_CATEGORY}): ").strip().lower()
 
-    if name:
-        shopping_list.append({'name': name, 'quantity': quantity, 'price': price})
-        print(f"Added: {name} (x{quantity}) at ${price:.2f} each")
-        logging.info(f"Added item: {name} x{quantity} @ ${price:.2f}")
-    else:
-        print("Item name cannot be empty.")
+    try:
+        item = change('add', name=name, quantity=quantity, price=price, category=category or DEFAULT_CATEGORY)
+    except ValueError as e:
+        print(e)
+        return
+    print(f"Added: {name} (x{quantity}) at ${price:.2f} each")
+    if item['quantity'] != quantity:
+        print(f"Merged with existing item: {item['name']} (x{item['quantity']})")
+    logging.info(f"Added item: {name} x{quantity} @ ${price:.2f}")
 
 def view_list_screen():
     while True:
@@ -59,7 +998,9 @@ def view_list_screen():
             print("Your shopping list is empty.")
             return
 
+        ids = []  # item id for each displayed number
         for idx, item in enumerate(shopping_list, 1):
+            ids.append(item['id'])
             total = item['price'] * item['quantity']
             print(f"{idx}. {item['name']} (x{item['quantity']}) - ${total:.2f}")
 
@@ -72,19 +1013,23 @@ def view_list_screen():
             index = input("Enter item number to modify: ").strip()
             try:
                 idx = int(index) - 1
-                if action == 'e':
-                    edit_item_screen(idx)
-                elif action == 'd':
-                    deleted = shopping_list.pop(idx)
-                    print(f"Deleted: {deleted['name']}")
-                    logging.info(f"Deleted item: {deleted['name']}")
+                if idx < 0:
+                    raise IndexError
+                item_id = ids[idx]
             except (ValueError, IndexError):
                 print("Invalid item number.")
+                continue
+            if action == 'e':
+                edit_item_screen(item_id)
+            elif action == 'd':
+                deleted = change('delete', item_id=item_id)
+                print(f"Deleted: {deleted['name']}")
+                logging.info(f"Deleted item: {deleted['name']}")
         else:
             print("Invalid option.")
 
-def edit_item_screen(index):
-    item = shopping_list[index]
+def edit_item_screen(item_id):
+    item = shopping_list.get(item_id)
     print(f"\n--- Edit Item Screen ---")
     print(f"Editing: {item['name']} (x{item['quantity']}) at ${item['price']:.2f}")
     new_name = input("Enter new name (leave blank to keep current): ").strip()
@@ -92,31 +1037,45 @@ def edit_item_screen(index):
         new_qty = input("Enter new quantity (leave blank to keep current): ").strip()
         new_qty = int(new_qty) if new_qty else item['quantity']
         new_price = input("Enter new price (leave blank to keep current): ").strip()
-        new_price = float(new_price) if new_price else item['price']
+        new_price = to_money(new_price) if new_price else item['price']
     except ValueError:
         print("Invalid input. Quantity must be an integer and price a number.")
         return
 
-    item['name'] = new_name if new_name else item['name']
-    item['quantity'] = new_qty
-    item['price'] = new_price
-
-    shopping_list[index] = item
+    try:
+        item = change('edit', item_id=item_id, name=new_name, quantity=new_qty, price=new_price)
+    except ValueError as e:
+        print(e)
+        return
     print("Item updated.")
     logging.info(f"Updated item: {item['name']} x{item['quantity']} @ ${item['price']:.2f}")
 
 def settings_screen():
     print("\n--- Settings Screen ---")
     print("1. Clear Shopping List")
-    print("2. Back to Home")
+    print("2. Undo Last Change")
+    print("3. Redo")
+    print("4. Back to Home")
     choice = input("Select an option: ").strip()
     if choice == '1':
         confirm = input("Are you sure you want to clear the list? (y/n): ").strip().lower()
         if confirm == 'y':
-            shopping_list.clear()
-            print("Shopping list cleared.")
+            change('clear')
+            print("Shopping list cleared. (Undo from Settings.)")
             logging.info("Shopping list cleared by user.")
-    elif choice == '2':
+    elif choice in ('2', '3'):
+        op = 'undo' if choice == '2' else 'redo'
+        try:
+            undone = change(op)
+        except ValueError as e:
+            print(e)
+            return
+        if undone is None:
+            print(f"Nothing to {op}.")
+        else:
+            print(f"{op.title()}: {undone}")
+            logging.info(f"User chose {op} of {undone}.")
+    elif choice == '4':
         return
     else:
         print("Invalid option.")
@@ -126,19 +1085,28 @@ def checkout_screen():
         print("Shopping list is empty.")
         return
 
-    subtotal = sum(item['price'] * item['quantity'] for item in shopping_list)
-    tax = subtotal * TAX_RATE
-    total = subtotal + tax
+    receipt = shopping_list.receipt()
+    subtotal, tax, total = receipt['subtotal'], receipt['tax'], receipt['total']
 
     print(f"\nSubtotal: ${subtotal:.2f}")
-    print(f"Tax (7%): ${tax:.2f}")
+    for category, category_tax in receipt['tax_by_category'].items():
+        rate = shopping_list.tax_engine.rate(category, shopping_list.jurisdiction)
+        print(f"Tax ({category}, {rate:.2%}): ${category_tax:.2f}")
     print(f"Total with tax: ${total:.2f}")
 
     logging.info(f"Checkout - Subtotal: ${subtotal:.2f}, Tax: ${tax:.2f}, Total: ${total:.2f}")
 
 def main():
+    global cart_store, shopping_list
     print("Welcome to the Shopping List App (Fixed Tax Version)!")
-    home_screen()
+    cart_store = CartStore(STORE_DIR, journal=True)
+    shopping_list = cart_store.cart(DEFAULT_CART)
+    try:
+        home_screen()
+    finally:
+        cart_store.close()
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(headless_main(sys.argv[1:]))
     main()
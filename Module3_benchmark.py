@@ -0,0 +1,255 @@
+# Shopping List Benchmarks
+# Compares the old float checkout math with the exact integer-cents batch
+# checkout, and shows how far float totals drift on large carts.
+# Also replays a headless command stream through the persistent cart store
+# with different thread counts and checks that recovery rebuilds every cart
+# (and that malformed commands are rejected without ending the stream),
+# and measures the undo/redo journal: its memory, undo/redo and replay speed,
+# and how much smaller a diff sync is than sending the whole list.
+# Run with: python Module3_benchmark.py [carts] [items_per_cart]
+import io
+import json
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from decimal import Decimal
+
+import Module3_Assignment as shop
+
+CATEGORIES = ["general", "grocery", "household", "clothing"]
+
+
+def make_carts(count, items, seed=303):
+    """
+    Builds reproducible carts of (name, quantity, price, category) lines,
+    with prices given as strings the way they are typed in.
+    """
+    rng = random.Random(seed)
+    return [[(f"item-{rng.randrange(5000)}", rng.randint(1, 5), f"{rng.randrange(1, 5000) / 100:.2f}",
+              rng.choice(CATEGORIES)) for _ in range(items)]
+            for _ in range(count)]
+
+
+def float_checkout(cart, rate=0.07):
+    """
+    The checkout_screen arithmetic before exact pricing: float prices, one fixed rate.
+    """
+    subtotal = sum(float(price) * quantity for _, quantity, price, _ in cart)
+    tax = subtotal * rate
+    return subtotal, tax, subtotal + tax
+
+
+def timed(label, func, count):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed:8.3f}s  {count / elapsed:10,.0f} carts/s")
+    return result
+
+
+def benchmark_checkout(count=10_000, items=20):
+    """
+    Float path vs. checkout_batch with a single 7% rate, then with per-category
+    and per-jurisdiction rates.
+    """
+    carts = make_carts(count, items)
+    print(f"\nCheckout ({count:,} carts of {items} items)")
+    floats = timed("float path", lambda: [float_checkout(cart) for cart in carts], count)
+    timed("checkout_batch, one rate", lambda: list(shop.checkout_batch(carts)), count)
+
+    engine = shop.TaxEngine(rates={(None, "grocery"): "0.02", (None, "clothing"): "0.05",
+                                   ("NY", None): "0.08875", ("NY", "grocery"): "0"})
+    timed("checkout_batch, NY rates", lambda: list(shop.checkout_batch(carts, engine, "NY")), count)
+
+    # Where the float total rounds to a different cent than the exact total.
+    # Both are taxed on the whole subtotal here, so per-category rounding plays no part
+    single = [[(name, quantity, price, "general") for name, quantity, price, _ in cart] for cart in carts]
+    differ = sum(f"{total:.2f}" != str(receipt["total"])
+                 for (_, _, total), receipt in zip(floats, shop.checkout_batch(single)))
+    print(f"float total off by a cent on {differ:,} of {count:,} carts")
+
+
+def benchmark_drift(items=1_000_000):
+    """
+    Running float subtotal vs. exact subtotal as one list grows to `items` lines.
+    """
+    print(f"\nRunning subtotal drift ({items:,} adds of $0.10)")
+    running = 0.0
+    for _ in range(items):
+        running += 0.10
+    shopping = shop.ShoppingList()
+    start = time.perf_counter()
+    for i in range(items):
+        shopping.add(f"item-{i}", 1, "0.10")
+    elapsed = time.perf_counter() - start
+    exact = shopping.subtotal
+    print(f"float: {running!r}  exact: {exact}  error: {Decimal(repr(running)) - exact}")
+    print(f"ShoppingList.add {items / elapsed:,.0f} items/s; total {shopping.total} in O(categories)")
+
+
+def make_commands(count, carts, seed=323):
+    """
+    Builds a reproducible JSONL command stream, mostly adds, over `carts` carts.
+    """
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(count):
+        command = {"cart": f"cart-{rng.randrange(carts)}"}
+        roll = rng.random()
+        if roll < 0.8:
+            command.update(cmd="add", name=f"item-{rng.randrange(200)}", quantity=rng.randint(1, 5),
+                           price=f"{rng.randrange(1, 5000) / 100:.2f}", category=rng.choice(CATEGORIES))
+        elif roll < 0.9:
+            command.update(cmd="edit", item_id=rng.randrange(1, 100), quantity=rng.randint(1, 5))
+        elif roll < 0.97:
+            command.update(cmd="delete", item_id=rng.randrange(1, 100))
+        else:
+            command.update(cmd="checkout")
+        lines.append(json.dumps(command))
+    return "\n".join(lines) + "\n"
+
+
+def benchmark_replay(count=200_000, carts=1_000, worker_counts=(1, 4, 16)):
+    """
+    Headless replay of `count` commands into a fresh store at each thread count,
+    then a cold start from the store's snapshot and log.
+    """
+    text = make_commands(count, carts)
+    print(f"\nHeadless replay ({count:,} commands over {carts:,} carts)")
+    baseline = None
+    for workers in worker_counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = shop.CartStore(tmp, snapshot_every=50_000)
+            start = time.perf_counter()
+            replies = list(shop.run_commands(store, shop._read_commands(io.StringIO(text)), workers))
+            store.close()
+            elapsed = time.perf_counter() - start
+            state = {cart_id: shopping.to_dict() for cart_id, shopping in store.carts.items()}
+            assert baseline is None or state == baseline, "Thread count changed the carts."
+            baseline = state
+            print(f"{workers:>3} workers  {elapsed:8.3f}s  {count / elapsed:10,.0f} commands/s"
+                  f"  ({sum(not reply['ok'] for reply in replies):,} rejected)")
+
+            start = time.perf_counter()
+            recovered = shop.CartStore(tmp)
+            elapsed = time.perf_counter() - start
+            assert {cart_id: shopping.to_dict() for cart_id, shopping in recovered.carts.items()} == state, \
+                "Recovered carts differ."
+            recovered.close()
+    print(f"recovery     {elapsed:8.3f}s")
+
+
+def check_malformed_commands(workers=4):
+    """
+    Runs a plain list of commands, including malformed ones, with several
+    workers and checks that bad commands are rejected rather than ending the
+    stream, and that the replies match a single-threaded run.
+    """
+    commands = [
+        {"cmd": "add", "name": "milk", "quantity": 2, "price": "1.25"},
+        {"cmd": "add", "name": 5, "quantity": 1, "price": "1.00"},
+        {"cmd": "edit", "item_id": 1, "name": 5},
+        {"cmd": "add", "cart": ["a"], "name": "eggs", "quantity": 1, "price": "3.00"},
+        {"cmd": "view", "cart": {"a": 1}},
+        {"cmd": "add", "cart": 7, "name": "eggs", "quantity": 1, "price": "3.00"},
+        {"cmd": "checkout"},
+    ] * 3
+    replies = []
+    for pool_size in (1, workers):
+        replies.append(list(shop.run_commands(shop.CartStore(), commands, pool_size, chunk_size=5)))
+    assert replies[0] == replies[1], "Worker replies differ from a single-threaded run."
+    assert [reply["ok"] for reply in replies[1][:7]] == [True, False, False, False, False, True, True]
+    print(f"\nMalformed commands: {len(commands)} run with {workers} workers, "
+          f"{sum(not reply['ok'] for reply in replies[1])} rejected")
+
+
+def edit_cart(shopping, count, seed=343):
+    """
+    Applies `count` reproducible changes to one list: mostly adds, with edits,
+    deletes and an occasional clear.
+    """
+    rng = random.Random(seed)
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.7 or not shopping:
+            shopping.add(f"item-{rng.randrange(20_000)}", rng.randint(1, 5), f"{rng.randrange(1, 5000) / 100:.2f}",
+                         rng.choice(CATEGORIES))
+        elif roll < 0.85:
+            shopping.edit(next(iter(shopping.items)) if roll < 0.8 else next(reversed(shopping.items)),
+                          quantity=rng.randint(1, 9))
+        elif roll < 0.9999:
+            shopping.delete(next(reversed(shopping.items)))
+        else:
+            shopping.clear()
+
+
+def benchmark_journal(count=100_000):
+    """
+    The same `count` changes with and without a CartJournal, then undo and
+    redo of every step, a full replay onto a new copy, and a diff sync.
+    """
+    print(f"\nUndo/redo journal ({count:,} changes to one cart)")
+    results = {}
+    for label, journaled in (("no journal", False), ("journal", True)):
+        # No snapshots, so every step stays in the change log for the replay below
+        shopping = shop.ShoppingList()
+        journal = shop.CartJournal(shopping, snapshot_every=10 * count) if journaled else None
+        start = time.perf_counter()
+        edit_cart(shopping, count)
+        elapsed = time.perf_counter() - start
+        # Memory is measured on a second run; tracing slows everything down
+        tracemalloc.start()
+        traced = shop.ShoppingList()
+        if journaled:
+            shop.CartJournal(traced, snapshot_every=10 * count)
+        edit_cart(traced, count)
+        results[label] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del traced
+        print(f"{label:<12} {elapsed:8.3f}s  {count / elapsed:10,.0f} changes/s  {results[label] / 2 ** 20:7.1f} MB"
+              f"  ({len(shopping):,} items left)")
+    extra = results["journal"] - results["no journal"]
+    print(f"journal cost {extra / 2 ** 20:7.1f} MB, {extra / len(journal.history):.0f} bytes per step")
+
+    final = shopping.to_dict()
+    steps = len(journal.history)
+    start = time.perf_counter()
+    while journal.undo():
+        pass
+    undo_time = time.perf_counter() - start
+    assert not shopping and shopping.subtotal_cents == 0, "Undoing every step did not empty the list."
+    start = time.perf_counter()
+    while journal.redo():
+        pass
+    redo_time = time.perf_counter() - start
+    assert shopping.to_dict() == final, "Redoing every step did not restore the list."
+    print(f"undo {steps:,} steps {undo_time:6.3f}s ({undo_time / steps * 1e6:.1f} us/step),"
+          f" redo {redo_time:6.3f}s ({redo_time / steps * 1e6:.1f} us/step)")
+
+    # A copy in another process would get this as JSON
+    start = time.perf_counter()
+    payload = json.dumps(journal.changes_since(0))
+    copy = shop.ShoppingList()
+    shop.CartJournal(copy).apply_changes(json.loads(payload))
+    elapsed = time.perf_counter() - start
+    assert copy.to_dict() == final, "Replayed copy differs."
+    print(f"replay {journal.version:,} steps (with undos/redos) onto a new copy {elapsed:6.3f}s"
+          f"  {journal.version / elapsed:10,.0f} steps/s  ({len(payload) / 2 ** 20:.1f} MB of JSON)")
+
+    version = journal.version
+    edit_cart(shopping, 100, seed=1)
+    diff = json.dumps(journal.changes_since(version))
+    whole = json.dumps(shopping.to_dict())
+    print(f"sync after 100 more changes: {len(diff):,} bytes of diff vs {len(whole):,} bytes for the whole list")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    benchmark_checkout(n, k)
+    benchmark_drift()
+    check_malformed_commands()
+    benchmark_replay()
+    benchmark_journal()
@@ -1,8 +1,10 @@
 import logging
 from dataclasses import dataclass
 
+from shared_logging import setup_logging
+
 # Setup basic configuration for logging
-logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+setup_logging(level=logging.INFO, format='%(levelname)s: %(message)s')
 
 def log_action(message):
     logging.info(message)
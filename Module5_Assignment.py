@@ -1,39 +1,352 @@
+import atexit
+import contextlib
+import csv
+import gc
+import heapq
+import itertools
+import json
 import logging
+import math
+import os
+import sys
+import time
+import weakref
+from collections import defaultdict
 from datetime import datetime
 
+from shared_logging import setup_logging
+
 # Configure logging to file 'phts.log' with timestamp, level, and message
-logging.basicConfig(
+setup_logging(
     filename='phts.log',
     level=logging.INFO,
     format='%(asctime)s %(levelname)s %(message)s'
 )
 
+# Sort order for query results: High first, then Medium, then Low
+PRIORITY_ORDER = ('High', 'Medium', 'Low')
+# Status of a report that has no work order yet
+UNASSIGNED = 'Unassigned'
+
+# Reports within this many meters of an open report are merged into it
+DUPLICATE_RADIUS_M = 15.0
+EARTH_RADIUS_M = 6371000.0
+METERS_PER_DEGREE = EARTH_RADIUS_M * math.pi / 180
+
+# Field order for bulk records given as sequences instead of dicts
+REPORT_FIELDS = ('address', 'size', 'location', 'district')
+CLAIM_FIELDS = ('report_id', 'name', 'address', 'phone', 'damage_type', 'amount')
+
+# Nesting depth of silenced() blocks; log_and_print is a no-op while above zero
+_silenced = 0
+# Set to False (or call set_console_echo(False)) to log without printing
+ECHO_TO_CONSOLE = os.environ.get('PHTRS_ECHO', '1') != '0'
+
 def log_and_print(message):
     """
-    Log a message at INFO level and print it to the console.
+    Log a message at INFO level and, if console echo is on, print it to the console.
     """
+    if _silenced:
+        return
     logging.info(message)
-    print(message)
+    if ECHO_TO_CONSOLE:
+        print(message)
+
+def set_console_echo(enabled):
+    """
+    Turns the console echo of log_and_print on or off; logging is unaffected.
+    """
+    global ECHO_TO_CONSOLE
+    ECHO_TO_CONSOLE = bool(enabled)
+
+@contextlib.contextmanager
+def silenced():
+    """
+    Suppresses log_and_print inside the block (used while replaying stored state).
+    """
+    global _silenced
+    _silenced += 1
+    try:
+        yield
+    finally:
+        _silenced -= 1
+
+def _intern(value):
+    """
+    Interns repeated short strings (districts, locations) so reports share one copy.
+    """
+    return sys.intern(value) if type(value) is str else value
+
+def read_records(source):
+    """
+    Yields bulk-input records.
+    source is a CSV (with header) or JSONL file path, yielding dicts, or an
+    iterable of dicts or sequences (in REPORT_FIELDS / CLAIM_FIELDS order),
+    yielded as they are. Unreadable JSONL lines are yielded as their raw text
+    so validation can reject them.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        path = os.fspath(source)
+        with open(path, newline='', encoding='utf-8') as file:
+            if path.endswith(('.jsonl', '.ndjson')):
+                for line in file:
+                    if line.strip():
+                        try:
+                            yield json.loads(line)
+                        except ValueError:
+                            yield line.strip()
+            else:
+                yield from csv.DictReader(file)
+        return
+    yield from source
+
+@contextlib.contextmanager
+def _gc_paused():
+    """
+    Pauses the cyclic garbage collector while a bulk run allocates many
+    acyclic objects (records, reports), so collections do not keep rescanning
+    the growing indexes; restores it afterwards.
+    """
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+def _batches(iterable, size):
+    """
+    Splits an iterable into lists of (position, item), at most size items each.
+    """
+    iterator = enumerate(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def _text_field(record, name):
+    value = record[name]
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError(f"'{name}' must be a non-empty string")
+    return value.strip()
+
+def parse_timestamp(value):
+    """
+    Returns a report timestamp (a datetime or an ISO 8601 string; None or ''
+    for none) as a naive local datetime, so it sorts with datetime.now()
+    defaults. Raises ValueError for anything else.
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    elif not isinstance(value, datetime):
+        raise ValueError(f"'timestamp' must be a datetime or ISO 8601 string, not {value!r}")
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value
+
+def parse_coordinates(latitude, longitude):
+    """
+    Returns (latitude, longitude) as floats, or (None, None) when both are
+    missing (None or ''). Raises ValueError if only one is given or either is
+    out of range.
+    """
+    if latitude in (None, '') and longitude in (None, ''):
+        return None, None
+    if latitude in (None, '') or longitude in (None, ''):
+        raise ValueError("'latitude' and 'longitude' must be given together")
+    latitude, longitude = float(latitude), float(longitude)
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError("'latitude'/'longitude' out of range")
+    return latitude, longitude
+
+def validate_report_record(record):
+    """
+    Checks one bulk report record. Returns (address, size, location, district,
+    timestamp, latitude, longitude) or raises ValueError/KeyError/TypeError.
+    """
+    size = int(record['size'])
+    if not 1 <= size <= 10:
+        raise ValueError("'size' must be between 1 and 10")
+    timestamp = parse_timestamp(record.get('timestamp'))
+    latitude, longitude = parse_coordinates(record.get('latitude'), record.get('longitude'))
+    return (_text_field(record, 'address'), size, _intern(_text_field(record, 'location')),
+            _intern(_text_field(record, 'district')), timestamp, latitude, longitude)
+
+def validate_claim_record(record, reports):
+    """
+    Checks one bulk claim record against the known reports. Returns
+    (report, name, address, phone, damage_type, amount) or raises.
+    """
+    report_id = int(record['report_id'])
+    report = reports.get(report_id)
+    if report is None:
+        raise ValueError(f"Report {report_id} not found")
+    amount = float(record['amount'])
+    if not amount >= 0:
+        raise ValueError("'amount' must be zero or more")
+    return (report, _text_field(record, 'name'), _text_field(record, 'address'),
+            str(record['phone']).strip(), _text_field(record, 'damage_type'), amount)
+
+def _clean_text_values(values):
+    """
+    Strips a column of strings, checking each distinct value once.
+    Returns None if any value is not a non-empty string.
+    """
+    cleaned = {}
+    for value in set(values):
+        if not isinstance(value, str) or not value.strip():
+            return None
+        cleaned[value] = sys.intern(value.strip())
+    return [cleaned[value] for value in values]
+
+def _columns(records, fields, optional=()):
+    """
+    Splits a batch of records (all dicts, or all sequences in `fields` order)
+    into one list per field, then one per optional field (all None for
+    sequences). Raises KeyError/TypeError if a record lacks a field.
+    """
+    types = set(map(type, records))
+    if types == {dict}:
+        required = [[record[name] for record in records] for name in fields]
+        return required + [[record.get(name) for record in records] for name in optional]
+    if not types <= {list, tuple}:
+        raise TypeError("mixed record types")
+    if min(map(len, records)) < len(fields):
+        raise KeyError(fields[-1])
+    missing = [None] * len(records)
+    return list(zip(*records))[:len(fields)] + [missing] * len(optional)
+
+def validate_report_columns(records):
+    """
+    Column-at-a-time validation of a whole batch of report records, giving
+    the same tuples as validate_report_record. Returns None if any record is
+    bad (the caller then falls back to validate_report_record to find which).
+    """
+    try:
+        addresses, sizes, locations, districts, timestamps, latitudes, longitudes = _columns(
+            records, REPORT_FIELDS, ('timestamp', 'latitude', 'longitude'))
+        sizes = [size if type(size) is int else int(size) for size in sizes]
+        addresses = [address.strip() for address in addresses]
+        locations = _clean_text_values(locations)
+        districts = _clean_text_values(districts)
+        if not set(timestamps) <= {None, ''}:
+            timestamps = [parse_timestamp(t) for t in timestamps]
+        # CSV exports carry empty coordinate columns; only rows with values are checked
+        if not {*latitudes, *longitudes} <= {None, ''}:
+            latitudes, longitudes = zip(*map(parse_coordinates, latitudes, longitudes))
+        else:
+            latitudes = longitudes = [None] * len(records)
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+    if not all(addresses) or None in (locations, districts) or min(sizes) < 1 or max(sizes) > 10:
+        return None
+    return list(zip(addresses, sizes, locations, districts, timestamps, latitudes, longitudes))
+
+def validate_claim_columns(records, reports):
+    """
+    Column-at-a-time counterpart of validate_claim_record for a whole batch.
+    Returns None if any record is bad.
+    """
+    try:
+        report_ids, names, addresses, phones, damage_types, amounts = _columns(records, CLAIM_FIELDS)
+        claim_reports = [reports[rid if type(rid) is int else int(rid)] for rid in report_ids]
+        amounts = [amount if type(amount) is float else float(amount) for amount in amounts]
+        names = [name.strip() for name in names]
+        addresses = [address.strip() for address in addresses]
+        phones = [str(phone).strip() for phone in phones]
+        damage_types = _clean_text_values(damage_types)
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+    if not all(names) or not all(addresses) or damage_types is None or not all(a >= 0 for a in amounts):
+        return None
+    return list(zip(claim_reports, names, addresses, phones, damage_types, amounts))
+
+def _validate_batch(batch, fields, validate, validate_columns):
+    """
+    Splits a batch into (valid values, rejects). Each reject is (position, record, error).
+    A clean batch passes validate_columns in one go; otherwise each record is
+    checked with validate to report exactly which ones fail. Sequence records
+    are read in `fields` order.
+    """
+    valid = validate_columns([record for _, record in batch])
+    if valid is not None:
+        return valid, []
+
+    valid, rejected = [], []
+    for position, record in batch:
+        try:
+            if isinstance(record, (list, tuple)):
+                record = dict(zip(fields, record))
+            elif not isinstance(record, dict):
+                raise ValueError("Unreadable record")
+            valid.append(validate(record))
+        except (KeyError, TypeError, ValueError) as e:
+            error = f"Missing field {e}" if isinstance(e, KeyError) else str(e)
+            rejected.append((position, record, error))
+    return valid, rejected
 
 class PotholeReport:
     """
     Represents a citizen's pothole report.
+    Uses __slots__ (no per-instance __dict__) because systems keep millions of them.
     """
-    def __init__(self, report_id, address, size, location, district):
+    __slots__ = ('report_id', 'address', 'size', 'location', 'district', 'priority', 'timestamp',
+                 'latitude', 'longitude', 'duplicates')
+
+    def __init__(self, report_id, address, size, location, district, timestamp=None,
+                 latitude=None, longitude=None):
         self.report_id = report_id
         self.address = address
         self.size = size        # 1-10 severity scale
-        self.location = location  # e.g., 'curb', 'middle'
-        self.district = district
+        self.location = _intern(location)  # e.g., 'curb', 'middle'
+        self.district = _intern(district)
         self.priority = self._determine_priority()
-        self.timestamp = datetime.now()
-        log_and_print(f"PotholeReport created: {self}")
+        self.timestamp = timestamp or datetime.now()
+        self.latitude = latitude  # optional coordinates
+        self.longitude = longitude
+        self.duplicates = 0  # later reports merged into this one
+        if not _silenced:  # skip building the message when it would be dropped
+            log_and_print(f"PotholeReport created: {self}")
+
+    @classmethod
+    def build_many(cls, first_id, rows, now):
+        """
+        Builds reports with consecutive ids from validated (address, size,
+        location, district, timestamp, ...) rows whose strings are already
+        interned, without the per-report work of __init__ or any logging.
+        Undated rows get `now`.
+        """
+        new = cls.__new__
+        priorities = [cls._priority_for(size) for size in range(11)]
+        reports = []
+        append = reports.append
+        for rid, (address, size, location, district, timestamp, *_) in enumerate(rows, first_id):
+            report = new(cls)
+            report.report_id = rid
+            report.address = address
+            report.size = size
+            report.location = location
+            report.district = district
+            report.priority = priorities[size]
+            report.timestamp = timestamp or now
+            report.latitude = report.longitude = None
+            report.duplicates = 0
+            append(report)
+        return reports
 
     def _determine_priority(self):
+        return self._priority_for(self.size)
+
+    @staticmethod
+    def _priority_for(size):
         # Simple mapping: higher size means higher priority
-        if self.size >= 8:
+        if size >= 8:
             return 'High'
-        elif self.size >= 4:
+        elif size >= 4:
             return 'Medium'
         else:
             return 'Low'
@@ -47,6 +360,8 @@ class WorkOrder:
     """
     Represents a repair work order associated with a PotholeReport.
     """
+    __slots__ = ('report', 'crew_id', 'crew_size', 'equipment', 'hours', 'material_used', 'status', 'cost')
+
     def __init__(self, report, crew_id, crew_size, equipment):
         self.report = report
         self.crew_id = crew_id
@@ -56,17 +371,18 @@ class WorkOrder:
         self.material_used = 0.0  # in kg
         self.status = 'Not Started'
         self.cost = 0.0
-        log_and_print(f"WorkOrder created for report {report.report_id}")
+        if not _silenced:
+            log_and_print(f"WorkOrder created for report {report.report_id}")
 
     def log_repair(self, hours, material, rate_per_hour=50, cost_per_kg=2):
         """
-        Update work order with repair details and recompute cost.
+        Update work order with repair details and add their cost to the running total.
         """
         self.hours += hours
         self.material_used += material
         labor_cost = hours * self.crew_size * rate_per_hour
         material_cost = material * cost_per_kg
-        self.cost = labor_cost + material_cost
+        self.cost += labor_cost + material_cost
         self.status = 'In Progress'
         log_and_print(
             f"WorkOrder {self.report.report_id}: logged {hours}h, {material}kg, cost={self.cost:.2f}"
@@ -83,35 +399,313 @@ class DamageClaim:
     """
     Represents a citizen's damage claim related to a specific pothole.
     """
-    def __init__(self, report, claimant_name, claimant_address, phone, damage_type, amount):
+    __slots__ = ('report', 'name', 'address', 'phone', 'damage_type', 'amount', 'claim_id')
+
+    def __init__(self, report, claimant_name, claimant_address, phone, damage_type, amount, claim_id=None):
         self.report = report
         self.name = claimant_name
         self.address = claimant_address
         self.phone = phone
         self.damage_type = damage_type
         self.amount = amount
-        self.claim_id = f"C{report.report_id}-{int(datetime.now().timestamp())}"
-        log_and_print(f"DamageClaim created: {self}")
+        self.claim_id = claim_id or f"C{report.report_id}-{int(datetime.now().timestamp())}"
+        if not _silenced:
+            log_and_print(f"DamageClaim created: {self}")
 
     def __repr__(self):
         return (f"DamageClaim(id={self.claim_id}, report={self.report.report_id}, "
                 f"name='{self.name}', amount=${self.amount:.2f})")
 
+def distance_m(lat1, lon1, lat2, lon2):
+    """
+    Great-circle (haversine) distance in meters.
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+class SpatialGrid:
+    """
+    Uniform latitude/longitude grid of reports for radius and nearest-neighbour queries.
+    Cells are cell_size_m of latitude square (in degrees), so a query only
+    looks at the cells around the point instead of every report.
+    """
+    def __init__(self, cell_size_m=100.0):
+        self.cell_deg = cell_size_m / METERS_PER_DEGREE
+        self.cells = defaultdict(list)
+        self.count = 0
+
+    def _cell(self, latitude, longitude):
+        return math.floor(latitude / self.cell_deg), math.floor(longitude / self.cell_deg)
+
+    def add(self, report):
+        self.cells[self._cell(report.latitude, report.longitude)].append(report)
+        self.count += 1
+
+    def _candidates(self, cells):
+        for cell in cells:
+            yield from self.cells.get(cell, ())
+
+    def within(self, latitude, longitude, radius_m, predicate=None):
+        """
+        Returns [(distance_m, report)] for reports within radius_m, nearest first.
+        """
+        dlat = radius_m / METERS_PER_DEGREE
+        dlon = dlat / max(math.cos(math.radians(latitude)), 1e-6)
+        i0, j0 = self._cell(latitude - dlat, longitude - dlon)
+        i1, j1 = self._cell(latitude + dlat, longitude + dlon)
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > len(self.cells):
+            # Box covers more cells than are occupied: walk the occupied ones instead
+            cells = [cell for cell in self.cells if i0 <= cell[0] <= i1 and j0 <= cell[1] <= j1]
+        else:
+            cells = [(i, j) for i in range(i0, i1 + 1) for j in range(j0, j1 + 1)]
+        found = []
+        for report in self._candidates(cells):
+            if predicate is None or predicate(report):
+                d = distance_m(latitude, longitude, report.latitude, report.longitude)
+                if d <= radius_m:
+                    found.append((d, report.report_id, report))
+        found.sort()
+        return [(d, report) for d, _, report in found]
+
+    def nearest(self, latitude, longitude, k=1, max_distance_m=None, predicate=None):
+        """
+        Returns up to k [(distance_m, report)] nearest the point, nearest first.
+        Searches rings of cells outward and stops once no unvisited cell can
+        hold anything closer than the current k-th best.
+        """
+        ci, cj = self._cell(latitude, longitude)
+        # Narrowest cell side in meters (longitude cells shrink away from the equator)
+        cell_m = self.cell_deg * METERS_PER_DEGREE * min(1.0, max(math.cos(math.radians(latitude)), 1e-6))
+        best = []  # max-heap of the k nearest as (-distance, -report_id, report)
+
+        def consider(reports):
+            for report in reports:
+                if predicate is not None and not predicate(report):
+                    continue
+                d = distance_m(latitude, longitude, report.latitude, report.longitude)
+                if max_distance_m is not None and d > max_distance_m:
+                    continue
+                entry = (-d, -report.report_id, report)
+                if len(best) < k:
+                    heapq.heappush(best, entry)
+                elif entry > best[0]:
+                    heapq.heapreplace(best, entry)
+
+        ring = 0
+        while self.cells:
+            # Anything in this ring or beyond is at least (ring - 1) cells away
+            bound = (ring - 1) * cell_m
+            if len(best) == k and bound > -best[0][0]:
+                break
+            if max_distance_m is not None and bound > max_distance_m:
+                break
+            if 8 * ring > len(self.cells):
+                # Rings are now larger than the occupied grid: finish with one pass
+                consider(self._candidates(cell for cell in self.cells
+                                          if max(abs(cell[0] - ci), abs(cell[1] - cj)) >= ring))
+                break
+            if ring == 0:
+                cells = [(ci, cj)]
+            else:
+                cells = [(ci + di, cj + dj) for di in range(-ring, ring + 1) for dj in (-ring, ring)]
+                cells += [(ci + di, cj + dj) for di in (-ring, ring) for dj in range(-ring + 1, ring)]
+            consider(self._candidates(cells))
+            ring += 1
+        return [(-d, report) for d, _, report in sorted(best, reverse=True)]
+
+class CostRollup:
+    """
+    Running totals for one group of work orders (a district, crew, priority or month).
+    """
+    __slots__ = ('cost', 'hours', 'material', 'work_orders', 'open')
+
+    def __init__(self):
+        self.cost = 0.0
+        self.hours = 0.0
+        self.material = 0.0
+        self.work_orders = 0
+        self.open = 0  # work orders not yet repaired
+
+    def add(self, order, sign=1):
+        self.cost += sign * order.cost
+        self.hours += sign * order.hours
+        self.material += sign * order.material_used
+        self.work_orders += sign
+        if order.status != 'Repaired':
+            self.open += sign
+
+    def as_dict(self):
+        return {'cost': round(self.cost, 2), 'hours': self.hours, 'material': self.material,
+                'work_orders': self.work_orders, 'open': self.open}
+
 class PHTRS:
     """
     Core system to track reports, work orders, and claims.
+    Secondary indexes (value -> set of report ids) are kept for district,
+    priority, location and status, so query_reports never scans every report.
+    Status is UNASSIGNED until a work order exists, then the work order's status.
+    Go through the PHTRS methods to change work orders so the indexes stay current.
+    The same methods keep CostRollup totals per district, crew, priority and
+    month reported (ROLLUP_DIMENSIONS), so cost_rollup() never walks the work orders.
     """
+    INDEXED_FIELDS = ('district', 'priority', 'location', 'status')
+    ROLLUP_DIMENSIONS = ('district', 'crew', 'priority', 'month')
+
     def __init__(self):
         self.reports = {}
         self.work_orders = {}
         self.claims = {}
         self.next_report_id = 1
+        self.indexes = {field: defaultdict(set) for field in self.INDEXED_FIELDS}
+        self.rollups = {dimension: defaultdict(CostRollup) for dimension in self.ROLLUP_DIMENSIONS}
+        self.totals = CostRollup()
+        self.spatial = SpatialGrid()
+        self.duplicate_radius = DUPLICATE_RADIUS_M  # None turns off duplicate merging
+        self.scheduler = None  # set by RepairScheduler
+        self.event_store = None  # set by EventStore.recover
         log_and_print("PHTRS system initialized.")
 
-    def report_pothole(self, address, size, location, district):
-        report = PotholeReport(self.next_report_id, address, size, location, district)
+    def _index_report(self, report):
+        rid = report.report_id
+        self.indexes['district'][report.district].add(rid)
+        self.indexes['priority'][report.priority].add(rid)
+        self.indexes['location'][report.location].add(rid)
+        self.indexes['status'][UNASSIGNED].add(rid)
+
+    def _set_status(self, report_id, old_status, new_status):
+        if old_status != new_status:
+            index = self.indexes['status']
+            index[old_status].discard(report_id)
+            index[new_status].add(report_id)
+
+    def _rollup(self, order, sign):
+        """
+        Adds (sign=1) or removes (sign=-1) one work order's figures in every rollup.
+        Callers remove the order before changing it and add it back afterwards.
+        """
+        report = order.report
+        rollups = self.rollups
+        rollups['district'][report.district].add(order, sign)
+        rollups['crew'][order.crew_id].add(order, sign)
+        rollups['priority'][report.priority].add(order, sign)
+        rollups['month'][report.timestamp.strftime('%Y-%m')].add(order, sign)
+        self.totals.add(order, sign)
+
+    def cost_rollup(self, by='district'):
+        """
+        Current totals per group for one of ROLLUP_DIMENSIONS, as
+        {group: {'cost', 'hours', 'material', 'work_orders', 'open'}}.
+        """
+        if by not in self.rollups:
+            raise ValueError(f"Unknown rollup dimension: {by}")
+        groups = sorted(self.rollups[by].items(), key=lambda item: str(item[0]))
+        return {key: rollup.as_dict() for key, rollup in groups if rollup.work_orders}
+
+    def report_status(self, report_id):
+        order = self.work_orders.get(report_id)
+        return order.status if order else UNASSIGNED
+
+    @classmethod
+    def open(cls, directory, **options):
+        """
+        Recovers a PHTRS from the EventStore in directory (creating it if needed).
+        Every later change is written to that store.
+        """
+        return EventStore(directory, **options).recover()
+
+    def report_pothole(self, address, size, location, district, timestamp=None,
+                       latitude=None, longitude=None, merge_duplicates=True):
+        """
+        Files a new report. When coordinates are given and an open report lies
+        within duplicate_radius meters, the new report is merged into that one
+        (see merge_duplicate) and the existing report is returned instead.
+        Raises ValueError for a timestamp parse_timestamp does not accept, or
+        coordinates parse_coordinates does not.
+        """
+        timestamp = parse_timestamp(timestamp)
+        latitude, longitude = parse_coordinates(latitude, longitude)
+        if latitude is not None and merge_duplicates and self.duplicate_radius:
+            existing = self.find_duplicate(latitude, longitude)
+            if existing:
+                return self.merge_duplicate(existing.report_id, size)
+        report = PotholeReport(self.next_report_id, address, size, location, district, timestamp,
+                               latitude, longitude)
         self.reports[self.next_report_id] = report
+        self._index_report(report)
+        if latitude is not None:
+            self.spatial.add(report)
         self.next_report_id += 1
+        if self.event_store:
+            self.event_store.append('report', {
+                'id': report.report_id, 'address': address, 'size': size, 'location': location,
+                'district': district, 'timestamp': report.timestamp.isoformat(),
+                'latitude': latitude, 'longitude': longitude})
+        if self.scheduler:
+            self.scheduler.add_report(report)
+        return report
+
+    def find_duplicate(self, latitude, longitude):
+        """
+        The nearest open (not repaired) report within duplicate_radius meters, or None.
+        """
+        match = self.spatial.nearest(latitude, longitude, 1, self.duplicate_radius,
+                                     lambda report: self.report_status(report.report_id) != 'Repaired')
+        return match[0][1] if match else None
+
+    def merge_duplicate(self, report_id, size):
+        """
+        Counts a duplicate report against an existing one, keeping the larger size.
+        """
+        report = self.reports[report_id]
+        report.duplicates += 1
+        log_and_print(f"Duplicate report merged into {report_id} ({report.duplicates} duplicates)")
+        if self.event_store:
+            self.event_store.append('duplicate', {'id': report_id})
+        if size > report.size:
+            self.update_report_size(report_id, size)
+        return report
+
+    def reports_within(self, latitude, longitude, radius_m, open_only=False):
+        """
+        Reports with coordinates within radius_m meters, as [(distance_m, report)] nearest first.
+        """
+        predicate = (lambda report: self.report_status(report.report_id) != 'Repaired') if open_only else None
+        return self.spatial.within(latitude, longitude, radius_m, predicate)
+
+    def nearest_reports(self, latitude, longitude, k=1, max_distance_m=None, open_only=False):
+        """
+        The k reports nearest the point, as [(distance_m, report)] nearest first.
+        """
+        predicate = (lambda report: self.report_status(report.report_id) != 'Repaired') if open_only else None
+        return self.spatial.nearest(latitude, longitude, k, max_distance_m, predicate)
+
+    def update_report_size(self, report_id, size):
+        """
+        Re-rates a report's size, updating its priority, the indexes and the dispatch queue.
+        """
+        report = self.reports.get(report_id)
+        if not report:
+            log_and_print(f"Error: Report {report_id} not found.")
+            return None
+        old_priority = report.priority
+        order = self.work_orders.get(report_id)
+        if order:
+            self._rollup(order, -1)
+        report.size = size
+        report.priority = report._determine_priority()
+        if report.priority != old_priority:
+            index = self.indexes['priority']
+            index[old_priority].discard(report_id)
+            index[report.priority].add(report_id)
+        if order:
+            self._rollup(order, 1)
+        log_and_print(f"Report {report_id} resized to {size} (priority {report.priority})")
+        if self.event_store:
+            self.event_store.append('resize', {'id': report_id, 'size': size})
+        if self.scheduler:
+            self.scheduler.reprioritize(report)
         return report
 
     def assign_work_order(self, report_id, crew_id, crew_size, equipment):
@@ -119,33 +713,545 @@ class PHTRS:
         if not report:
             log_and_print(f"Error: Report {report_id} not found.")
             return None
+        old_status = self.report_status(report_id)
+        if report_id in self.work_orders:
+            self._rollup(self.work_orders[report_id], -1)
         order = WorkOrder(report, crew_id, crew_size, equipment)
         self.work_orders[report_id] = order
+        self._rollup(order, 1)
+        self._set_status(report_id, old_status, order.status)
+        if self.scheduler:
+            self.scheduler.discard(report_id)
+        if self.event_store:
+            self.event_store.append('assign', {
+                'id': report_id, 'crew_id': crew_id, 'crew_size': crew_size, 'equipment': equipment})
         return order
 
     def log_repair_details(self, report_id, hours, material):
         order = self.work_orders.get(report_id)
         if order:
+            old_status = order.status
+            self._rollup(order, -1)
             order.log_repair(hours, material)
+            self._rollup(order, 1)
+            self._set_status(report_id, old_status, order.status)
+            if self.event_store:
+                self.event_store.append('repair', {'id': report_id, 'hours': hours, 'material': material})
         else:
             log_and_print(f"Error: WorkOrder for report {report_id} not found.")
 
     def complete_repair(self, report_id):
         order = self.work_orders.get(report_id)
         if order:
+            old_status = order.status
+            self._rollup(order, -1)
             order.complete_repair()
+            self._rollup(order, 1)
+            self._set_status(report_id, old_status, order.status)
+            if self.scheduler:
+                self.scheduler.release(report_id)
+            if self.event_store:
+                self.event_store.append('complete', {'id': report_id})
         else:
             log_and_print(f"Error: WorkOrder for report {report_id} not found.")
 
-    def submit_damage_claim(self, report_id, name, address, phone, damage_type, amount):
+    def submit_damage_claim(self, report_id, name, address, phone, damage_type, amount, claim_id=None):
         report = self.reports.get(report_id)
         if not report:
             log_and_print(f"Error: Report {report_id} not found.")
             return None
-        claim = DamageClaim(report, name, address, phone, damage_type, amount)
+        claim = DamageClaim(report, name, address, phone, damage_type, amount, claim_id)
         self.claims[claim.claim_id] = claim
+        if self.event_store:
+            self.event_store.append('claim', {
+                'id': report_id, 'name': name, 'address': address, 'phone': phone,
+                'damage_type': damage_type, 'amount': amount, 'claim_id': claim.claim_id})
         return claim
 
+    def report_potholes_bulk(self, source, batch_size=10000):
+        """
+        Ingests many reports from a CSV/JSONL path or an iterable of records
+        (see read_records). Each batch is validated in one pass, gets a block
+        of consecutive ids, updates each index once, and writes one summary
+        log line. Records with latitude/longitude are filed after the block,
+        one at a time, so they can be merged as duplicates. Returns (created
+        reports, rejects); each reject is (position, record, error) and does
+        not stop the run.
+        """
+        created, rejected = [], []
+        with _gc_paused():
+            for batch_no, batch in enumerate(_batches(read_records(source), batch_size), 1):
+                valid, batch_rejects = _validate_batch(batch, REPORT_FIELDS, validate_report_record,
+                                                       validate_report_columns)
+                rejected.extend(batch_rejects)
+                located = [values for values in valid if values[5] is not None]
+                if located:
+                    valid = [values for values in valid if values[5] is None]
+                first_id = self.next_report_id
+                self.next_report_id += len(valid)
+                now = datetime.now()  # one filing time for the batch's undated reports
+                reports = PotholeReport.build_many(first_id, valid, now)
+                self._index_reports_bulk(reports)
+                if self.scheduler:
+                    for report in reports:
+                        self.scheduler.add_report(report)
+                if self.event_store:
+                    for report in reports:
+                        self.event_store.append('report', {
+                            'id': report.report_id, 'address': report.address, 'size': report.size,
+                            'location': report.location, 'district': report.district,
+                            'timestamp': report.timestamp.isoformat()})
+                created.extend(reports)
+                ids = f"ids {first_id}-{self.next_report_id - 1}" if reports else "no ids"
+
+                # Reports with coordinates go one by one so duplicates are merged
+                merged = 0
+                with silenced():
+                    for values in located:
+                        known = len(self.reports)
+                        report = self.report_pothole(*values)
+                        if len(self.reports) == known:
+                            merged += 1
+                        else:
+                            created.append(report)
+                log_and_print(f"Bulk report batch {batch_no}: {len(reports) + len(located) - merged} created "
+                              f"({ids}), {merged} merged as duplicates, {len(batch_rejects)} rejected.")
+        return created, rejected
+
+    def _index_reports_bulk(self, reports):
+        """
+        Adds a batch of new reports to the indexes with one set update per value.
+        """
+        districts, priorities, locations = defaultdict(list), defaultdict(list), defaultdict(list)
+        for report in reports:
+            rid = report.report_id
+            districts[report.district].append(rid)
+            priorities[report.priority].append(rid)
+            locations[report.location].append(rid)
+        for field, groups in (('district', districts), ('priority', priorities), ('location', locations)):
+            index = self.indexes[field]
+            for value, ids in groups.items():
+                index[value].update(ids)
+        ids = range(reports[0].report_id, reports[-1].report_id + 1) if reports else ()
+        self.reports.update(zip(ids, reports))
+        self.indexes['status'][UNASSIGNED].update(ids)
+
+    def submit_damage_claims_bulk(self, source, batch_size=10000):
+        """
+        Ingests many damage claims the same way as report_potholes_bulk.
+        Claims that would get the same claim id within a run get a numeric suffix.
+        Returns (created claims, rejects).
+        """
+        created, rejected = [], []
+        next_suffix = {}  # claim id -> next suffix to try, so collisions cost O(1) each
+        with _gc_paused():
+            for batch_no, batch in enumerate(_batches(read_records(source), batch_size), 1):
+                valid, batch_rejects = _validate_batch(
+                    batch, CLAIM_FIELDS, lambda record: validate_claim_record(record, self.reports),
+                    lambda records: validate_claim_columns(records, self.reports))
+                rejected.extend(batch_rejects)
+                claims = []
+                stamp = int(datetime.now().timestamp())
+                with silenced():
+                    for values in valid:
+                        claim_id = f"C{values[0].report_id}-{stamp}"
+                        if claim_id in self.claims:
+                            n = next_suffix.get(claim_id, 2)
+                            while f"{claim_id}-{n}" in self.claims:
+                                n += 1
+                            next_suffix[claim_id] = n + 1
+                            claim_id = f"{claim_id}-{n}"
+                        claim = DamageClaim(*values, claim_id)
+                        self.claims[claim_id] = claim
+                        claims.append(claim)
+                if self.event_store:
+                    for claim in claims:
+                        self.event_store.append('claim', {
+                            'id': claim.report.report_id, 'name': claim.name, 'address': claim.address,
+                            'phone': claim.phone, 'damage_type': claim.damage_type, 'amount': claim.amount,
+                            'claim_id': claim.claim_id})
+                created.extend(claims)
+                log_and_print(f"Bulk claim batch {batch_no}: {len(claims)} created, {len(batch_rejects)} rejected.")
+        return created, rejected
+
+    def apply_event(self, kind, data):
+        """
+        Re-applies one stored event (see EventStore) through the normal methods.
+        """
+        report_id = data['id']
+        if kind == 'report':
+            self.next_report_id = report_id
+            self.report_pothole(data['address'], data['size'], data['location'], data['district'],
+                                datetime.fromisoformat(data['timestamp']), data.get('latitude'),
+                                data.get('longitude'), merge_duplicates=False)
+        elif kind == 'duplicate':
+            self.reports[report_id].duplicates += 1
+        elif kind == 'resize':
+            self.update_report_size(report_id, data['size'])
+        elif kind == 'assign':
+            self.assign_work_order(report_id, data['crew_id'], data['crew_size'], data['equipment'])
+        elif kind == 'repair':
+            self.log_repair_details(report_id, data['hours'], data['material'])
+        elif kind == 'complete':
+            self.complete_repair(report_id)
+        elif kind == 'claim':
+            self.submit_damage_claim(report_id, data['name'], data['address'], data['phone'],
+                                     data['damage_type'], data['amount'], data['claim_id'])
+        else:
+            raise ValueError(f"Unknown event type: {kind}")
+
+    def to_snapshot(self):
+        """
+        The full system state as JSON-compatible data.
+        """
+        return {
+            'next_report_id': self.next_report_id,
+            'reports': [[r.report_id, r.address, r.size, r.location, r.district, r.timestamp.isoformat(),
+                         r.latitude, r.longitude, r.duplicates] for r in self.reports.values()],
+            'work_orders': [[rid, o.crew_id, o.crew_size, o.equipment, o.hours, o.material_used, o.status, o.cost]
+                            for rid, o in self.work_orders.items()],
+            'claims': [[c.report.report_id, c.name, c.address, c.phone, c.damage_type, c.amount, c.claim_id]
+                       for c in self.claims.values()],
+        }
+
+    def load_snapshot(self, state):
+        """
+        Restores state written by to_snapshot into this (empty) system.
+        """
+        for row in state['reports']:
+            rid, address, size, location, district, timestamp, latitude, longitude, duplicates = row
+            self.next_report_id = rid
+            report = self.report_pothole(address, size, location, district, datetime.fromisoformat(timestamp),
+                                         latitude, longitude, merge_duplicates=False)
+            report.duplicates = duplicates
+        for rid, crew_id, crew_size, equipment, hours, material, status, cost in state['work_orders']:
+            order = self.assign_work_order(rid, crew_id, crew_size, equipment)
+            self._rollup(order, -1)
+            order.hours, order.material_used, order.cost = hours, material, cost
+            self._set_status(rid, order.status, status)
+            order.status = status
+            self._rollup(order, 1)
+        for rid, name, address, phone, damage_type, amount, claim_id in state['claims']:
+            self.submit_damage_claim(rid, name, address, phone, damage_type, amount, claim_id)
+        self.next_report_id = state['next_report_id']
+
+    def _matching_ids(self, field, values):
+        """
+        Union of the index sets for one field. values may be a single value or a collection.
+        """
+        index = self.indexes[field]
+        if isinstance(values, str) or not hasattr(values, '__iter__'):
+            return index.get(values, set())
+        matches = set()
+        for value in values:
+            matches |= index.get(value, set())
+        return matches
+
+    def query_reports(self, district=None, priority=None, location=None, status=None,
+                      exclude_status=None, limit=None):
+        """
+        Returns reports matching every given filter, High priority first and
+        oldest (lowest id) first within a priority. Each filter takes a single
+        value or a collection of values; exclude_status drops reports in those
+        statuses. Example: query_reports(district='North', priority='High',
+        exclude_status='Repaired').
+        """
+        filters = {'district': district, 'priority': priority, 'location': location, 'status': status}
+        candidates = [self._matching_ids(field, values)
+                      for field, values in filters.items() if values is not None]
+        if candidates:
+            candidates.sort(key=len)
+            ids = candidates[0].intersection(*candidates[1:])
+        else:
+            ids = self.reports.keys()
+        if exclude_status is not None:
+            ids = ids - self._matching_ids('status', exclude_status)
+
+        results = []
+        for level in PRIORITY_ORDER:
+            bucket = self.indexes['priority'].get(level)
+            if bucket:
+                matched = ids & bucket if len(ids) < len(bucket) else bucket & ids
+                results.extend(map(self.reports.__getitem__, sorted(matched)))
+            if limit is not None and len(results) >= limit:
+                return results[:limit]
+        return results
+
+class EventStore:
+    """
+    Durable storage for PHTRS: an append-only JSONL event log plus snapshots.
+    Each mutation is appended as [seq, kind, data]. Appends are buffered and
+    written with a single write + fsync once batch_size events are pending or
+    flush_interval seconds have passed (checked on append), so an event is
+    durable once flush() has run. snapshot() writes the whole state atomically
+    (temp file + rename) and starts a new log; recover() loads the snapshot and
+    replays only the events logged after it.
+    Call close() (or use the store as a context manager) when done, so the
+    last buffered events are written; stores still open at interpreter exit
+    are closed by an atexit hook as a fallback.
+    """
+    LOG_NAME = 'events.jsonl'
+    SNAPSHOT_NAME = 'snapshot.json'
+
+    def __init__(self, directory, batch_size=1000, flush_interval=0.05, snapshot_every=None):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.log_path = os.path.join(directory, self.LOG_NAME)
+        self.snapshot_path = os.path.join(directory, self.SNAPSHOT_NAME)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.snapshot_every = snapshot_every  # events between automatic snapshots
+        self.system = None
+        self.seq = 0
+        self.events_since_snapshot = 0
+        self._buffer = []
+        self._file = None
+        self._last_flush = time.monotonic()
+        _open_stores.add(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def append(self, kind, data):
+        self.seq += 1
+        self._buffer.append(json.dumps([self.seq, kind, data], separators=(',', ':')))
+        self.events_since_snapshot += 1
+        if len(self._buffer) >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+        if self.snapshot_every and self.events_since_snapshot >= self.snapshot_every:
+            self.snapshot()
+
+    def flush(self):
+        """
+        Writes all buffered events in one write and fsyncs the log.
+        """
+        if self._buffer:
+            if self._file is None:
+                self._file = open(self.log_path, 'a', encoding='utf-8')
+            self._file.write('\n'.join(self._buffer) + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._buffer.clear()
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        _open_stores.discard(self)
+
+    def snapshot(self):
+        """
+        Atomically writes the attached system's state and truncates the log.
+        """
+        self.flush()
+        state = self.system.to_snapshot()
+        state['seq'] = self.seq
+        temp_path = self.snapshot_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(state, file, separators=(',', ':'))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.snapshot_path)
+        self._fsync_directory()
+
+        # Everything up to seq is in the snapshot; recover() skips older events
+        # if a crash lands between the rename and this truncation
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.log_path, 'w', encoding='utf-8')
+        os.fsync(self._file.fileno())
+        self.events_since_snapshot = 0
+        log_and_print(f"Snapshot written at event {self.seq}.")
+
+    def _fsync_directory(self):
+        if hasattr(os, 'O_DIRECTORY'):
+            fd = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def recover(self):
+        """
+        Rebuilds a PHTRS from the snapshot and the log and attaches this store to it.
+        A torn final line (from a crash mid-write) is cut off the log. An
+        unreadable line with events after it raises ValueError and leaves the
+        log as it is, since cutting it would lose those events.
+        """
+        system = PHTRS()
+        seq = 0
+        replayed = 0
+        with silenced():
+            if os.path.exists(self.snapshot_path):
+                with open(self.snapshot_path, encoding='utf-8') as file:
+                    state = json.load(file)
+                system.load_snapshot(state)
+                seq = state['seq']
+            if os.path.exists(self.log_path):
+                good_size = 0
+                with open(self.log_path, 'rb') as file:
+                    for line_number, raw in enumerate(file, 1):
+                        try:
+                            event_seq, kind, data = json.loads(raw)
+                        except ValueError:
+                            if file.read(1):
+                                message = (f"Event log {self.log_path} is corrupt at line {line_number} "
+                                           f"(byte {good_size}) with events after it; not truncating.")
+                                logging.error(message)
+                                raise ValueError(message) from None
+                            break
+                        if not raw.endswith(b'\n'):
+                            break
+                        good_size += len(raw)
+                        if event_seq > seq:
+                            system.apply_event(kind, data)
+                            seq = event_seq
+                            replayed += 1
+                if good_size < os.path.getsize(self.log_path):
+                    with open(self.log_path, 'r+b') as file:
+                        file.truncate(good_size)
+        self.seq = seq
+        self.events_since_snapshot = replayed
+        self.system = system
+        system.event_store = self
+        log_and_print(f"Recovered {len(system.reports)} reports ({replayed} events replayed).")
+        return system
+
+# EventStores not yet closed; flushed at exit so buffered events are not lost
+_open_stores = weakref.WeakSet()
+
+def _close_open_stores():
+    for store in list(_open_stores):
+        store.close()
+
+atexit.register(_close_open_stores)
+
+class Crew:
+    """
+    A repair crew and the work orders it currently holds.
+    capacity is the number of work orders the crew can run at once.
+    """
+    def __init__(self, crew_id, crew_size, equipment, capacity=1):
+        self.crew_id = crew_id
+        self.crew_size = crew_size
+        self.equipment = list(equipment)
+        self.capacity = capacity
+        self.active = set()  # report ids with open work orders
+
+    def free_slots(self):
+        return self.capacity - len(self.active)
+
+    def __repr__(self):
+        return (f"Crew(id={self.crew_id}, size={self.crew_size}, equipment={self.equipment}, "
+                f"active={len(self.active)}/{self.capacity})")
+
+class RepairScheduler:
+    """
+    Hands unassigned reports to free crews, best report first.
+    There is one heap per priority level, ordered by size (largest first) and
+    then age (oldest first), so choosing the next report is O(log n).
+    Assigned or re-prioritized reports leave stale heap entries behind, which
+    are skipped when popped. requirements maps a priority level to equipment
+    a crew must carry to take reports at that level.
+    """
+    def __init__(self, system, requirements=None):
+        self.system = system
+        self.requirements = {level: set(items) for level, items in (requirements or {}).items()}
+        self.heaps = {level: [] for level in PRIORITY_ORDER}
+        self.queued = {}       # report_id -> live heap entry
+        self.crews = {}        # crew_id -> Crew
+        self.assignments = {}  # report_id -> crew_id
+        system.scheduler = self
+        for report_id in sorted(system.indexes['status'][UNASSIGNED]):
+            self.add_report(system.reports[report_id])
+
+    def add_report(self, report):
+        entry = (-report.size, report.timestamp, report.report_id)
+        self.queued[report.report_id] = entry
+        heapq.heappush(self.heaps[report.priority], entry)
+        if sum(map(len, self.heaps.values())) > 2 * len(self.queued) + 1024:
+            self._compact()
+
+    def reprioritize(self, report):
+        """
+        Re-queues a waiting report under its current size and priority.
+        """
+        if report.report_id in self.queued:
+            self.add_report(report)
+
+    def discard(self, report_id):
+        self.queued.pop(report_id, None)
+
+    def _compact(self):
+        """
+        Rebuilds the heaps from live entries only.
+        """
+        for level, heap in self.heaps.items():
+            live = [entry for entry in heap if self.queued.get(entry[2]) is entry]
+            heapq.heapify(live)
+            self.heaps[level] = live
+
+    def pending(self):
+        return len(self.queued)
+
+    def register_crew(self, crew_id, crew_size, equipment, capacity=1):
+        crew = Crew(crew_id, crew_size, equipment, capacity)
+        self.crews[crew_id] = crew
+        log_and_print(f"Registered {crew}")
+        return crew
+
+    def release(self, report_id):
+        """
+        Frees the crew slot held by a completed report.
+        """
+        crew_id = self.assignments.pop(report_id, None)
+        if crew_id is not None:
+            self.crews[crew_id].active.discard(report_id)
+
+    def _pop_next(self, crew):
+        """
+        Removes and returns the best queued report id this crew can take, or None.
+        """
+        equipment = set(crew.equipment)
+        best = None
+        for level in PRIORITY_ORDER:
+            if not self.requirements.get(level, set()) <= equipment:
+                continue
+            heap = self.heaps[level]
+            while heap and self.queued.get(heap[0][2]) is not heap[0]:
+                heapq.heappop(heap)
+            if heap:
+                best = heap
+                break
+        if best is None:
+            return None
+        report_id = heapq.heappop(best)[2]
+        del self.queued[report_id]
+        return report_id
+
+    def dispatch(self, crew_ids=None):
+        """
+        Fills every free slot of the given crews (all crews by default) with
+        the best waiting reports. Returns the new work orders.
+        """
+        orders = []
+        for crew_id in (self.crews if crew_ids is None else crew_ids):
+            crew = self.crews[crew_id]
+            while crew.free_slots() > 0:
+                report_id = self._pop_next(crew)
+                if report_id is None:
+                    break
+                crew.active.add(report_id)
+                self.assignments[report_id] = crew_id
+                orders.append(self.system.assign_work_order(
+                    report_id, crew_id, crew.crew_size, crew.equipment))
+        return orders
+
 # Example Usage
 if __name__ == "__main__":
     system = PHTRS()
@@ -163,4 +1269,11 @@ if __name__ == "__main__":
     # Citizen submits damage claim
     claim = system.submit_damage_claim(r1.report_id, "Jane Doe", "456 Oak Ave", "555-1234", "Flat tire", amount=100.00)
 
+    # Cost dashboard per district
+    log_and_print(f"Costs by district: {system.cost_rollup('district')}")
+
+    # Dispatcher looks up open reports in the district
+    open_reports = system.query_reports(district="North", exclude_status="Repaired")
+    log_and_print(f"Open reports in North: {open_reports}")
+
     log_and_print("Final Data: Reports, Work Orders, Claims stored in memory.")
\ No newline at end of file
@@ -0,0 +1,397 @@
+# PHTRS Benchmarks
+# Builds large in-memory PHTRS instances and times the query layer, the
+# dispatch scheduler, the durable event store, report memory use, bulk
+# ingestion, cost rollups and the spatial index.
+# Console and log output are suppressed while timing.
+# Run with: python Module5_benchmark.py [reports]
+import contextlib
+import csv
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import Module5_Assignment as phtrs
+
+DISTRICTS = ["North", "South", "East", "West", "Central", "Harbor", "Airport", "Uptown"]
+LOCATIONS = ["curb", "middle", "shoulder", "intersection"]
+
+
+@contextlib.contextmanager
+def quiet():
+    """
+    Silences log_and_print (both the log file and the console) inside the block.
+    """
+    logging.disable(logging.CRITICAL)
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), phtrs.silenced():
+            yield
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def timed(label, func, count=None, unit="ops"):
+    """
+    Runs func once, prints the elapsed time (and throughput when count is given).
+    """
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    rate = f"  {count / elapsed:12,.0f} {unit}/s" if count else ""
+    print(f"{label:<32} {elapsed:8.3f}s{rate}")
+    return result
+
+
+def build_system(count, seed=505, repaired_share=0.3):
+    """
+    Creates a PHTRS with `count` random reports; some get work orders and repairs.
+    """
+    rng = random.Random(seed)
+    with quiet():
+        system = phtrs.PHTRS()
+        for i in range(count):
+            system.report_pothole(f"{i} Main St", rng.randint(1, 10),
+                                  rng.choice(LOCATIONS), rng.choice(DISTRICTS))
+        for rid in rng.sample(range(1, count + 1), count // 2):
+            system.assign_work_order(rid, crew_id=rid % 50, crew_size=3, equipment=["Truck"])
+            if rng.random() < repaired_share * 2:
+                system.complete_repair(rid)
+    return system
+
+
+def scan_query(system, exclude_status=None, **filters):
+    """
+    The full-scan equivalent of query_reports (single-value filters only).
+    """
+    rank = {level: i for i, level in enumerate(phtrs.PRIORITY_ORDER)}
+    status_filter = filters.pop("status", None)
+    matches = [r for r in system.reports.values()
+               if all(getattr(r, field) == value for field, value in filters.items())
+               and (status_filter is None or system.report_status(r.report_id) == status_filter)
+               and system.report_status(r.report_id) != exclude_status]
+    return sorted(matches, key=lambda r: (rank[r.priority], r.report_id))
+
+
+QUERIES = [
+    {"district": "North", "priority": "High", "exclude_status": "Repaired"},
+    {"district": "East", "location": "intersection", "status": "Not Started"},
+]
+
+
+def benchmark_queries(count=1_000_000, repeats=20):
+    """
+    Indexed query_reports vs. a full scan over the same reports.
+    """
+    print(f"\nQuery layer ({count:,} reports)")
+    system = timed("build", lambda: build_system(count), count, "reports")
+    for query in QUERIES:
+        print(query)
+        expected = timed(f"  full scan x{repeats}",
+                         lambda: [scan_query(system, **dict(query)) for _ in range(repeats)][-1],
+                         repeats, "queries")
+        actual = timed(f"  query_reports x{repeats}",
+                       lambda: [system.query_reports(**query) for _ in range(repeats)][-1],
+                       repeats, "queries")
+        assert actual == expected, "Indexed query differs from the full scan."
+        print(f"  {len(actual):,} matching reports")
+
+
+def linear_pick(system):
+    """
+    Today's approach: scan every unassigned report for the best one.
+    """
+    rank = {level: i for i, level in enumerate(phtrs.PRIORITY_ORDER)}
+    unassigned = (r for r in system.reports.values() if r.report_id not in system.work_orders)
+    return min(unassigned, key=lambda r: (rank[r.priority], -r.size, r.timestamp, r.report_id), default=None)
+
+
+def benchmark_dispatch(count=1_000_000, crews=200, rounds=50, linear_picks=20):
+    """
+    Heap-based RepairScheduler dispatch vs. linear best-report selection.
+    Each round completes every active work order and refills all crews.
+    """
+    print(f"\nDispatch scheduler ({count:,} reports, {crews} crews)")
+    system = timed("build", lambda: build_system(count), count, "reports")
+    picks = timed(f"linear pick x{linear_picks}", lambda: [linear_pick(system) for _ in range(linear_picks)],
+                  linear_picks, "picks")
+    with quiet():
+        start = time.perf_counter()
+        scheduler = phtrs.RepairScheduler(system)
+        elapsed = time.perf_counter() - start
+        for crew_id in range(crews):
+            scheduler.register_crew(1000 + crew_id, 3, ["Truck", "Shovel"])
+        first = scheduler.dispatch()
+    print(f"{'scheduler init':<32} {elapsed:8.3f}s")
+    assert first[0].report is picks[0], "Scheduler and linear scan disagree on the best report."
+
+    # Small systems run out of unassigned reports before the rounds end
+    available = sum(report_id not in system.work_orders for report_id in system.reports) + rounds * (crews // 10)
+
+    def run_rounds():
+        dispatched = 0
+        with quiet():
+            for _ in range(rounds):
+                for report_id in list(scheduler.assignments):
+                    system.complete_repair(report_id)
+                for i in range(crews // 10):
+                    system.report_pothole(f"{i} New St", 9, "middle", "North")
+                dispatched += len(scheduler.dispatch())
+        return dispatched
+
+    total = min(rounds * crews, available)
+    dispatched = timed(f"scheduler rounds ({total:,} picks)", run_rounds, total, "picks")
+    assert dispatched == total, f"Dispatched {dispatched:,} of {total:,} available picks."
+
+
+def benchmark_event_store(count=1_000_000, seed=505):
+    """
+    Event log write throughput, then recovery from the log alone and from a snapshot.
+    `count` is the number of events written (reports, assignments, repairs, completions).
+    """
+    print(f"\nEvent store ({count:,} events)")
+    rng = random.Random(seed)
+    reports = count // 2
+    with tempfile.TemporaryDirectory() as directory:
+        def write_events():
+            with quiet():
+                system = phtrs.PHTRS.open(directory)
+                for i in range(reports):
+                    system.report_pothole(f"{i} Main St", rng.randint(1, 10),
+                                          rng.choice(LOCATIONS), rng.choice(DISTRICTS))
+                for rid in range(1, count - reports + 1):
+                    step = rid % 3
+                    if step == 1:
+                        system.assign_work_order(rid, rid % 50, 3, ["Truck"])
+                    elif step == 2:
+                        system.log_repair_details(rid - 1, 2.0, 10.0)
+                    else:
+                        system.complete_repair(rid - 2)
+                system.event_store.close()
+            return system
+
+        system = timed("write + fsync", write_events, count, "events")
+        size = os.path.getsize(os.path.join(directory, phtrs.EventStore.LOG_NAME))
+        print(f"log size: {size / 1e6:.1f} MB")
+
+        def recover():
+            with quiet():
+                return phtrs.PHTRS.open(directory)
+
+        recovered = timed("recover from log", recover, count, "events")
+        assert recovered.to_snapshot() == system.to_snapshot(), "Replay did not rebuild the same state."
+        with quiet():
+            recovered.event_store.snapshot()
+        recovered = timed("recover from snapshot", recover, count, "events")
+        assert recovered.to_snapshot() == system.to_snapshot(), "Snapshot did not rebuild the same state."
+
+
+class DictPotholeReport:
+    """
+    PotholeReport as it was before __slots__ and string interning, for comparison.
+    """
+    def __init__(self, report_id, address, size, location, district):
+        self.report_id = report_id
+        self.address = address
+        self.size = size
+        self.location = location
+        self.district = district
+        self.priority = 'High' if size >= 8 else 'Medium' if size >= 4 else 'Low'
+        self.timestamp = datetime.now()
+        phtrs.log_and_print(f"PotholeReport created: {self}")
+
+    __repr__ = phtrs.PotholeReport.__repr__
+
+
+def make_reports(cls, rows):
+    # (s + " ")[:-1] gives a fresh string per row, as parsing a file would
+    return [cls(i, address, size, (location + " ")[:-1], (district + " ")[:-1])
+            for i, address, size, location, district in rows]
+
+
+def benchmark_report_memory(count=1_000_000, seed=505):
+    """
+    Memory and creation throughput of PotholeReport vs. the __dict__-based layout.
+    """
+    print(f"\nReport memory ({count:,} reports)")
+    rng = random.Random(seed)
+    rows = [(i, f"{i} Main St", rng.randint(1, 10), rng.choice(LOCATIONS), rng.choice(DISTRICTS))
+            for i in range(count)]
+    for label, cls in (("__dict__ reports", DictPotholeReport), ("__slots__ reports", phtrs.PotholeReport)):
+        with quiet():
+            start = time.perf_counter()
+            reports = make_reports(cls, rows)
+            elapsed = time.perf_counter() - start
+            del reports
+            tracemalloc.start()
+            reports = make_reports(cls, rows)
+            allocated = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del reports
+        print(f"{label:<32} {elapsed:8.3f}s  {count / elapsed:12,.0f} reports/s  "
+              f"{allocated / count:6.0f} bytes/report")
+
+
+@contextlib.contextmanager
+def logging_to(path):
+    """
+    Sends log records to path instead of phts.log and the console to os.devnull.
+    """
+    root = logging.getLogger()
+    saved = root.handlers[:]
+    handler = logging.FileHandler(path)
+    root.handlers = [handler]
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            yield
+    finally:
+        handler.close()
+        root.handlers = saved
+
+
+def benchmark_bulk_ingest(count=1_000_000, seed=505):
+    """
+    report_pothole one at a time (logged, and silenced) vs. report_potholes_bulk
+    from in-memory rows and from a CSV file.
+    """
+    print(f"\nBulk ingestion ({count:,} reports)")
+    rng = random.Random(seed)
+    rows = [(f"{i} Main St", rng.randint(1, 10), rng.choice(LOCATIONS), rng.choice(DISTRICTS))
+            for i in range(count)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "reports.csv")
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(phtrs.REPORT_FIELDS)
+            writer.writerows(rows)
+        log_path = os.path.join(directory, "phts.log")
+
+        def one_at_a_time(silent=False):
+            with quiet() if silent else logging_to(log_path):
+                system = phtrs.PHTRS()
+                for row in rows:
+                    system.report_pothole(*row)
+            return system
+
+        def bulk(source):
+            with logging_to(log_path):
+                system = phtrs.PHTRS()
+                system.report_potholes_bulk(source)
+            return system
+
+        logged = timed("report_pothole loop, logged", one_at_a_time, count, "reports")
+        timed("report_pothole loop, silenced", lambda: one_at_a_time(silent=True), count, "reports")
+        batched = timed("report_potholes_bulk (rows)", lambda: bulk(rows), count, "reports")
+        from_csv = timed("report_potholes_bulk (CSV)", lambda: bulk(path), count, "reports")
+
+    expected = [r.address for r in logged.query_reports(district="North", priority="High")]
+    assert expected == [r.address for r in batched.query_reports(district="North", priority="High")]
+    assert expected == [r.address for r in from_csv.query_reports(district="North", priority="High")]
+
+
+def scan_rollup(system):
+    """
+    Cost per district by walking every work order, as dashboards do today.
+    """
+    totals = {}
+    for order in system.work_orders.values():
+        row = totals.setdefault(order.report.district, [0.0, 0.0, 0.0, 0, 0])
+        row[0] += order.cost
+        row[1] += order.hours
+        row[2] += order.material_used
+        row[3] += 1
+        row[4] += order.status != "Repaired"
+    return totals
+
+
+def benchmark_rollups(count=1_000_000, repeats=20):
+    """
+    cost_rollup (incremental) vs. recomputing from all work orders, plus the
+    cost of keeping the rollups current while repairs are logged.
+    """
+    print(f"\nCost rollups ({count:,} reports)")
+    system = build_system(count)
+    orders = list(system.work_orders)
+
+    def log_repairs():
+        with quiet():
+            for report_id in orders:
+                system.log_repair_details(report_id, 1.5, 20.0)
+
+    timed(f"log_repair_details x{len(orders):,}", log_repairs, len(orders), "repairs")
+    expected = timed(f"walk work orders x{repeats}", lambda: [scan_rollup(system) for _ in range(repeats)][-1],
+                     repeats, "queries")
+    actual = timed(f"cost_rollup x{repeats}", lambda: [system.cost_rollup("district") for _ in range(repeats)][-1],
+                   repeats, "queries")
+    for district, (cost, hours, material, work_orders, open_orders) in expected.items():
+        row = actual[district]
+        assert abs(row["cost"] - cost) < 0.01 and row["work_orders"] == work_orders and row["open"] == open_orders
+
+
+def benchmark_spatial(count=200_000, queries=1000, seed=505):
+    """
+    Grid-indexed radius and nearest-neighbour queries vs. brute force over
+    `count` reports spread across a city-sized box, plus duplicate merging.
+    """
+    print(f"\nSpatial index ({count:,} reports, {queries:,} queries)")
+    rng = random.Random(seed)
+    center_lat, center_lon, spread = 40.0, -75.0, 0.15  # about 33 km across
+
+    def point():
+        return center_lat + rng.uniform(-spread, spread), center_lon + rng.uniform(-spread, spread)
+
+    with quiet():
+        system = phtrs.PHTRS()
+        system.duplicate_radius = None
+        for i in range(count):
+            lat, lon = point()
+            system.report_pothole(f"{i} Main St", rng.randint(1, 10), rng.choice(LOCATIONS),
+                                  rng.choice(DISTRICTS), latitude=lat, longitude=lon)
+    reports = list(system.reports.values())
+    points = [point() for _ in range(queries)]
+
+    def brute_within(lat, lon, radius):
+        found = [(phtrs.distance_m(lat, lon, r.latitude, r.longitude), r.report_id, r) for r in reports]
+        return [(d, r) for d, _, r in sorted(f for f in found if f[0] <= radius)]
+
+    def brute_nearest(lat, lon, k):
+        found = sorted((phtrs.distance_m(lat, lon, r.latitude, r.longitude), r.report_id, r) for r in reports)
+        return [(d, r) for d, _, r in found[:k]]
+
+    few = points[:max(1, queries // 100)]
+    expected = timed(f"brute force radius x{len(few)}", lambda: [brute_within(a, b, 250) for a, b in few],
+                     len(few), "queries")
+    actual = timed(f"grid radius x{queries}", lambda: [system.reports_within(a, b, 250) for a, b in points],
+                   queries, "queries")
+    assert actual[:len(few)] == expected, "Grid radius query differs from brute force."
+    expected = timed(f"brute force 5-NN x{len(few)}", lambda: [brute_nearest(a, b, 5) for a, b in few],
+                     len(few), "queries")
+    actual = timed(f"grid 5-NN x{queries}", lambda: [system.nearest_reports(a, b, 5) for a, b in points],
+                   queries, "queries")
+    assert actual[:len(few)] == expected, "Grid nearest query differs from brute force."
+
+    def report_with_merging():
+        with quiet():
+            system.duplicate_radius = phtrs.DUPLICATE_RADIUS_M
+            before = len(system.reports)
+            for lat, lon in points:
+                system.report_pothole("dup", 5, "curb", "North", latitude=lat, longitude=lon)
+            return len(system.reports) - before
+
+    added = timed(f"report_pothole + merge x{queries}", report_with_merging, queries, "reports")
+    print(f"{queries - added} of {queries} new reports merged as duplicates")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    benchmark_queries(n)
+    benchmark_dispatch(n)
+    benchmark_event_store(n)
+    benchmark_report_memory(n)
+    benchmark_bulk_ingest(n)
+    benchmark_rollups(n)
+    benchmark_spatial(max(n // 5, 100_000))
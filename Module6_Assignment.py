@@ -1,16 +1,29 @@
 # Check Writer Program
 # Converts a numeric amount to a textual representation for use on checks.
 # Includes logging and follows stepwise refinement principles.
+import argparse
+import csv
+import json
 import math
 import logging
+import os
+import re
+import sys
+from collections import deque
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from multiprocessing import Pool
+
+from shared_logging import setup_logging
 
 # Configure logging
-logging.basicConfig(filename='check_writer.log', level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+setup_logging(filename='check_writer.log', level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # Mappings for number words
 ONES = ["", "One", "Two", "Three", "Four", "Five", "Six", "Seven", "Eight", "Nine"]
 TEENS = ["Ten", "Eleven", "Twelve", "Thirteen", "Fourteen", "Fifteen", "Sixteen", "Seventeen", "Eighteen", "Nineteen"]
 TENS = ["", "", "Twenty", "Thirty", "Forty", "Fifty", "Sixty", "Seventy", "Eighty", "Ninety"]
+UNITS = ["", "Thousand", "Million", "Billion", "Trillion", "Quadrillion", "Quintillion", "Sextillion"]
+MAX_DOLLARS = 1000 ** len(UNITS) - 1
 
 
 def convert_hundreds(n):
@@ -40,10 +53,12 @@ def convert_dollars_to_words(amount):
     """
     if amount == 0:
         return "Zero Dollars"
+    if amount > MAX_DOLLARS:
+        raise ValueError(f"Amounts above {MAX_DOLLARS} dollars are not supported.")
 
     original_amount = amount  # Preserve original amount for plural check
     parts = []
-    units = ["", "Thousand", "Million", "Billion"]
+    units = UNITS
     i = 0
 
     while amount > 0:
@@ -90,27 +105,489 @@ def check_writer(amount):
         print("Error:", e)
 
 
+# Lookup tables for the batch path, built once at import.
+# HUNDREDS_WORDS[n] is convert_hundreds(n) for every n in 0-999.
+HUNDREDS_WORDS = tuple(convert_hundreds(n) for n in range(1000))
+UNIT_SUFFIXES = tuple(" " + unit if unit else "" for unit in UNITS)
+# Cents can round up to 100 (e.g. 0.999), so the table covers 0-100.
+CENTS_WORDS = tuple(convert_cents_to_words(c) for c in range(101))
+
+
+def dollars_to_words_fast(dollars):
+    """
+    Table-driven equivalent of convert_dollars_to_words.
+    Each group of three digits is a single lookup in HUNDREDS_WORDS.
+    """
+    if dollars < 1000:
+        if dollars == 0:
+            return "Zero Dollars"
+        return HUNDREDS_WORDS[dollars] + (" Dollar" if dollars == 1 else " Dollars")
+    if dollars > MAX_DOLLARS:
+        raise ValueError(f"Amounts above {MAX_DOLLARS} dollars are not supported.")
+
+    parts = []
+    n = dollars
+    i = 0
+    while n > 0:
+        n, chunk = divmod(n, 1000)
+        if chunk:
+            parts.append(HUNDREDS_WORDS[chunk] + UNIT_SUFFIXES[i])
+        i += 1
+    parts.reverse()
+    return ' '.join(parts) + " Dollars"
+
+
+def format_check_text(amount):
+    """
+    Returns the check text for a single amount without printing or logging.
+    Produces the same text as check_writer.
+    """
+    if amount < 0:
+        raise ValueError("Negative amounts not allowed.")
+    dollars = int(math.floor(amount))
+    cents = int(round((amount - dollars) * 100))
+    return f"{dollars_to_words_fast(dollars)} and {CENTS_WORDS[cents]} Only."
+
+
+# Exact path: amounts are handled as integer cents, never as floats.
+# Plain "1234.56" style strings are split with a regex; anything else goes through Decimal.
+_PLAIN_AMOUNT = re.compile(r'(\d+)(?:\.(\d{1,2}))?')
+_CENT = Decimal('0.01')
+_HAS_LETTERS = re.compile(r'[A-Za-z]')
+_THOUSANDS = re.compile(r'\d{1,3}(?:,\d{3})+(?:\.\d*)?')
+
+
+def parse_cents(value):
+    """
+    Converts a string, int, Decimal or float amount to integer cents.
+    Strings may carry a leading '$' and well-formed thousands separators
+    ("1,234.50"). More than two decimal places are rounded half-up. Floats go
+    through their shortest repr. Raises ValueError for anything else, or for
+    amounts above MAX_DOLLARS.
+    """
+    if isinstance(value, bool):
+        raise ValueError(f"Unsupported amount value: {value!r}")
+    if isinstance(value, int):
+        cents = value * 100
+    else:
+        if isinstance(value, str):
+            text = value.strip().lstrip('$')
+            if ',' in text and not _HAS_LETTERS.search(text):
+                if not _THOUSANDS.fullmatch(text):
+                    raise ValueError(f"Invalid amount: {value!r}")
+                text = text.replace(',', '')
+            match = _PLAIN_AMOUNT.fullmatch(text)
+            if match:
+                whole, fraction = match.groups()
+                if len(whole) > len(str(MAX_DOLLARS)) or int(whole) > MAX_DOLLARS:
+                    raise ValueError(f"Amounts above {MAX_DOLLARS} dollars are not supported.")
+                return int(whole) * 100 + (int(fraction.ljust(2, '0')) if fraction else 0)
+        elif isinstance(value, float):
+            text = repr(value)
+        elif isinstance(value, Decimal):
+            text = value
+        else:
+            raise ValueError(f"Unsupported amount value: {value!r}")
+        try:
+            amount = Decimal(text)
+        except InvalidOperation:
+            # Fall back to check phrasing such as "Twelve Dollars and Fifty Cents"
+            if isinstance(value, str) and _HAS_LETTERS.search(value):
+                return words_to_cents(value)
+            raise ValueError(f"Invalid amount: {value!r}") from None
+        if not amount.is_finite():
+            raise ValueError(f"Invalid amount: {value!r}")
+        # Checked first: quantizing a huge value overflows the Decimal context
+        if abs(amount) > MAX_DOLLARS:
+            raise ValueError(f"Amounts above {MAX_DOLLARS} dollars are not supported.")
+        cents = int(amount.quantize(_CENT, rounding=ROUND_HALF_UP) * 100)
+    if cents < 0:
+        raise ValueError("Negative amounts not allowed.")
+    if cents > MAX_DOLLARS * 100 + 99:
+        raise ValueError(f"Amounts above {MAX_DOLLARS} dollars are not supported.")
+    return cents
+
+
+def cents_to_check_text(cents):
+    """
+    Returns the check text for an amount given in integer cents.
+    """
+    if cents < 0:
+        raise ValueError("Negative amounts not allowed.")
+    dollars, cents = divmod(cents, 100)
+    return f"{dollars_to_words_fast(dollars)} and {CENTS_WORDS[cents]} Only."
+
+
+# Reverse parser: check words back to integer cents.
+# ONES/TEENS/TENS are inverted once into a single word -> value dict.
+WORD_VALUES = {'zero': 0}
+WORD_VALUES.update((word.lower(), n) for n, word in enumerate(ONES) if word)
+WORD_VALUES.update((word.lower(), 10 + n) for n, word in enumerate(TEENS))
+WORD_VALUES.update((word.lower(), 10 * n) for n, word in enumerate(TENS) if word)
+SCALE_VALUES = {unit.lower(): 1000 ** i for i, unit in enumerate(UNITS) if unit}
+
+
+def _words_to_int(tokens, text):
+    """
+    Converts a list of lowercase number words to an integer, enforcing the
+    grammar check_writer produces. Each group is [ones "Hundred"] then either
+    tens [ones], a teen or ones, followed by a scale word; scale words must
+    appear in decreasing order ("Two Million Five Thousand"). "Zero" stands
+    alone. Raises ValueError for anything else.
+    """
+    words = [token for token in tokens if token != 'and']
+    if words == ['zero']:
+        return 0
+    total = 0
+    hundreds = tens = ones = None  # the group being read
+    last_scale = None
+    for index, token in enumerate(words):
+        value = WORD_VALUES.get(token)
+        if token == 'a' and hundreds is tens is ones is None and index + 1 < len(words):
+            value = 1  # "a hundred", "a thousand"
+        if value is not None:
+            if value == 0 or ones is not None or (value >= 10 and tens is not None):
+                raise ValueError(f"Misplaced '{token}' in {text!r}")
+            if value >= 20:
+                tens = value
+            else:
+                ones = value
+        elif token == 'hundred':
+            if hundreds is not None or tens is not None or (ones or 1) >= 10:
+                raise ValueError(f"Misplaced '{token}' in {text!r}")
+            hundreds = (ones or 1) * 100
+            ones = None
+        elif token in SCALE_VALUES:
+            scale = SCALE_VALUES[token]
+            group = (hundreds or 0) + (tens or 0) + (ones or 0)
+            if not group or (last_scale is not None and scale >= last_scale):
+                raise ValueError(f"Misplaced '{token}' in {text!r}")
+            total += group * scale
+            hundreds = tens = ones = None
+            last_scale = scale
+        else:
+            raise ValueError(f"Unrecognized word '{token}' in {text!r}")
+    if not words:
+        raise ValueError(f"No number words in {text!r}")
+    return total + (hundreds or 0) + (tens or 0) + (ones or 0)
+
+
+def words_to_cents(text):
+    """
+    Parses check phrasing back to integer cents.
+    Example: "One Hundred Twenty Dollars and Fifty Cents Only." -> 12050
+    Bare number words ("One Thousand") are read as dollars, and
+    "... Cents" on its own is read as cents.
+    """
+    tokens = text.lower().replace('-', ' ').replace(',', ' ').replace('.', ' ').split()
+    if tokens and tokens[-1] == 'only':
+        tokens.pop()
+
+    if 'dollars' in tokens:
+        split_at = tokens.index('dollars')
+    elif 'dollar' in tokens:
+        split_at = tokens.index('dollar')
+    else:
+        split_at = -1
+
+    dollar_tokens, cent_tokens = tokens, None
+    if split_at >= 0:
+        dollar_tokens, rest = tokens[:split_at], tokens[split_at + 1:]
+        if rest and rest[0] == 'and':
+            rest = rest[1:]
+        if rest:
+            if rest[-1] not in ('cent', 'cents'):
+                raise ValueError(f"Expected '... Cents' after 'Dollars' in {text!r}")
+            cent_tokens = rest[:-1]
+    elif tokens and tokens[-1] in ('cent', 'cents'):
+        dollar_tokens, cent_tokens = [], tokens[:-1]
+
+    if not dollar_tokens and cent_tokens is None:
+        raise ValueError(f"No amount found in {text!r}")
+    dollars = _words_to_int(dollar_tokens, text) if dollar_tokens else 0
+    cents = _words_to_int(cent_tokens, text) if cent_tokens is not None else 0
+    if cents > 99:
+        raise ValueError(f"Cents must be below 100 in {text!r}")
+    return dollars * 100 + cents
+
+
+def words_to_amount(text):
+    """
+    Parses check phrasing to an exact Decimal dollar amount.
+    """
+    return Decimal(words_to_cents(text)).scaleb(-2)
+
+
+def format_check_text_exact(value):
+    """
+    Exact counterpart of format_check_text: parses value to integer cents first.
+    """
+    return cents_to_check_text(parse_cents(value))
+
+
+def check_writer_exact(value):
+    """
+    Like check_writer, but takes the amount as a string (or int/Decimal) and
+    converts it through integer cents so large amounts are not rounded.
+    """
+    logging.info(f"Received amount: {value}")
+    try:
+        full_output = format_check_text_exact(value)
+        logging.info(f"Converted to words: {full_output}")
+        print(full_output)
+    except Exception as e:
+        logging.exception("An error occurred during check writing.")
+        print("Error:", e)
+
+
+def check_writer_batch(amounts, exact=False):
+    """
+    Converts an iterable of amounts to check text, yielding one string per amount.
+    Intended for payroll runs: nothing is printed and only a summary line is logged
+    once the iterable is exhausted. Negative amounts raise ValueError.
+    With exact=True each amount goes through parse_cents instead of float math.
+    """
+    convert = format_check_text_exact if exact else format_check_text
+    count = 0
+    for amount in amounts:
+        yield convert(amount)
+        count += 1
+    logging.info(f"Batch converted {count} amounts.")
+
+
+# Streaming file mode
+# Reads amounts from CSV or JSONL (file or stdin) and writes check text as it goes.
+# Only one chunk per worker (plus a small read-ahead window) is held in memory.
+
+def _open_input(path):
+    if path == '-':
+        return sys.stdin
+    return open(path, mode='r', newline='')
+
+
+def _open_output(path):
+    if path == '-':
+        return sys.stdout
+    return open(path, mode='w', newline='')
+
+
+def _guess_format(path, default='csv'):
+    """
+    Picks 'csv' or 'jsonl' from the file extension.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.jsonl', '.ndjson', '.json'):
+        return 'jsonl'
+    if ext in ('.csv', '.txt'):
+        return 'csv'
+    return default
+
+
+def _parse_line(line, input_format, field, column):
+    """
+    Extracts the raw amount value from one input record: a JSONL line, or a
+    CSV row already split into fields.
+    """
+    if input_format == 'jsonl':
+        record = json.loads(line, parse_float=Decimal)
+        if isinstance(record, dict):
+            if field not in record:
+                raise ValueError(f"Missing '{field}' field.")
+            return record[field]
+        return record
+    row = line
+    if column >= len(row):
+        raise ValueError(f"Missing column {column + 1}.")
+    return row[column]
+
+
+def convert_chunk(lines, input_format='csv', field='amount', column=0):
+    """
+    Converts a chunk of (line_no, record) pairs (see _parse_line).
+    Returns a list of (line_no, raw_value, text, error) tuples; exactly one of
+    text and error is None. Runs inside worker processes in parallel mode.
+    """
+    results = []
+    for line_no, line in lines:
+        value = None
+        try:
+            value = _parse_line(line, input_format, field, column)
+            text = format_check_text_exact(value)
+            results.append((line_no, str(value), text, None))
+        except Exception as e:
+            if value is None:
+                value = line if input_format == 'jsonl' else ','.join(line)
+            results.append((line_no, str(value), None, str(e) or type(e).__name__))
+    return results
+
+
+def _read_chunks(records, chunk_size):
+    """
+    Groups (line_no, record) pairs into lists of up to chunk_size.
+    """
+    chunk = []
+    for pair in records:
+        chunk.append(pair)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _jsonl_records(stream):
+    for line_no, line in enumerate(stream, 1):
+        line = line.rstrip('\r\n')
+        if line.strip():
+            yield line_no, line
+
+
+def _csv_records(reader, first=None):
+    """
+    Yields (line_no, row) for non-blank rows from one csv.reader, so quoted
+    fields may span lines; line_no is the line the row starts on. first is
+    an already-read (line_no, row) to put back in front.
+    """
+    if first is not None and any(cell.strip() for cell in first[1]):
+        yield first
+    next_line = reader.line_num + 1
+    for row in reader:
+        if any(cell.strip() for cell in row):
+            yield next_line, row
+        next_line = reader.line_num + 1
+
+
+def _convert_chunks(chunks, workers, input_format, field, column):
+    """
+    Yields converted chunks in input order.
+    With workers > 1 the chunks are spread across a process pool, keeping at
+    most two chunks per worker in flight so memory stays bounded.
+    """
+    if workers <= 1:
+        for chunk in chunks:
+            yield convert_chunk(chunk, input_format, field, column)
+        return
+
+    with Pool(workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(convert_chunk, (chunk, input_format, field, column)))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+def stream_checks(infile, outfile, input_format='csv', output_format='csv', field='amount',
+                  rejects_path='check_writer_rejects.jsonl', workers=1, chunk_size=10000):
+    """
+    Streams amounts from infile to check text in outfile.
+    Lines that fail to parse or convert are written to rejects_path as JSONL
+    and the run continues. Returns (converted, rejected) counts.
+    """
+    column = 0
+    if input_format == 'csv':
+        reader = csv.reader(infile)
+        # Use the header to locate the amount column when one is present
+        header = next(reader, [])
+        names = [name.strip().lower() for name in header]
+        if field.lower() in names:
+            column = names.index(field.lower())
+            records = _csv_records(reader)
+        else:
+            records = _csv_records(reader, (1, header))
+    else:
+        records = _jsonl_records(infile)
+
+    writer = csv.writer(outfile) if output_format == 'csv' else None
+    if writer:
+        writer.writerow(['line', 'amount', 'text'])
+
+    # The rejects file is only created when there are rejects; drop a stale one
+    if os.path.exists(rejects_path):
+        os.remove(rejects_path)
+    rejects = None
+    converted = rejected = 0
+    try:
+        chunks = _read_chunks(records, chunk_size)
+        for results in _convert_chunks(chunks, workers, input_format, field, column):
+            for line_no, value, text, error in results:
+                if error is not None:
+                    if rejects is None:
+                        rejects = open(rejects_path, mode='w')
+                    rejects.write(json.dumps({'line': line_no, 'input': value, 'error': error}) + '\n')
+                    rejected += 1
+                elif writer:
+                    writer.writerow([line_no, value, text])
+                    converted += 1
+                else:
+                    outfile.write(json.dumps({'line': line_no, 'amount': value, 'text': text}) + '\n')
+                    converted += 1
+    finally:
+        if rejects is not None:
+            rejects.close()
+
+    logging.info(f"Streamed {converted} checks, {rejected} rejected.")
+    return converted, rejected
+
+
+def stream_main(argv):
+    """
+    Command-line entry point for the streaming file mode.
+    """
+    parser = argparse.ArgumentParser(description="Convert a file of amounts to check text.")
+    parser.add_argument('input', help="Input CSV/JSONL file, or '-' for stdin.")
+    parser.add_argument('-o', '--output', default='-', help="Output CSV/JSONL file (default: stdout).")
+    parser.add_argument('--input-format', choices=['csv', 'jsonl'], help="Defaults to the input file extension.")
+    parser.add_argument('--output-format', choices=['csv', 'jsonl'], help="Defaults to the output file extension.")
+    parser.add_argument('--field', default='amount', help="CSV column or JSON key holding the amount.")
+    parser.add_argument('--rejects', default='check_writer_rejects.jsonl', help="File for lines that fail to parse.")
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes (default: 1).")
+    parser.add_argument('--chunk-size', type=int, default=10000, help="Lines per worker task.")
+    args = parser.parse_args(argv)
+
+    input_format = args.input_format or _guess_format(args.input)
+    output_format = args.output_format or _guess_format(args.output)
+
+    infile = _open_input(args.input)
+    outfile = _open_output(args.output)
+    try:
+        converted, rejected = stream_checks(infile, outfile, input_format, output_format, args.field,
+                                            args.rejects, args.workers, args.chunk_size)
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
+        if outfile is not sys.stdout:
+            outfile.close()
+
+    print(f"Converted {converted} amounts, {rejected} rejected.", file=sys.stderr)
+    return 0
+
+
 # Example usage
 if __name__ == '__main__':
+    # Any command-line arguments switch to the streaming file mode
+    if len(sys.argv) > 1:
+        sys.exit(stream_main(sys.argv[1:]))
+
     # Prompt user for input and validate it
     try:
-        user_input = input("Enter amount (e.g., 1234.56 or 'One Thousand'): ")
+        user_input = input("Enter amount (e.g., $1,234.56 or 'One Thousand'): ")
 
-        # Try parsing as a float first
-        try:
-            input_amount = float(user_input)
-        except ValueError:
-            # Attempt to convert word input to a numeric value using external package (e.g., word2number)
-            from word2number import w2n
+        # Numeric input ('$' and commas included) is kept as a string for parse_cents
+        if not _HAS_LETTERS.search(user_input):
+            input_amount = user_input.strip()
+        else:
+            # Attempt to convert word input with the built-in check phrasing parser
             try:
-                input_amount = float(w2n.word_to_num(user_input))
+                input_amount = words_to_amount(user_input)
                 logging.info(f"Converted word input to number: {input_amount}")
             except Exception:
                 logging.error("Invalid input. Could not parse number from text.")
                 print("Invalid input. Please enter a valid number or numeric phrase.")
                 exit(1)
 
-        check_writer(input_amount)
+        check_writer_exact(input_amount)
 
     except Exception as e:
         logging.error("Unexpected error.")
@@ -0,0 +1,114 @@
+# Check Writer Benchmarks
+# Compares the per-call conversion path with the table-driven batch path,
+# the float path with the exact integer-cents path, and the words -> amount parser.
+# Run with: python Module6_benchmark.py [count]
+import math
+import random
+import sys
+import time
+
+import Module6_Assignment as cw
+
+
+def make_amounts(count, seed=505):
+    """
+    Builds a reproducible list of amounts with two decimal places.
+    """
+    rng = random.Random(seed)
+    return [rng.randrange(0, 100_000_000) / 100 for _ in range(count)]
+
+
+def per_call_text(amount):
+    """
+    The conversion done by check_writer, minus the print and logging calls.
+    """
+    dollars = int(math.floor(amount))
+    cents = int(round((amount - dollars) * 100))
+    return f"{cw.convert_dollars_to_words(dollars)} and {cw.convert_cents_to_words(cents)} Only."
+
+
+def timed(label, func, count):
+    """
+    Runs func once, prints its throughput and returns the result.
+    """
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<24} {elapsed:8.3f}s  {count / elapsed:12,.0f} amounts/s")
+    return result
+
+
+def benchmark_batch(count=1_000_000):
+    """
+    Per-call path vs. check_writer_batch on the same amounts.
+    """
+    amounts = make_amounts(count)
+    print(f"\nBatch conversion ({count:,} amounts)")
+    expected = timed("per-call", lambda: [per_call_text(a) for a in amounts], count)
+    actual = timed("check_writer_batch", lambda: list(cw.check_writer_batch(amounts)), count)
+    assert actual == expected, "Batch output differs from the per-call path."
+
+
+def check_exact_properties(trials=100_000, seed=505):
+    """
+    Randomized property check for the exact path: for any integer cents value
+    (up to MAX_DOLLARS), formatting it as a string and parsing it back gives the
+    same cents, and the text matches the original word functions.
+    """
+    rng = random.Random(seed)
+    max_cents = cw.MAX_DOLLARS * 100 + 99
+    for _ in range(trials):
+        # Mix small amounts with amounts spread over every unit group
+        digits = rng.randint(1, len(str(max_cents)))
+        cents = rng.randrange(0, min(10 ** digits, max_cents + 1))
+        dollars, rest = divmod(cents, 100)
+        text = f"{dollars}.{rest:02d}"
+        assert cw.parse_cents(text) == cents, text
+        assert cw.parse_cents(f"${dollars:,}.{rest:02d}") == cents, text
+        expected = f"{cw.convert_dollars_to_words(dollars)} and {cw.convert_cents_to_words(rest)} Only."
+        assert cw.format_check_text_exact(text) == expected, text
+    print(f"Exact path properties held for {trials:,} random amounts.")
+
+
+def benchmark_exact(count=1_000_000):
+    """
+    Float path (float strings) vs. exact path (strings parsed to integer cents).
+    """
+    strings = [f"{a:.2f}" for a in make_amounts(count)]
+    print(f"\nExact vs. float path ({count:,} string amounts)")
+    timed("float + per-call", lambda: [per_call_text(float(s)) for s in strings], count)
+    timed("float + batch", lambda: list(cw.check_writer_batch(float(s) for s in strings)), count)
+    timed("exact batch", lambda: list(cw.check_writer_batch(strings, exact=True)), count)
+
+    # Amounts past 2**53 cents, where the float path loses cents
+    big = [f"{d}.{d % 100:02d}" for d in range(10 ** 15, 10 ** 15 + 1000)]
+    wrong = sum(cw.format_check_text(float(s)) != cw.format_check_text_exact(s) for s in big)
+    print(f"float path wrong on {wrong} of {len(big)} amounts near 10**15 dollars")
+
+
+def benchmark_parser(count=1_000_000):
+    """
+    Parses check text back to cents and confirms the round trip.
+    word2number is timed alongside when it is installed.
+    """
+    cents = [round(a * 100) for a in make_amounts(count)]
+    texts = [cw.cents_to_check_text(c) for c in cents]
+    print(f"\nWords -> amount parser ({count:,} check texts)")
+    parsed = timed("words_to_cents", lambda: [cw.words_to_cents(t) for t in texts], count)
+    assert parsed == cents, "Parser did not round-trip the check text."
+
+    try:
+        from word2number import w2n
+    except ImportError:
+        print("word2number not installed; skipping comparison.")
+        return
+    dollar_words = [t.split(" Dollar")[0] for t in texts]
+    timed("w2n.word_to_num (dollars)", lambda: [w2n.word_to_num(t) for t in dollar_words], count)
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    benchmark_batch(n)
+    check_exact_properties()
+    benchmark_exact(n)
+    benchmark_parser(n)
@@ -1,97 +1,918 @@
-import logging
+import argparse
+import bisect
 import csv
+import functools
+import getpass
+import hashlib
+import hmac
+import itertools
+import json
+import logging
 import os
+import re
+import sys
+import threading
+import time
+import uuid
+from array import array
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from shared_logging import setup_logging
 
 # Setup logger
-logging.basicConfig(filename='atm_log.txt', level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+setup_logging(filename='atm_log.txt', level=logging.INFO,
+              format='%(asctime)s - %(levelname)s - %(message)s')
 
 # Constants
 MAX_ATTEMPTS = 3
 CORRECT_PIN = "1234"
-STATE_FILE = 'atm_state.csv'
+STATE_FILE = 'atm_state.csv'  # legacy single-account state, imported once
+STATE_DIR = 'atm_state'
+TRANSITION_LOG = os.path.join(STATE_DIR, 'transitions.jsonl')
+DEFAULT_ACCOUNT = 'default'
+DEFAULT_BALANCE = 1000.0
 
-class ATM:
+PIN_HASH_ITERATIONS = 100_000  # PBKDF2-SHA256 rounds for new PIN hashes
+PIN_CACHE_TTL = 300  # seconds a successful login can skip the hash
+LOCKOUT_SECONDS = 900  # how long MAX_ATTEMPTS wrong PINs lock an account
+
+def to_cents(amount):
+    return int(round(amount * 100))
+
+def write_json_atomic(path, data):
+    """
+    Writes data as JSON to path so that readers see either the old or the new
+    file, never a partial one (temp file + fsync + rename + directory fsync).
+    """
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(data, file, separators=(',', ':'))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+    if hasattr(os, 'O_DIRECTORY'):
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+class ATMStateStore:
+    """
+    Crash-safe balances and PIN attempt counts for any number of accounts.
+    Every change is appended to a JSONL journal as [seq, kind, account, balance
+    in cents, attempts] and fsynced before the call returns, so a completed
+    withdrawal survives a crash. Records carry the resulting values rather than
+    deltas, so replaying one twice is harmless. snapshot() writes all accounts
+    atomically (temp file + rename) and starts a new journal; opening the store
+    loads the snapshot and replays only the journal written after it.
+    Thread-safe: one lock guards the accounts and the journal buffer, and the
+    fsync runs outside it, so concurrent callers share one fsync (group commit).
+    """
+    JOURNAL_NAME = 'journal.jsonl'
+    SNAPSHOT_NAME = 'snapshot.json'
+
+    def __init__(self, directory=STATE_DIR, snapshot_every=10000):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.journal_path = os.path.join(directory, self.JOURNAL_NAME)
+        self.snapshot_path = os.path.join(directory, self.SNAPSHOT_NAME)
+        self.snapshot_every = snapshot_every  # journal records between automatic snapshots
+        self.accounts = {}  # account id -> [balance in cents, attempts]
+        self.seq = 0
+        self.records_since_snapshot = 0
+        self.synced_seq = 0
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()  # taken before _lock, never after
+        self._file = None
+        self.recover()
+
+    def __contains__(self, account_id):
+        return account_id in self.accounts
+
+    def get(self, account_id):
+        """
+        Returns (balance, attempts) for an account, or None if it does not exist.
+        """
+        entry = self.accounts.get(account_id)
+        if entry is None:
+            return None
+        return entry[0] / 100, entry[1]
+
+    def open_account(self, account_id, balance, attempts=0):
+        with self._lock:
+            if account_id in self.accounts:
+                raise ValueError(f"Account {account_id} already exists.")
+            seq = self._append('open', account_id, to_cents(balance), attempts)
+        self._commit(seq)
+
+    def update(self, account_id, balance, attempts):
+        """
+        Stores an account's balance and attempt count, creating it if needed.
+        """
+        with self._lock:
+            seq = self._append('set', account_id, to_cents(balance), attempts)
+        self._commit(seq)
+
+    def set_attempts(self, account_id, attempts):
+        with self._lock:
+            seq = self._append('attempts', account_id, self._account(account_id)[0], attempts)
+        self._commit(seq)
+
+    def withdraw(self, account_id, amount):
+        """
+        Takes amount off the balance and returns the new balance.
+        Raises ValueError (leaving the balance unchanged) if funds are insufficient.
+        """
+        cents = to_cents(amount)
+        if cents <= 0:
+            raise ValueError("Withdrawal amount must be positive.")
+        with self._lock:
+            balance, attempts = self._account(account_id)
+            if cents > balance:
+                raise ValueError("Insufficient funds.")
+            seq = self._append('withdraw', account_id, balance - cents, attempts)
+        self._commit(seq)
+        return (balance - cents) / 100
+
+    def _account(self, account_id):
+        entry = self.accounts.get(account_id)
+        if entry is None:
+            raise KeyError(f"Unknown account {account_id}.")
+        return entry
+
+    def _append(self, kind, account_id, balance, attempts):
+        # Called with _lock held; the record is durable once _commit(seq) returns
+        self.seq += 1
+        if self._file is None:
+            self._file = open(self.journal_path, 'a', encoding='utf-8')
+        self._file.write(json.dumps([self.seq, kind, account_id, balance, attempts], separators=(',', ':')) + '\n')
+        self.accounts[account_id] = [balance, attempts]
+        self.records_since_snapshot += 1
+        return self.seq
+
+    def _commit(self, seq):
+        """
+        Waits until journal record seq is on disk. One fsync covers every record
+        appended before it, so callers that queued up behind it return at once.
+        """
+        with self._sync_lock:
+            if self.synced_seq < seq:
+                with self._lock:
+                    self._file.flush()
+                    target = self.seq
+                    fileno = self._file.fileno()
+                os.fsync(fileno)
+                self.synced_seq = target
+        if self.snapshot_every and self.records_since_snapshot >= self.snapshot_every:
+            self.snapshot()
+
+    def snapshot(self):
+        """
+        Atomically writes every account and starts a new, empty journal.
+        """
+        with self._sync_lock, self._lock:
+            self._snapshot()
+            self.synced_seq = self.seq
+
+    def _snapshot(self):
+        write_json_atomic(self.snapshot_path, {'seq': self.seq, 'accounts': self.accounts})
+
+        # Records up to seq are in the snapshot; recover() skips them if a
+        # crash lands between the rename and this truncation
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.journal_path, 'w', encoding='utf-8')
+        os.fsync(self._file.fileno())
+        self.records_since_snapshot = 0
+
+    def recover(self):
+        """
+        Loads the snapshot and replays the journal after it.
+        A torn final line (from a crash mid-write) is cut off the journal.
+        """
+        accounts = {}
+        seq = 0
+        replayed = 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, encoding='utf-8') as file:
+                state = json.load(file)
+            accounts = state['accounts']
+            seq = state['seq']
+        if os.path.exists(self.journal_path):
+            good_size = 0
+            with open(self.journal_path, 'rb') as file:
+                for raw in file:
+                    try:
+                        record_seq, kind, account_id, balance, attempts = json.loads(raw)
+                    except ValueError:
+                        break
+                    if not raw.endswith(b'\n'):
+                        break
+                    good_size += len(raw)
+                    if record_seq > seq:
+                        accounts[account_id] = [balance, attempts]
+                        seq = record_seq
+                        replayed += 1
+            if good_size < os.path.getsize(self.journal_path):
+                with open(self.journal_path, 'r+b') as file:
+                    file.truncate(good_size)
+        self.accounts = accounts
+        self.seq = seq
+        self.synced_seq = seq
+        self.records_since_snapshot = replayed
+        logging.info(f"Recovered {len(accounts)} accounts ({replayed} journal records replayed).")
+
+    def close(self):
+        with self._sync_lock, self._lock:
+            if self._file is not None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def read_legacy_state(path=STATE_FILE):
+    """
+    Returns (balance, attempts) from the last row of the old atm_state.csv, or None.
+    """
+    if not os.path.exists(path):
+        return None
+    last = None
+    with open(path, mode='r', newline='') as file:
+        for row in csv.reader(file):
+            if row:
+                last = row
+    if last is None:
+        return None
+    return float(last[0]), int(last[1])
+
+class CredentialStore:
+    """
+    Salted PIN hashes and lockouts for many accounts, kept in credentials.json
+    plus a journal of changes since it was written (credentials.jsonl).
+    PINs are stored as PBKDF2-SHA256 hashes with a per-account random salt; the
+    iteration count is tunable and a hash made with an older count is upgraded
+    on the next successful login. Recent successful logins are remembered for
+    cache_ttl seconds as a keyed SHA-256 digest of the PIN, so a repeat login
+    skips the slow hash; a remembered login only counts while the hash it was
+    checked against is still the stored one. Lockouts live in memory with an
+    expiry time and are journaled when they start or are cleared, so they
+    survive a restart. Each change appends (and fsyncs) one journal line;
+    once the journal holds more lines than there are accounts (and at least
+    snapshot_every), credentials.json is rewritten and the journal emptied.
+    Thread-safe; hashing runs outside the lock.
+    """
+    FILE_NAME = 'credentials.json'
+    JOURNAL_NAME = 'credentials.jsonl'
+
+    def __init__(self, directory=STATE_DIR, iterations=PIN_HASH_ITERATIONS,
+                 cache_ttl=PIN_CACHE_TTL, cache_size=100_000, lockout_seconds=LOCKOUT_SECONDS,
+                 snapshot_every=1000):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, self.FILE_NAME)
+        self.journal_path = os.path.join(directory, self.JOURNAL_NAME)
+        self.iterations = iterations
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.lockout_seconds = lockout_seconds
+        self.snapshot_every = snapshot_every
+        self.hashes = {}  # account id -> (iterations, salt, hash)
+        self.lockouts = {}  # account id -> locked until (epoch seconds)
+        self.journaled = 0  # journal lines since credentials.json was written
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._cache = OrderedDict()  # account id -> (pin digest, expires, hash entry it matched)
+        self._cache_key = os.urandom(32)
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # serializes changes and the journal; taken before _lock
+        self._file = None
+        self.load()
+
+    def load(self):
+        """
+        Reads credentials.json and replays the journal after it. A torn final
+        journal line (from a crash mid-write) is cut off the journal.
+        """
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as file:
+                data = json.load(file)
+            self.hashes = {account_id: (iterations, bytes.fromhex(salt), bytes.fromhex(digest))
+                           for account_id, (iterations, salt, digest) in data['accounts'].items()}
+            self.lockouts = data['lockouts']
+        if os.path.exists(self.journal_path):
+            good_size = 0
+            with open(self.journal_path, 'rb') as file:
+                for raw in file:
+                    try:
+                        kind, account_id, *fields = json.loads(raw)
+                    except ValueError:
+                        break
+                    if not raw.endswith(b'\n'):
+                        break
+                    good_size += len(raw)
+                    if kind == 'pin':
+                        iterations, salt, digest = fields
+                        self.hashes[account_id] = (iterations, bytes.fromhex(salt), bytes.fromhex(digest))
+                    elif kind == 'lock':
+                        self.lockouts[account_id] = fields[0]
+                    elif kind == 'unlock':
+                        self.lockouts.pop(account_id, None)
+                    self.journaled += 1
+            if good_size < os.path.getsize(self.journal_path):
+                with open(self.journal_path, 'r+b') as file:
+                    file.truncate(good_size)
+
+    def save(self):
+        """
+        Rewrites credentials.json with every account and empties the journal.
+        """
+        with self._save_lock:
+            self._snapshot()
+
+    def _snapshot(self):
+        # Called with _save_lock held. Journal lines repeat values already in
+        # the new file, so replaying them after a crash before the truncation is harmless.
+        with self._lock:
+            data = {
+                'accounts': {account_id: [iterations, salt.hex(), digest.hex()]
+                             for account_id, (iterations, salt, digest) in self.hashes.items()},
+                'lockouts': dict(self.lockouts),
+            }
+        write_json_atomic(self.path, data)
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.journal_path, 'w', encoding='utf-8')
+        os.fsync(self._file.fileno())
+        self.journaled = 0
+
+    def _journal(self, records):
+        # Called with _save_lock held, after the change is made in memory
+        if self._file is None:
+            self._file = open(self.journal_path, 'a', encoding='utf-8')
+        self._file.write(''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.journaled += len(records)
+        if self.journaled >= max(self.snapshot_every, len(self.hashes)):
+            self._snapshot()
+
+    def close(self):
+        with self._save_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __contains__(self, account_id):
+        return account_id in self.hashes
+
+    def _hash(self, pin, salt, iterations):
+        return hashlib.pbkdf2_hmac('sha256', pin.encode(), salt, iterations)
+
+    def _new_entry(self, pin):
+        salt = os.urandom(16)
+        return self.iterations, salt, self._hash(pin, salt, self.iterations)
+
+    def _cache_digest(self, account_id, pin):
+        return hmac.new(self._cache_key, f"{account_id}\0{pin}".encode(), hashlib.sha256).digest()
+
+    def set_pin(self, account_id, pin, save=True):
+        self.set_pins([(account_id, pin)], save)
+
+    def set_pins(self, pairs, save=True):
+        """
+        Stores new PIN hashes for (account_id, pin) pairs and journals them
+        in one write (save=False keeps them in memory only).
+        """
+        hashed = [(account_id, self._new_entry(pin)) for account_id, pin in pairs]
+        with self._save_lock:
+            with self._lock:
+                for account_id, entry in hashed:
+                    self.hashes[account_id] = entry
+                    self._cache.pop(account_id, None)
+            if save:
+                self._journal([['pin', account_id, iterations, salt.hex(), digest.hex()]
+                               for account_id, (iterations, salt, digest) in hashed])
+
+    def verify(self, account_id, pin):
+        """
+        Returns True if pin is the account's PIN. Does not check lockouts.
+        """
+        if not isinstance(pin, str):
+            return False
+        now = time.monotonic()
+        digest = self._cache_digest(account_id, pin)
+        with self._lock:
+            entry = self.hashes.get(account_id)
+            cached = self._cache.get(account_id)
+            if (cached is not None and cached[2] is entry and cached[1] > now
+                    and hmac.compare_digest(cached[0], digest)):
+                self._cache.move_to_end(account_id)
+                self.cache_hits += 1
+                return True
+            self.cache_misses += 1
+        if entry is None:
+            return False
+        iterations, salt, expected = entry
+        if not hmac.compare_digest(self._hash(pin, salt, iterations), expected):
+            return False
+        if iterations != self.iterations:
+            entry = self._upgrade(account_id, entry, pin)
+        with self._lock:
+            if self.hashes.get(account_id) is entry:  # not changed while we were hashing
+                self._cache[account_id] = (digest, now + self.cache_ttl, entry)
+                self._cache.move_to_end(account_id)
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return True
+
+    def _upgrade(self, account_id, old, pin):
+        # Rehashes at the current cost unless the PIN was changed meanwhile
+        entry = self._new_entry(pin)
+        with self._save_lock:
+            with self._lock:
+                if self.hashes.get(account_id) is not old:
+                    return old
+                self.hashes[account_id] = entry
+            iterations, salt, digest = entry
+            self._journal([['pin', account_id, iterations, salt.hex(), digest.hex()]])
+        return entry
+
+    def is_locked(self, account_id):
+        """
+        True while the account is locked out. An expired lockout is cleared
+        (and journaled) here, and is_locked returns False.
+        """
+        locked_until = self.lockouts.get(account_id)
+        if locked_until is None:
+            return False
+        if locked_until > time.time():
+            return True
+        self.unlock(account_id)
+        return False
+
+    def lock(self, account_id):
+        with self._save_lock:
+            with self._lock:
+                locked_until = self.lockouts[account_id] = time.time() + self.lockout_seconds
+                self._cache.pop(account_id, None)
+            self._journal([['lock', account_id, locked_until]])
+        logging.info(f"Account {account_id} locked for {self.lockout_seconds} seconds.")
+
+    def unlock(self, account_id):
+        with self._save_lock:
+            with self._lock:
+                if self.lockouts.pop(account_id, None) is None:
+                    return
+            self._journal([['unlock', account_id]])
+        logging.info(f"Lockout on account {account_id} cleared.")
+
+class AccountLocks:
+    """
+    One lock per account, created on first use.
+    """
     def __init__(self):
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def __call__(self, account_id):
+        lock = self._locks.get(account_id)
+        if lock is None:
+            with self._guard:
+                lock = self._locks.setdefault(account_id, threading.Lock())
+        return lock
+
+# ATM state machine, one row per transition:
+# (state, event, guard, next state, action). Rows for the same state and event
+# are tried in order and the first whose guard holds is taken; guard "N/A"
+# always holds. Guard and action names map to ATMSession methods through
+# GUARD_METHODS and ACTION_METHODS below.
+ATM_TRANSITIONS = (
+    ("Idle", "Start", "locked", "Rejected", "rejectUser"),
+    ("Idle", "Start", "N/A", "Authenticate", "goToAuthenticate"),
+    ("Authenticate", "EnterPIN", "correct", "Authenticated", "goToAuthenticated"),
+    ("Authenticate", "EnterPIN", "incorrect", "Authenticate", "incrementCounter"),
+    ("Authenticate", "MaxAttemptsReached", "failed", "Rejected", "rejectUser"),
+    ("Authenticated", "Withdraw", "invalid input", "Withdraw Funds", "abortTransaction"),
+    ("Authenticated", "Withdraw", "balance < amount", "Verify Balance", "insufficientFunds"),
+    ("Authenticated", "Withdraw", "balance >= amount", "Dispense Cash", "dispenseCash"),
+    ("Authenticated", "CheckBalance", "N/A", "Verify Balance", "displayBalance"),
+    ("Authenticated", "Exit", "N/A", "Close Session", "endSession"),
+    ("Dispense Cash", "BalanceCheck", "balance == 0", "Close Session", "closeAccount"),
+    ("Dispense Cash", "BalanceCheck", "N/A", "Authenticated", "returnToMenu"),
+    ("Verify Balance", "Done", "N/A", "Authenticated", "returnToMenu"),
+    ("Withdraw Funds", "Done", "N/A", "Authenticated", "returnToMenu"),
+)
+# Events fired automatically on entering a state, with the result of the action
+# that entered it as their value (the new balance after "dispenseCash"); nothing
+# happens if no guard holds
+ATM_COMPLETION_EVENTS = {
+    "Authenticate": "MaxAttemptsReached",
+    "Dispense Cash": "BalanceCheck",
+    "Verify Balance": "Done",
+    "Withdraw Funds": "Done",
+}
+# Events whose guards and action run under the account's lock
+ATM_LOCKED_EVENTS = {("Authenticated", "Withdraw")}
+ATM_FINAL_STATES = {"Rejected", "Close Session"}
+
+class TransitionTrace:
+    """
+    Fixed-size ring buffer of the most recent transitions, shared by any number
+    of sessions. Each entry is three numbers (time in ns, session number, row
+    of ATM_TRANSITIONS) in preallocated arrays; nothing is formatted until
+    entries() or log() is called.
+    """
+    def __init__(self, capacity=65536):
+        self.capacity = capacity
+        self.times = array('q', bytes(8 * capacity))
+        self.sessions = array('q', bytes(8 * capacity))
+        self.rows = array('h', [-1]) * capacity
+        self._next = itertools.count()  # next() on a count is atomic under the GIL
+        self.recorded = 0
+
+    def record(self, session_number, row):
+        slot = next(self._next)
+        self.recorded = slot + 1
+        slot %= self.capacity
+        self.times[slot] = time.time_ns()
+        self.sessions[slot] = session_number
+        self.rows[slot] = row
+
+    def __len__(self):
+        return min(self.recorded, self.capacity)
+
+    def entries(self):
+        """
+        Yields (time_ns, session, state, event, guard, next_state, action), oldest first.
+        """
+        start = self.recorded - len(self)
+        for n in range(start, self.recorded):
+            slot = n % self.capacity
+            if self.rows[slot] >= 0:
+                yield (self.times[slot], self.sessions[slot]) + ATM_TRANSITIONS[self.rows[slot]]
+
+    def log(self):
+        """
+        Writes the buffered transitions to the log in the ATM.log_state format.
+        """
+        for _, session, state, event, guard, next_state, action in self.entries():
+            logging.info(f"SESSION: {session} | STATE: {next_state} | EVENT: {event} [{guard}] / ACTION: {action}")
+
+# Fields of one structured transition record; amounts and balances are in cents
+TRANSITION_FIELDS = ('time', 'account', 'session', 'from', 'event', 'guard', 'to', 'action', 'amount', 'balance')
+
+class TransitionLog:
+    """
+    Append-only structured log of ATM transitions, one JSON array per line in
+    TRANSITION_FIELDS order. Lines are buffered and written in one call every
+    flush_every records (and on flush/close); balances are made durable by
+    ATMStateStore, so this log is not fsynced. Thread-safe.
+    """
+    def __init__(self, path, flush_every=1000):
+        self.path = path
+        self.flush_every = flush_every
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def append(self, account_id, session, source, event, guard, target, action, amount=None, balance=None):
+        line = json.dumps([round(time.time(), 6), account_id, session, source, event, guard, target, action,
+                           amount, balance], separators=(',', ':'))
+        with self._lock:
+            self._buffer.append(line)
+            if len(self._buffer) >= self.flush_every:
+                self._write()
+
+    def _write(self):
+        if self._buffer:
+            self._file.write('\n'.join(self._buffer) + '\n')
+            self._buffer.clear()
+            self._file.flush()
+
+    def flush(self):
+        with self._lock:
+            self._write()
+
+    def close(self):
+        with self._lock:
+            self._write()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class ATMSession:
+    """
+    One ATM session driven by events instead of input(), run by the transition
+    table above: Idle -> Authenticate -> Authenticated -> Withdraw Funds / Verify
+    Balance -> Close Session (or Rejected after MAX_ATTEMPTS wrong PINs).
+    handle(event, value) returns (state, result), where state is the one the
+    event led to (or the final state, if a completion event ended the session),
+    and raises ValueError for an event the current state does not accept.
+    The withdrawal guards and debit run under the account's lock, so concurrent
+    sessions on one account never lose or overdraw a withdrawal.
+    PINs are checked against `credentials` (a CredentialStore), which also
+    holds lockouts; without one the PIN is compared with CORRECT_PIN and an
+    account stays locked once its stored attempts reach MAX_ATTEMPTS.
+    Transitions go to `trace` (under the session's number in this process)
+    and `transition_log` (under session_id, unique across processes and runs)
+    when they are given; on_transition(event, guard, action) is called after
+    each one (ATM uses it for its text log line).
+    """
+    _numbers = itertools.count(1)
+
+    def __init__(self, account_id, store, locks=None, credentials=None, trace=None,
+                 transition_log=None, on_transition=None):
+        self.account_id = account_id
+        self.store = store
+        self.locks = locks if locks is not None else AccountLocks()
+        self.credentials = credentials
+        self.trace = trace
+        self.transition_log = transition_log
+        self.on_transition = on_transition
+        self.number = next(self._numbers)
+        self.session_id = uuid.uuid4().hex
         self.state = "Idle"
         self.attempts = 0
-        self.balance = 1000.0  # Default balance if no file exists
+
+    def handle(self, event, value=None):
+        rows = DISPATCH.get((self.state, event))
+        if rows is None:
+            raise ValueError(f"Event {event!r} is not valid in state {self.state!r}.")
+        if (self.state, event) in ATM_LOCKED_EVENTS:
+            with self.locks(self.account_id):
+                fired = self._fire(rows, value)
+        else:
+            fired = self._fire(rows, value)
+        if fired is None:
+            raise ValueError(f"No guard held for event {event!r} in state {self.state!r}.")
+        reply_state, result = fired
+
+        completion = ATM_COMPLETION_EVENTS.get(self.state)
+        while completion is not None:
+            fired = self._fire(DISPATCH[self.state, completion], fired[1])
+            if fired is None:
+                break
+            completion = ATM_COMPLETION_EVENTS.get(self.state)
+        if self.state in ATM_FINAL_STATES:
+            reply_state = self.state
+        return reply_state, result
+
+    def _fire(self, rows, value):
+        # Takes the first row whose guard holds; returns None if none does
+        for row, guard, target, action in rows:
+            if guard is None or guard(self, value):
+                result = action(self, value)
+                self.state = target
+                self.log_state(row, value)
+                return target, result
+        return None
+
+    def log_state(self, row, value):
+        """
+        Records the transition in ATM_TRANSITIONS[row] to the trace, the
+        structured transition log and on_transition, whichever are set.
+        """
+        if self.trace is not None:
+            self.trace.record(self.number, row)
+        if self.transition_log is not None:
+            source, event, guard, target, action = ATM_TRANSITIONS[row]
+            amount = None
+            if event == "Withdraw" and guard != "invalid input":
+                amount = to_cents(value)
+            entry = self.store.accounts.get(self.account_id)
+            self.transition_log.append(self.account_id, self.session_id, source, event, guard, target, action,
+                                       amount, entry[0] if entry is not None else None)
+        if self.on_transition is not None:
+            _, event, guard, _, action = ATM_TRANSITIONS[row]
+            self.on_transition(event, guard, action)
+
+    def balance(self):
+        return self.store.get(self.account_id)[0]
+
+    def saved_state(self):
+        saved = self.store.get(self.account_id)
+        if saved is None:
+            raise KeyError(f"Unknown account {self.account_id}.")
+        return saved
+
+    # Guards
+    def locked(self, value):
+        if self.credentials is None:
+            return self.saved_state()[1] >= MAX_ATTEMPTS
+        if self.account_id not in self.credentials.lockouts:
+            return False
+        if self.credentials.is_locked(self.account_id):
+            return True
+        self.store.set_attempts(self.account_id, 0)  # the lockout has expired
+        return False
+
+    def correct(self, pin):
+        if self.credentials is None:
+            return pin == CORRECT_PIN
+        return self.credentials.verify(self.account_id, pin)
+
+    def incorrect(self, pin):
+        return True
+
+    def failed(self, value):
+        return self.attempts >= MAX_ATTEMPTS
+
+    def invalid_input(self, amount):
+        try:
+            return to_cents(amount) <= 0
+        except (TypeError, ValueError, OverflowError):
+            return True
+
+    def balance_below_amount(self, amount):
+        return to_cents(amount) > self.store.accounts[self.account_id][0]
+
+    def balance_covers_amount(self, amount):
+        return True
+
+    def balance_is_zero(self, balance):
+        # The balance dispenseCash got back from the store, not a fresh read
+        # that another session's withdrawal could have changed since
+        return balance == 0
+
+    # Actions
+    def go_to_authenticate(self, value):
+        self.attempts = self.saved_state()[1]
+
+    def reject_user(self, value):
+        if self.credentials is not None and not self.credentials.is_locked(self.account_id):
+            self.credentials.lock(self.account_id)
+        return False
+
+    def go_to_authenticated(self, pin):
+        if self.attempts:
+            self.attempts = 0
+            self.store.set_attempts(self.account_id, 0)
+        return True
+
+    def increment_counter(self, pin):
+        self.attempts += 1
+        self.store.set_attempts(self.account_id, self.attempts)
+        return False
+
+    def abort_transaction(self, amount):
+        return None
+
+    def insufficient_funds(self, amount):
+        return self.balance()
+
+    def dispense_cash(self, amount):
+        return self.store.withdraw(self.account_id, amount)
+
+    def display_balance(self, value):
+        return self.balance()
+
+    def end_session(self, value):
+        return None
+
+    def close_account(self, value):
+        return 0.0
+
+    def return_to_menu(self, value):
+        return None
+
+GUARD_METHODS = {
+    "locked": ATMSession.locked,
+    "correct": ATMSession.correct,
+    "incorrect": ATMSession.incorrect,
+    "failed": ATMSession.failed,
+    "invalid input": ATMSession.invalid_input,
+    "balance < amount": ATMSession.balance_below_amount,
+    "balance >= amount": ATMSession.balance_covers_amount,
+    "balance == 0": ATMSession.balance_is_zero,
+    "N/A": None,
+}
+
+ACTION_METHODS = {
+    "goToAuthenticate": ATMSession.go_to_authenticate,
+    "rejectUser": ATMSession.reject_user,
+    "goToAuthenticated": ATMSession.go_to_authenticated,
+    "incrementCounter": ATMSession.increment_counter,
+    "abortTransaction": ATMSession.abort_transaction,
+    "insufficientFunds": ATMSession.insufficient_funds,
+    "dispenseCash": ATMSession.dispense_cash,
+    "displayBalance": ATMSession.display_balance,
+    "endSession": ATMSession.end_session,
+    "closeAccount": ATMSession.close_account,
+    "returnToMenu": ATMSession.return_to_menu,
+}
+
+def build_dispatch(transitions):
+    """
+    Compiles the transition rows into {(state, event): ((row, guard, next state, action), ...)}
+    so handle() does one dict lookup per event.
+    """
+    dispatch = {}
+    for row, (state, event, guard, target, action) in enumerate(transitions):
+        dispatch.setdefault((state, event), []).append(
+            (row, GUARD_METHODS[guard], target, ACTION_METHODS[action]))
+    return {key: tuple(rows) for key, rows in dispatch.items()}
+
+DISPATCH = build_dispatch(ATM_TRANSITIONS)
+
+class ATM:
+    def __init__(self, account_id=DEFAULT_ACCOUNT, store=None, credentials=None, transition_log=None):
+        self.attempts = 0
+        self.balance = DEFAULT_BALANCE  # Default balance if the account has no saved state
         self.session_active = True
+        self.account_id = account_id
+        self.store = store if store is not None else ATMStateStore(STATE_DIR)
+        self.credentials = credentials if credentials is not None else CredentialStore(STATE_DIR)
+        self.transition_log = transition_log if transition_log is not None else TransitionLog(TRANSITION_LOG)
         self.load_state()
+        self.session = ATMSession(account_id, self.store, credentials=self.credentials,
+                                  transition_log=self.transition_log, on_transition=self.log_state)
+
+    @property
+    def state(self):
+        return self.session.state
 
     def load_state(self):
-        if os.path.exists(STATE_FILE):
-            with open(STATE_FILE, mode='r') as file:
-                reader = csv.reader(file)
-                for row in reader:
-                    self.balance = float(row[0])
-                    self.attempts = int(row[1])
-                    logging.info(f"Loaded previous state: Balance=${self.balance}, Attempts={self.attempts}")
+        """
+        Loads the account's balance and attempts, creating the account with
+        DEFAULT_BALANCE if it is new. Raises KeyError if no PIN has been
+        provisioned for it (see provision_main).
+        """
+        if self.account_id not in self.credentials:
+            raise KeyError(f"No PIN is set for account {self.account_id}; "
+                           f"run: python Module8_Assignment.py set-pin {self.account_id}")
+        saved = self.store.get(self.account_id)
+        if saved is None and self.account_id == DEFAULT_ACCOUNT:
+            # First run with the journaled store: carry over the old CSV state
+            saved = read_legacy_state()
+            if saved is not None:
+                self.store.update(self.account_id, *saved)
+                logging.info(f"Imported legacy state from {STATE_FILE}.")
+        if saved is not None:
+            self.balance, self.attempts = saved
+            logging.info(f"Loaded previous state: Balance=${self.balance}, Attempts={self.attempts}")
         else:
+            self.store.update(self.account_id, self.balance, self.attempts)
             logging.info("No previous ATM state found. Starting fresh.")
 
     def save_state(self):
-        with open(STATE_FILE, mode='w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow([self.balance, self.attempts])
-            logging.info(f"Saved current state: Balance=${self.balance}, Attempts={self.attempts}")
+        # The store journals (and fsyncs) each balance and attempts change as
+        # it happens, so writing them again here would only race other sessions
+        self.balance, self.attempts = self.store.get(self.account_id)
+        self.transition_log.flush()
+        logging.info(f"Saved current state: Balance=${self.balance}, Attempts={self.attempts}")
 
     def log_state(self, event, guard, action):
         logging.info(f"STATE: {self.state} | EVENT: {event} [{guard}] / ACTION: {action}")
 
     def authenticate(self):
-        self.state = "Authenticate"
-        while self.attempts < MAX_ATTEMPTS:
+        while self.state == "Authenticate":
             pin = input("Enter your 4-digit PIN: ")
-            if pin == CORRECT_PIN:
-                self.log_state("EnterPIN", "correct", "goToAuthenticated")
+            _, accepted = self.session.handle("EnterPIN", pin)
+            if accepted:
                 print("PIN accepted. Authentication successful.")
                 return True
-            else:
-                self.attempts += 1
-                self.log_state("EnterPIN", "incorrect", "incrementCounter")
-                print(f"Incorrect PIN. Attempt {self.attempts} of {MAX_ATTEMPTS}.")
+            print(f"Incorrect PIN. Attempt {self.session.attempts} of {MAX_ATTEMPTS}.")
 
-        self.state = "Rejected"
-        self.log_state("MaxAttemptsReached", "failed", "rejectUser")
         print("Too many incorrect attempts. Access denied.")
         return False
 
     def withdraw_funds(self):
-        self.state = "Withdraw Funds"
         try:
             amount = float(input("Enter withdrawal amount: "))
-            if amount <= 0:
-                raise ValueError
         except ValueError:
-            self.log_state("Withdraw", "invalid input", "abortTransaction")
+            amount = None
+        state, result = self.session.handle("Withdraw", amount)
+        if state == "Withdraw Funds":
             print("Invalid amount. Transaction aborted.")
-            return
-
-        if amount > self.balance:
-            self.state = "Verify Balance"
-            self.log_state("Withdraw", "balance < amount", "insufficientFunds")
+        elif state == "Verify Balance":
             print("Insufficient funds.")
         else:
-            self.balance -= amount
-            self.state = "Dispense Cash"
-            self.log_state("Withdraw", "balance >= amount", "dispenseCash")
+            self.balance = result
             print(f"${amount:.2f} dispensed. Remaining balance: ${self.balance:.2f}")
-            if self.balance == 0:
-                self.state = "Close Session"
-                self.log_state("BalanceCheck", "balance == 0", "closeAccount")
+            if state == "Close Session":
                 print("Your account is now empty and will be closed.")
+                self.session_active = False
+                self.save_state()
 
     def run(self):
-        self.state = "Idle"
         print("Welcome to the ATM.")
-        self.log_state("Start", "N/A", "goToAuthenticate")
+        self.session.handle("Start")
 
         if not self.authenticate():
             self.save_state()
             return
 
-        self.state = "Authenticated"
         while self.session_active:
             print("\nSelect an option:")
             print("1. Withdraw Funds")
@@ -102,18 +923,312 @@ class ATM:
             if choice == "1":
                 self.withdraw_funds()
             elif choice == "2":
-                self.state = "Verify Balance"
-                self.log_state("CheckBalance", "N/A", "displayBalance")
-                print(f"Current balance: ${self.balance:.2f}")
+                _, balance = self.session.handle("CheckBalance")
+                print(f"Current balance: ${balance:.2f}")
             elif choice == "3":
-                self.state = "Close Session"
-                self.log_state("Exit", "N/A", "endSession")
+                self.session.handle("Exit")
                 print("Thank you for using the ATM. Goodbye.")
                 self.session_active = False
                 self.save_state()
             else:
                 print("Invalid choice. Please try again.")
 
+# Withdrawal histogram buckets: upper edges in dollars; the last bucket is open-ended
+WITHDRAWAL_BUCKETS = (20, 50, 100, 200, 500, 1000)
+# (event, guard) pairs that count as a failed attempt at the event
+FAILURE_GUARDS = {
+    ("Start", "locked"),
+    ("EnterPIN", "incorrect"),
+    ("Withdraw", "invalid input"),
+    ("Withdraw", "balance < amount"),
+}
+LEGACY_TRANSITION = re.compile(
+    r'^(?P<asctime>\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d{3}) - \w+ - '
+    r'(?:(?:SESSION|ACCOUNT): (?P<session>.+?) \| )?'
+    r'STATE: (?P<state>.+?) \| EVENT: (?P<event>\S+) \[(?P<guard>.*)\] / ACTION: (?P<action>\S+)$')
+LEGACY_BALANCE = re.compile(
+    r'^(?P<asctime>\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d{3}) - \w+ - '
+    r'(?:Loaded previous|Saved current) state: Balance=\$(?P<balance>[\d.]+)')
+
+# (event, guard) -> [(state, next state), ...] for placing legacy log lines
+LEGACY_ROWS = defaultdict(list)
+for _state, _event, _guard, _target, _ in ATM_TRANSITIONS:
+    LEGACY_ROWS[_event, _guard].append((_state, _target))
+
+def _legacy_states(event, guard, state):
+    """
+    Returns (from, to) for a legacy line. Older ATM versions logged the state
+    before some transitions (Start, EnterPIN) and the one after others, so the
+    logged state is matched against the transition table; from is None when it
+    cannot be told.
+    """
+    rows = LEGACY_ROWS.get((event, guard), ())
+    sources = {source for source, target in rows if target == state}
+    if sources:
+        return (sources.pop() if len(sources) == 1 else None), state
+    for source, target in rows:
+        if source == state:
+            return source, target
+    return None, state
+
+@functools.lru_cache(maxsize=4096)
+def _legacy_second(stamp):
+    return time.mktime(time.strptime(stamp, '%Y-%m-%d %H:%M:%S'))
+
+def _legacy_time(asctime):
+    return _legacy_second(asctime[:19]) + int(asctime[20:23]) / 1000
+
+def _parse_transition(line):
+    # One log line -> a record (structured or legacy), or None
+    if line.startswith('['):
+        try:
+            return json.loads(line)
+        except ValueError:
+            return None  # torn final line
+    line = line.rstrip('\r\n')
+    match = LEGACY_TRANSITION.match(line)
+    if match is not None:
+        source, target = _legacy_states(match['event'], match['guard'], match['state'])
+        return (_legacy_time(match['asctime']), DEFAULT_ACCOUNT, match['session'] or 'legacy', source,
+                match['event'], match['guard'], target, match['action'], None, None)
+    match = LEGACY_BALANCE.match(line)
+    if match is not None:
+        return (_legacy_time(match['asctime']), DEFAULT_ACCOUNT, 'legacy', None,
+                None, None, None, None, None, to_cents(float(match['balance'])))
+    return None
+
+def read_transitions(path, batch_lines=10_000):
+    """
+    Yields transition records (sequences in TRANSITION_FIELDS order) from a
+    structured transition log or a legacy atm_log.txt, batch_lines at a time.
+    Legacy lines name one state, before or after the transition depending on
+    the version that wrote them; both are filled in from ATM_TRANSITIONS (see
+    _legacy_states). They carry no amounts, and "Loaded/Saved state" lines
+    become balance-only records (event None).
+    Lines that are neither are skipped.
+    """
+    with open(path, encoding='utf-8', errors='replace') as file:
+        while True:
+            lines = list(itertools.islice(file, batch_lines))
+            if not lines:
+                break
+            if all(line.startswith('[') for line in lines):
+                # Structured batch: one json.loads call for all of it
+                try:
+                    yield from json.loads('[' + ','.join(lines) + ']')
+                    continue
+                except ValueError:
+                    pass  # a torn line; parse one by one
+            for line in lines:
+                record = _parse_transition(line)
+                if record is not None:
+                    yield record
+
+class TransitionStats:
+    """
+    Streaming aggregates over transition records. Memory depends on the number
+    of accounts and of sessions open at once, not on the length of the log.
+    A state's dwell time runs from the record that entered it to the session's
+    next record. A session that never reaches a final state is counted as
+    abandoned, without dwell time for its last state, once it has been quiet
+    for max_open_age seconds of log time or a new Start arrives for it.
+    """
+    def __init__(self, max_open_age=3600.0):
+        self.records = 0
+        self.sessions = 0
+        self.rejected = 0
+        self.abandoned = 0
+        self.max_open_age = max_open_age
+        self.events = defaultdict(int)
+        self.failures = defaultdict(int)
+        self.dwell = defaultdict(float)  # state -> total seconds
+        self.visits = defaultdict(int)
+        self.withdrawals = [0] * (len(WITHDRAWAL_BUCKETS) + 1)
+        self.withdrawn = 0  # cents
+        self.balances = {}  # account id -> last known balance in cents
+        self._bucket_edges = [edge * 100 for edge in WITHDRAWAL_BUCKETS]
+        self._open = OrderedDict()  # session -> (state, time entered), least recently active first
+
+    def add(self, record):
+        when, account_id, session, _, event, guard, state, _, amount, balance = record
+        self.records += 1
+        if balance is not None:
+            self.balances[account_id] = balance
+        if event is None:
+            return
+        self.events[event] += 1
+        if (event, guard) in FAILURE_GUARDS:
+            self.failures[event] += 1
+        if event == "Start":
+            self.sessions += 1
+        if state == "Rejected":
+            self.rejected += 1
+        if guard == "balance >= amount" and amount is not None:
+            self.withdrawals[bisect.bisect_left(self._bucket_edges, amount)] += 1
+            self.withdrawn += amount
+
+        previous = self._open.pop(session, None)
+        if previous is not None:
+            if event == "Start":  # restarted without finishing (e.g. the ATM was killed)
+                self.abandoned += 1
+            else:
+                self.dwell[previous[0]] += when - previous[1]
+                self.visits[previous[0]] += 1
+        if state not in ATM_FINAL_STATES:
+            self._open[session] = (state, when)
+        if not self.records % 1024:
+            self._evict(when - self.max_open_age)
+
+    def _evict(self, cutoff):
+        # Drops sessions whose last record is older than cutoff
+        while self._open:
+            session = next(iter(self._open))
+            if self._open[session][1] >= cutoff:
+                break
+            del self._open[session]
+            self.abandoned += 1
+
+    def report(self):
+        labels = [f"<= ${edge}" for edge in WITHDRAWAL_BUCKETS] + [f"> ${WITHDRAWAL_BUCKETS[-1]}"]
+        return {
+            'records': self.records,
+            'sessions': self.sessions,
+            'rejected_sessions': self.rejected,
+            'abandoned_sessions': self.abandoned,
+            'open_sessions': len(self._open),
+            'failure_rates': {event: self.failures[event] / count for event, count in self.events.items()},
+            'dwell_seconds': {state: {'visits': self.visits[state], 'total': total,
+                                      'mean': total / self.visits[state]}
+                              for state, total in self.dwell.items()},
+            'withdrawals': dict(zip(labels, self.withdrawals)),
+            'withdrawn': self.withdrawn / 100,
+            'balances': {account_id: cents / 100 for account_id, cents in self.balances.items()},
+        }
+
+def analyze_transitions(paths):
+    """
+    Streams every record in the given log files (structured or legacy, in the
+    order given) through TransitionStats and returns its report.
+    """
+    stats = TransitionStats()
+    for path in paths:
+        for record in read_transitions(path):
+            stats.add(record)
+    return stats.report()
+
+def analyze_main(argv):
+    """
+    Command-line entry point: python Module8_Assignment.py analyze LOG [LOG ...]
+    """
+    parser = argparse.ArgumentParser(prog="Module8_Assignment.py analyze",
+                                     description="Summarize ATM transition logs (structured or legacy text).")
+    parser.add_argument('logs', nargs='+', help="Transition log files, oldest first.")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON.")
+    args = parser.parse_args(argv)
+
+    report = analyze_transitions(args.logs)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+    print(f"{report['records']:,} records, {report['sessions']:,} sessions, "
+          f"{report['rejected_sessions']:,} rejected, {report['abandoned_sessions']:,} abandoned, "
+          f"{report['open_sessions']:,} still open")
+    print("\nFailure rates:")
+    for event, rate in sorted(report['failure_rates'].items()):
+        print(f"  {event:<20} {rate:7.2%}")
+    print("\nDwell time per state:")
+    for state, dwell in sorted(report['dwell_seconds'].items()):
+        print(f"  {state:<20} {dwell['visits']:>10,} visits  {dwell['mean']:10.3f}s mean")
+    print(f"\nWithdrawals (${report['withdrawn']:,.2f} total):")
+    for label, count in report['withdrawals'].items():
+        print(f"  {label:<20} {count:>10,}")
+    print(f"\nBalances rebuilt for {len(report['balances']):,} accounts.")
+    for account_id, balance in sorted(report['balances'].items())[:20]:
+        print(f"  {account_id:<20} ${balance:,.2f}")
+    return 0
+
+class SessionEngine:
+    """
+    Runs many scripted ATM sessions at once on a thread pool over one shared
+    ATMStateStore. A script is (account_id, pin, [(event, value), ...]); the
+    Start and EnterPIN events are sent first, and the session stops early once
+    it is Rejected or closed, or after a wrong PIN unless the script sends another.
+    PINs are checked against `credentials` when given (see ATMSession).
+    Every transition is recorded in self.trace, and in transition_log if given.
+    """
+    def __init__(self, store, credentials=None, max_workers=32, trace_size=65536, transition_log=None):
+        self.store = store
+        self.credentials = credentials
+        self.transition_log = transition_log
+        self.locks = AccountLocks()
+        self.trace = TransitionTrace(trace_size)
+        self.max_workers = max_workers
+
+    def run_session(self, account_id, pin, events):
+        """
+        Runs one session and returns its list of (state, result) replies.
+        If the session fails (an unknown account, an event its state does not
+        accept), the replies so far are returned with ("Error", exception) last.
+        """
+        session = ATMSession(account_id, self.store, self.locks, self.credentials, trace=self.trace,
+                             transition_log=self.transition_log)
+        replies = []
+        try:
+            replies.append(session.handle("Start"))
+            if session.state == "Authenticate":  # not locked out
+                replies.append(session.handle("EnterPIN", pin))
+            for event, value in events:
+                if session.state != "Authenticated" and not (session.state == "Authenticate" and event == "EnterPIN"):
+                    break  # rejected, closed, or a wrong PIN that the script does not retry
+                replies.append(session.handle(event, value))
+        except Exception as e:
+            logging.warning(f"Session {session.number} on account {account_id} failed: {e}")
+            replies.append(("Error", e))
+        return replies
+
+    def run(self, scripts):
+        """
+        Runs every script concurrently and returns their replies in script order.
+        A failing session ends its own replies (see run_session) and does not
+        stop the others.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(self.run_session, *script) for script in scripts]
+            return [future.result() for future in futures]
+
+def provision_main(argv):
+    """
+    Command-line entry point: python Module8_Assignment.py set-pin ACCOUNT
+    Sets (or replaces) an account's PIN, read twice without echo.
+    """
+    parser = argparse.ArgumentParser(prog="Module8_Assignment.py set-pin",
+                                     description="Set the PIN for an ATM account.")
+    parser.add_argument('account', help="Account id.")
+    args = parser.parse_args(argv)
+
+    pin = getpass.getpass("New 4-digit PIN: ")
+    if not re.fullmatch(r'\d{4}', pin):
+        print("A PIN is exactly 4 digits.", file=sys.stderr)
+        return 1
+    if getpass.getpass("Repeat the PIN: ") != pin:
+        print("The PINs do not match.", file=sys.stderr)
+        return 1
+    credentials = CredentialStore(STATE_DIR)
+    credentials.set_pin(args.account, pin)
+    credentials.unlock(args.account)
+    credentials.close()
+    logging.info(f"PIN set for account {args.account}.")
+    print(f"PIN set for account {args.account}.")
+    return 0
+
 if __name__ == "__main__":
-    atm_machine = ATM()
-    atm_machine.run()
\ No newline at end of file
+    if sys.argv[1:2] == ["analyze"]:
+        sys.exit(analyze_main(sys.argv[2:]))
+    if sys.argv[1:2] == ["set-pin"]:
+        sys.exit(provision_main(sys.argv[2:]))
+    try:
+        atm_machine = ATM()
+    except KeyError as e:
+        print(e.args[0], file=sys.stderr)
+        sys.exit(1)
+    atm_machine.run()
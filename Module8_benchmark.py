@@ -0,0 +1,193 @@
+# ATM Session Benchmarks
+# Load-tests the session engine: thousands of scripted sessions against a
+# shared journaled state store, run with different thread pool sizes. Checks
+# that every account's final balance (live and after recovery) matches the
+# withdrawals that were dispensed, so no withdrawal is lost or doubled.
+# Also measures raw events per second through the transition table, with the
+# ring-buffer trace against a formatted log line per event, and PIN hash cost
+# against login latency under concurrent logins, and the transition log
+# analyzer's speed and memory as the log grows.
+# Run with: python Module8_benchmark.py [sessions] [accounts]
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import shared_logging
+import Module8_Assignment as atm
+
+
+def make_scripts(sessions, accounts, seed=808):
+    """
+    Builds reproducible session scripts; a few use a wrong PIN.
+    Sessions are spread over few accounts so many run on one account at once,
+    and accounts start low enough that some withdrawals are refused.
+    """
+    rng = random.Random(seed)
+    scripts = []
+    for _ in range(sessions):
+        account_id = f"acct-{rng.randrange(accounts)}"
+        pin = atm.CORRECT_PIN if rng.random() > 0.05 else "0000"
+        events = [("Withdraw", rng.choice((10, 20, 40, 60, 100)) + rng.randrange(100) / 100)
+                  for _ in range(rng.randint(1, 3))]
+        events += [("CheckBalance", None), ("Exit", None)]
+        scripts.append((account_id, pin, events))
+    return scripts
+
+
+def dispensed(events, replies):
+    """
+    Returns the cents dispensed by one session, from its script and replies.
+    """
+    # replies[0:2] answer Start and EnterPIN; a locked-out session stops after Start
+    return [atm.to_cents(value) for (event, value), (state, _) in zip(events, replies[2:])
+            if event == "Withdraw" and state in ("Dispense Cash", "Close Session")]
+
+
+def benchmark_sessions(sessions=5000, accounts=200, worker_counts=(1, 8, 32, 128), opening=2_000):
+    """
+    Runs the same scripts at each pool size on a fresh store and checks the balances.
+    """
+    scripts = make_scripts(sessions, accounts)
+    print(f"\nATM sessions ({sessions:,} sessions over {accounts:,} accounts)")
+    for workers in worker_counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = atm.ATMStateStore(tmp, snapshot_every=2000)
+            for i in range(accounts):
+                store.open_account(f"acct-{i}", opening)
+            engine = atm.SessionEngine(store, max_workers=workers)
+            start = time.perf_counter()
+            results = engine.run(scripts)
+            elapsed = time.perf_counter() - start
+            store.close()
+
+            # Expected balance per account from what the sessions reported dispensing
+            expected = {f"acct-{i}": opening * 100 for i in range(accounts)}
+            withdrawals = 0
+            for (account_id, _, events), replies in zip(scripts, results):
+                amounts = dispensed(events, replies)
+                withdrawals += len(amounts)
+                expected[account_id] -= sum(amounts)
+            recovered = atm.ATMStateStore(tmp)
+            live = {a: store.accounts[a][0] for a in expected}
+            restored = {a: recovered.accounts[a][0] for a in expected}
+            recovered.close()
+            assert live == expected == restored, "Balances do not match the dispensed withdrawals."
+            print(f"{workers:>4} workers  {elapsed:8.3f}s  {sessions / elapsed:10,.0f} sessions/s"
+                  f"  {withdrawals / elapsed:10,.0f} withdrawals/s")
+
+
+def benchmark_dispatch(count=300_000):
+    """
+    Events per second through one session, using events that do not write to
+    the store (balance checks, refused and invalid withdrawals).
+    """
+    events = [("CheckBalance", None), ("Withdraw", 1e9), ("Withdraw", -5)] * (count // 3)
+    print(f"\nTransition engine ({len(events):,} events, one session)")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = atm.ATMStateStore(tmp)
+        store.open_account("acct", 100)
+        log_path = os.path.join(tmp, "atm_log.txt")
+
+        def log_line(event, guard, action):
+            logging.info(f"STATE: {session.state} | EVENT: {event} [{guard}] / ACTION: {action}")
+
+        modes = [("no trace", {}),
+                 ("ring-buffer trace", {"trace": atm.TransitionTrace()}),
+                 ("log line per event", {"on_transition": log_line})]
+        for label, options in modes:
+            shared_logging.setup_logging(filename=log_path, use_queue=False, force=True)
+            session = atm.ATMSession("acct", store, **options)
+            session.handle("Start")
+            session.handle("EnterPIN", atm.CORRECT_PIN)
+            handle = session.handle
+            start = time.perf_counter()
+            for event, value in events:
+                handle(event, value)
+            elapsed = time.perf_counter() - start
+            print(f"{label:<20} {elapsed:8.3f}s  {len(events) / elapsed:12,.0f} events/s")
+        shared_logging.stop_logging()
+        store.close()
+
+
+def timed_login(credentials, account_id, pin):
+    start = time.perf_counter()
+    assert credentials.verify(account_id, pin)
+    return time.perf_counter() - start
+
+
+def benchmark_pin_hashing(costs=(10_000, 100_000, 300_000), worker_counts=(1, 8, 32), logins=64):
+    """
+    Login latency and throughput for each PBKDF2 iteration count, first with
+    every login a cache miss and then with every login a cache hit.
+    """
+    print(f"\nPIN verification ({logins} logins per run, distinct accounts)")
+    print(f"{'iterations':>10} {'workers':>7} {'logins/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    pins = [(f"acct-{i}", f"{i % 10_000:04d}") for i in range(logins)]
+    with tempfile.TemporaryDirectory() as tmp:
+        for iterations in costs:
+            credentials = atm.CredentialStore(tmp, iterations=iterations)
+            credentials.set_pins(pins)
+            for workers in worker_counts:
+                credentials._cache.clear()  # every login hashes
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    start = time.perf_counter()
+                    latencies = list(pool.map(lambda pair: timed_login(credentials, *pair), pins))
+                    elapsed = time.perf_counter() - start
+                latencies.sort()
+                print(f"{iterations:>10,} {workers:>7} {logins / elapsed:>10,.0f}"
+                      f" {statistics.median(latencies) * 1000:>8.2f} {latencies[int(len(latencies) * 0.99)] * 1000:>8.2f}")
+        # Same logins again, now served from the verification cache
+        start = time.perf_counter()
+        latencies = sorted(timed_login(credentials, *pair) for pair in pins)
+        elapsed = time.perf_counter() - start
+        print(f"{'cached':>10} {1:>7} {logins / elapsed:>10,.0f}"
+              f" {statistics.median(latencies) * 1000:>8.3f} {latencies[int(len(latencies) * 0.99)] * 1000:>8.3f}")
+
+
+def benchmark_analyzer(sessions=20_000, accounts=200, copies=(1, 4)):
+    """
+    Writes a structured transition log from engine sessions, checks that the
+    analyzer rebuilds the store's balances from it, then times the analyzer on
+    the log repeated `copies` times and reports its peak traced memory.
+    """
+    print(f"\nTransition log analyzer ({sessions:,} sessions over {accounts:,} accounts)")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = atm.ATMStateStore(tmp)
+        for i in range(accounts):
+            store.open_account(f"acct-{i}", 2_000)
+        log_path = os.path.join(tmp, "transitions.jsonl")
+        with atm.TransitionLog(log_path) as transition_log:
+            atm.SessionEngine(store, transition_log=transition_log).run(make_scripts(sessions, accounts))
+        report = atm.analyze_transitions([log_path])
+        assert report["balances"] == {a: cents / 100 for a, (cents, _) in store.accounts.items()}, \
+            "Rebuilt balances differ from the store."
+        store.close()
+
+        for count in copies:
+            size = os.path.getsize(log_path) * count
+            start = time.perf_counter()
+            report = atm.analyze_transitions([log_path] * count)
+            elapsed = time.perf_counter() - start
+            # Memory is measured on a second pass; tracing slows the analyzer down
+            tracemalloc.start()
+            atm.analyze_transitions([log_path] * count)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{report['records']:>10,} records  {size / 2 ** 20:8.1f} MB  {elapsed:7.3f}s"
+                  f"  {report['records'] / elapsed:10,.0f} records/s  peak {peak / 2 ** 20:6.2f} MB")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    m = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    benchmark_dispatch()
+    logging.disable(logging.CRITICAL)
+    benchmark_sessions(n, m)
+    benchmark_pin_hashing()
+    benchmark_analyzer()
@@ -0,0 +1,188 @@
+# Shared Logging Setup
+# Non-blocking logging for all modules: records for a log file go onto a queue
+# and a background thread writes them in batches, so hot paths never wait on
+# disk. Console (stderr) logging stays synchronous so it keeps its order with
+# print() output. Set LOG_JSON=1 for one JSON object per line, or LOG_ASYNC=0
+# for plain synchronous logging (what logging.basicConfig gives).
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats each record as a single-line JSON object.
+    """
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class BatchedFileHandler(logging.FileHandler):
+    """
+    File handler that leaves flushing to its caller instead of flushing every record.
+    """
+    def emit(self, record):
+        if self.stream is None:
+            self.stream = self._open()
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+
+class LocalQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler for a listener in the same process: it only merges the message
+    with its arguments and leaves formatting (timestamps, tracebacks) to the
+    writer thread, instead of formatting and copying every record in the caller.
+    """
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class BatchingQueueListener(logging.handlers.QueueListener):
+    """
+    QueueListener that flushes its handlers once per batch of up to
+    batch_size records instead of once per record. Once it has caught up
+    with the queue it flushes and waits flush_interval seconds so the next
+    batch can build up.
+    """
+    def __init__(self, log_queue, *handlers, batch_size=500, flush_interval=0.05):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending = 0  # records handled since the last flush
+
+    def dequeue(self, block):
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            pass
+        self.flush()  # caught up; let the next batch build
+        time.sleep(self.flush_interval)
+        return self.queue.get(block)
+
+    def handle(self, record):
+        super().handle(record)
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def stop(self):
+        super().stop()
+        self.flush()  # the records handled just before the stop signal
+
+    def flush(self):
+        for handler in self.handlers:
+            handler.flush()
+        self.pending = 0
+
+
+def stop_logging():
+    """
+    Stops the background writer after it has written every queued record.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def setup_logging(filename=None, level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                  json_format=None, use_queue=None, batch_size=500, flush_interval=0.05, force=False):
+    """
+    Drop-in replacement for logging.basicConfig(filename=..., level=..., format=...).
+    Like basicConfig it does nothing if the root logger already has handlers,
+    unless force=True. With no filename records go to stderr, synchronously.
+    json_format and use_queue default to the LOG_JSON and LOG_ASYNC environment
+    variables (JSON off, queue on). Queued records reach the file in batches,
+    at most about flush_interval seconds after they are logged. Returns the
+    QueueListener, or None when logging synchronously.
+    """
+    global _listener
+    root = logging.getLogger()
+    if root.handlers and not force:
+        return _listener
+    stop_logging()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+
+    if json_format is None:
+        json_format = os.environ.get('LOG_JSON', '0') == '1'
+    if use_queue is None:
+        use_queue = os.environ.get('LOG_ASYNC', '1') != '0'
+
+    if filename:
+        handler = BatchedFileHandler(filename) if use_queue else logging.FileHandler(filename)
+    else:
+        handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if json_format else logging.Formatter(format))
+    root.setLevel(level)
+
+    if not use_queue or not filename:
+        root.addHandler(handler)
+        return None
+
+    log_queue = queue.SimpleQueue()
+    root.addHandler(LocalQueueHandler(log_queue))
+    _listener = BatchingQueueListener(log_queue, handler, batch_size=batch_size,
+                                      flush_interval=flush_interval)
+    _listener.start()
+    return _listener
+
+
+def _before_fork():
+    # Write out the file buffers so the child does not inherit (and later
+    # write again) lines the parent has not flushed yet
+    if _listener is not None:
+        for handler in _listener.handlers:
+            handler.acquire()
+            handler.flush()
+
+
+def _after_fork_in_parent():
+    if _listener is not None:
+        for handler in _listener.handlers:
+            handler.release()
+
+
+def _restart_after_fork():
+    # The writer thread does not survive fork(), and the records still on the
+    # inherited queue are the parent's to write. Give the child an empty queue
+    # and its own writer. (logging has already reset the handler locks.)
+    global _listener
+    if _listener is None:
+        return
+    inherited = _listener
+    log_queue = queue.SimpleQueue()
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, LocalQueueHandler):
+            handler.queue = log_queue
+    _listener = BatchingQueueListener(log_queue, *inherited.handlers, batch_size=inherited.batch_size,
+                                      flush_interval=inherited.flush_interval)
+    _listener.start()
+
+
+atexit.register(stop_logging)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(before=_before_fork, after_in_parent=_after_fork_in_parent,
+                        after_in_child=_restart_after_fork)
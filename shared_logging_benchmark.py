@@ -0,0 +1,114 @@
+# Logging Pipeline Benchmarks
+# Times PHTRS report creation and check writing with synchronous logging
+# (what logging.basicConfig gives) against the queued, batched pipeline
+# from shared_logging, with and without JSON output and console echo.
+# Console output goes to os.devnull, so terminal cost is not included.
+# A second pass adds a fixed delay to every flush of the log file to stand in
+# for a slow or network disk.
+# Run with: python shared_logging_benchmark.py [count] [flush_delay_ms]
+import contextlib
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import shared_logging
+import Module5_Assignment as phtrs
+import Module6_Assignment as cw
+
+MODES = [
+    # label, use_queue, json_format, console echo
+    ("sync", False, False, True),
+    ("sync, no echo", False, False, False),
+    ("async, no echo", True, False, False),
+    ("async json, no echo", True, True, False),
+]
+
+
+class SlowFlushStream:
+    """
+    Wraps a file so that every flush() takes at least `delay` seconds.
+    """
+    def __init__(self, stream, delay):
+        self._stream = stream
+        self._delay = delay
+
+    def write(self, text):
+        return self._stream.write(text)
+
+    def flush(self):
+        self._stream.flush()
+        time.sleep(self._delay)
+
+    def close(self):
+        self._stream.close()
+
+
+def slow_down_log_file(delay):
+    """
+    Makes every file handler behind the root logger flush slowly.
+    """
+    handlers = list(logging.getLogger().handlers)
+    if shared_logging._listener is not None:
+        handlers += shared_logging._listener.handlers
+    for handler in handlers:
+        if isinstance(handler, logging.FileHandler):
+            if handler.stream is None:
+                handler.stream = handler._open()
+            handler.stream = SlowFlushStream(handler.stream, delay)
+
+
+def run_reports(count):
+    system = phtrs.PHTRS()
+    for i in range(count):
+        system.report_pothole(f"{i} Main St", i % 10 + 1, "Middle", f"D{i % 20}")
+
+
+def run_checks(count):
+    for i in range(count):
+        cw.check_writer(i * 1.01)
+
+
+def timed(func, count):
+    """
+    Runs func with its console output discarded and returns the time the caller
+    spent and the time until every log record was on disk.
+    """
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        func(count)
+        elapsed = time.perf_counter() - start
+        shared_logging.stop_logging()  # waits for the queue to drain
+        drained = time.perf_counter() - start
+    return elapsed, drained
+
+
+def benchmark(name, func, count, flush_delay=0.0):
+    delay_note = f", {flush_delay * 1000:g} ms per log flush" if flush_delay else ""
+    print(f"\n{name} ({count:,} operations{delay_note})")
+    with tempfile.TemporaryDirectory() as tmp:
+        for index, (label, use_queue, json_format, echo) in enumerate(MODES):
+            path = os.path.join(tmp, f"mode{index}.log")
+            shared_logging.setup_logging(filename=path, use_queue=use_queue,
+                                         json_format=json_format, force=True)
+            if flush_delay:
+                slow_down_log_file(flush_delay)
+            phtrs.set_console_echo(echo)
+            elapsed, drained = timed(func, count)
+            print(f"{label:<24} {elapsed:8.3f}s  {count / elapsed:10,.0f} ops/s   (written after {drained:.3f}s)")
+            with open(path) as log:
+                lines = sum(1 for _ in log)
+            assert lines >= count, f"{label}: expected at least {count} log lines, found {lines}"
+    phtrs.set_console_echo(True)
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    delay_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+    benchmark("PHTRS report_pothole", run_reports, n)
+    benchmark("check_writer", run_checks, n)
+    benchmark("PHTRS report_pothole", run_reports, n // 10, delay_ms / 1000)
+    benchmark("check_writer", run_checks, n // 10, delay_ms / 1000)
+    # Leave the root logger in a sane state for anything run afterwards
+    shared_logging.setup_logging(level=logging.INFO, use_queue=False, force=True)